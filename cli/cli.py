@@ -1,9 +1,260 @@
+import os
+import tempfile
+import time
+
 from controllers.adaptive_control import AdaptiveController
-from controllers.multilevel_control import MultilevelController
-from utils.plotter import unified_plot, radar_plot
+from controllers.multilevel_control import (
+    MultilevelController,
+    StreamingMultilevelEstimator,
+)
+from controllers.rls import StreamingEstimator
+from utils.benchmark import (
+    BENCHMARKS,
+    DEFAULT_DTYPES,
+    DEFAULT_ORDERS,
+    DEFAULT_RUNS,
+    DEFAULT_SAMPLES,
+    compare_results,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+from utils.cache import DEFAULT_MAX_BYTES, ResultCache
+from utils.experiment_runner import parameter_grid, run_sweep
+from utils.instrumentation import Instrumentation
+from utils.service import (
+    DEFAULT_BATCH_WINDOW,
+    DEFAULT_MAX_BATCH,
+    DEFAULT_QUEUE_SIZE,
+    IdentificationService,
+    run_load_test,
+)
+from utils.signal_io import load_signal, save_signal
 import numpy as np
 
 
+def parse_grid_axis(text):
+    """
+    Parse a sweep axis given as NAME=V1,V2,...
+
+    Args:
+        text (str): Axis specification.
+
+    Returns:
+        tuple: name, list of values (floats where possible)
+    """
+    name, _, values = text.partition("=")
+    parsed = []
+    for value in values.split(","):
+        try:
+            parsed.append(float(value))
+        except ValueError:
+            parsed.append(value)
+    return name, parsed
+
+
+def add_plot_arguments(parser):
+    """
+    Add the plot output options to a subcommand parser.
+
+    Args:
+        parser (ArgumentParser): Subcommand parser.
+    """
+    parser.add_argument(
+        "--no-plot", action="store_true", help="Only print the estimates"
+    )
+    parser.add_argument(
+        "--output", help="Save the plot to this file (.png, .svg) instead of showing it"
+    )
+
+
+def add_method_arguments(parser):
+    """
+    Add the identification method options of the adaptive controller.
+
+    Args:
+        parser (ArgumentParser): Subcommand parser.
+    """
+    parser.add_argument(
+        "--method",
+        choices=["rls", "batch", "block"],
+        default="rls",
+        help="Sample-wise RLS, direct least squares or block RLS",
+    )
+    parser.add_argument(
+        "--block-size", type=int, default=1024, help="Samples per block of block RLS"
+    )
+
+
+def add_profile_arguments(parser):
+    """
+    Add the identification profiling options to a subcommand parser.
+
+    Args:
+        parser (ArgumentParser): Subcommand parser.
+    """
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a per-phase time breakdown of the identification",
+    )
+    parser.add_argument(
+        "--profile-interval",
+        type=int,
+        help="Print the estimate and covariance trace every this many samples",
+    )
+    parser.add_argument(
+        "--profile-output", help="Dump cProfile statistics of the identification"
+    )
+
+
+def add_dtype_argument(parser, default="float64"):
+    """
+    Add the floating point type option to a subcommand parser.
+
+    Args:
+        parser (ArgumentParser): Subcommand parser.
+        default (str, optional): Default type; None keeps that of the signals.
+    """
+    parser.add_argument(
+        "--dtype",
+        choices=["float64", "float32"],
+        default=default,
+        help="Floating point type of the signals and estimates",
+    )
+
+
+def add_cache_arguments(parser):
+    """
+    Add the result cache options to a subcommand parser.
+
+    Args:
+        parser (ArgumentParser): Subcommand parser.
+    """
+    parser.add_argument(
+        "--cache-dir",
+        help="Cache seeded simulations and identifications in this directory",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        default=DEFAULT_MAX_BYTES / 2**20,
+        help="Size cap of the cache in MiB, least recently used entries are evicted",
+    )
+
+
+def open_cache(args):
+    """
+    Open the result cache requested on the command line.
+
+    Args:
+        args (Namespace): Parsed arguments with the cache options.
+
+    Returns:
+        ResultCache or None: The cache, or None when no directory was given.
+    """
+    if args.cache_dir is None:
+        return None
+    return ResultCache(args.cache_dir, int(args.cache_size * 2**20))
+
+
+def add_address_arguments(parser):
+    """
+    Add the address options of the identification service to a subcommand parser.
+
+    Args:
+        parser (ArgumentParser): Subcommand parser.
+    """
+    parser.add_argument("--socket", help="Unix socket path of the service")
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="Host of the service on TCP"
+    )
+    parser.add_argument("--port", type=int, help="TCP port of the service")
+
+
+def service_address(args):
+    """
+    Get the service address requested on the command line.
+
+    Args:
+        args (Namespace): Parsed arguments with the address options.
+
+    Returns:
+        str, tuple or None: Unix socket path, (host, port), or None when
+        neither a socket nor a port was given.
+    """
+    if args.socket is not None:
+        return args.socket
+    if args.port is not None:
+        return (args.host, args.port)
+    return None
+
+
+def print_cache_stats(cache):
+    """
+    Print the hit and miss counts of a result cache, if one is used.
+
+    Args:
+        cache (ResultCache or None): Result cache.
+    """
+    if cache is not None:
+        stats = cache.stats()
+        print(
+            f"Cache: {stats['hits']} hits, {stats['misses']} misses, "
+            f"{stats['bypassed']} bypassed, {stats['entries']} entries, "
+            f"{stats['bytes'] / 2**20:.1f} MiB"
+        )
+
+
+def profile_identify(args, identify, *identify_args, **identify_kwargs):
+    """
+    Run an identify method, instrumented and profiled when requested.
+
+    Args:
+        args (Namespace): Parsed arguments with the profiling options.
+        identify (callable): Identify method of a controller.
+        *identify_args: Positional arguments of the identify method.
+        **identify_kwargs: Keyword arguments of the identify method.
+
+    Returns:
+        The result of the identify method.
+    """
+    if not (args.profile or args.profile_interval or args.profile_output):
+        return identify(*identify_args, **identify_kwargs)
+
+    instrumentation = Instrumentation(
+        args.profile_interval,
+        lambda samples, estimate, trace: print(
+            f"samples: {samples}, estimate: {np.ravel(estimate)}, "
+            f"covariance trace: {trace}"
+        ),
+    )
+    identify_kwargs["instrumentation"] = instrumentation
+    if args.profile_output:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        result = profiler.runcall(identify, *identify_args, **identify_kwargs)
+        profiler.dump_stats(args.profile_output)
+    else:
+        result = identify(*identify_args, **identify_kwargs)
+    print(instrumentation.report())
+    return result
+
+
+def save_signals(directory, **signals):
+    """
+    Save simulated signals as .npy files named after their keyword.
+
+    Args:
+        directory (str): Output directory, created if missing.
+        **signals: Signal name mapped to its array.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, signal in signals.items():
+        save_signal(os.path.join(directory, f"{name}.npy"), signal)
+
+
 def main():
     import argparse
 
@@ -26,6 +277,51 @@ def main():
     adaptive_parser.add_argument(
         "--forgetting_factor", type=float, default=1, help="Forgetting factor"
     )
+    adaptive_parser.add_argument(
+        "--coefficients",
+        type=float,
+        nargs="+",
+        help="FIR coefficients of arbitrary length, overrides a0, a1 and a2",
+    )
+    adaptive_parser.add_argument(
+        "--seed", type=int, help="Random seed for reproducible runs"
+    )
+    adaptive_parser.add_argument(
+        "--mode",
+        choices=["standard", "sqrt"],
+        default="standard",
+        help="Covariance update of the recursive least squares",
+    )
+    add_method_arguments(adaptive_parser)
+    adaptive_parser.add_argument(
+        "--convolution",
+        choices=["auto", "direct", "fft"],
+        default="auto",
+        help="Convolution of the simulated FIR plant",
+    )
+    adaptive_parser.add_argument(
+        "--simulate-chunk-size",
+        type=int,
+        help="Simulate the plant in chunks of this many samples",
+    )
+    add_plot_arguments(adaptive_parser)
+    add_profile_arguments(adaptive_parser)
+    adaptive_parser.add_argument(
+        "--convergence-tolerance",
+        type=float,
+        help="Stop once the estimates change less than this over a window",
+    )
+    adaptive_parser.add_argument(
+        "--convergence-window",
+        type=int,
+        default=500,
+        help="Samples of the convergence window",
+    )
+    adaptive_parser.add_argument(
+        "--save-signals", metavar="DIR", help="Save u and y as .npy files to DIR"
+    )
+    add_cache_arguments(adaptive_parser)
+    add_dtype_argument(adaptive_parser)
 
     multilevel_parser = subparsers.add_parser(
         "multilevel", help="Multilevel Controller"
@@ -45,38 +341,596 @@ def main():
         "--a2", type=float, default=0.25, help="Parameter a2"
     )
     multilevel_parser.add_argument("--b2", type=float, default=1, help="Parameter b2")
+    multilevel_parser.add_argument(
+        "--seed", type=int, help="Random seed for reproducible runs"
+    )
+    add_plot_arguments(multilevel_parser)
+    add_profile_arguments(multilevel_parser)
+    multilevel_parser.add_argument(
+        "--save-signals",
+        metavar="DIR",
+        help="Save u, y and the connection matrix as .npy files to DIR",
+    )
+    add_cache_arguments(multilevel_parser)
+    add_dtype_argument(multilevel_parser)
+
+    sweep_parser = subparsers.add_parser("sweep", help="Monte-Carlo parameter sweep")
+    sweep_parser.add_argument(
+        "controller_type", choices=["adaptive", "multilevel"], help="Controller type"
+    )
+    sweep_parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        metavar="NAME=V1,V2",
+        help="Swept parameter and its values, can be repeated",
+    )
+    sweep_parser.add_argument(
+        "--repetitions", type=int, default=100, help="Monte-Carlo runs per point"
+    )
+    sweep_parser.add_argument(
+        "--samples", type=int, default=1000, help="Number of samples"
+    )
+    sweep_parser.add_argument("--length", type=int, default=6, help="Signal length")
+    sweep_parser.add_argument("--seed", type=int, default=0, help="Root random seed")
+    sweep_parser.add_argument("--workers", type=int, help="Number of processes")
+    sweep_parser.add_argument("--chunk-size", type=int, help="Runs per job")
+    sweep_parser.add_argument(
+        "--results-dir", help="Directory of finished jobs, used to resume a sweep"
+    )
+    sweep_parser.add_argument(
+        "--convergence-tolerance",
+        type=float,
+        help="Stop adaptive runs once the estimates change less than this",
+    )
+    sweep_parser.add_argument(
+        "--convergence-window",
+        type=int,
+        default=500,
+        help="Samples of the convergence window",
+    )
+    sweep_parser.add_argument("--output", help="Save the aggregated arrays to .npz")
+    add_cache_arguments(sweep_parser)
+    add_dtype_argument(sweep_parser)
+
+    identify_parser = subparsers.add_parser(
+        "identify", help="Identify parameters from recorded signals"
+    )
+    identify_parser.add_argument(
+        "controller_type", choices=["adaptive", "multilevel"], help="Controller type"
+    )
+    identify_parser.add_argument(
+        "--u", required=True, help="Input signal file (.npy, .npz or .csv)"
+    )
+    identify_parser.add_argument(
+        "--y", required=True, help="Output signal file (.npy, .npz or .csv)"
+    )
+    identify_parser.add_argument(
+        "--connection", help="Connection matrix file (multilevel only)"
+    )
+    identify_parser.add_argument(
+        "--forgetting_factor", type=float, default=1, help="Forgetting factor"
+    )
+    identify_parser.add_argument(
+        "--order", type=int, default=3, help="Number of FIR taps (adaptive only)"
+    )
+    identify_parser.add_argument(
+        "--mode",
+        choices=["standard", "sqrt"],
+        default="standard",
+        help="Covariance update of the recursive least squares",
+    )
+    add_method_arguments(identify_parser)
+    identify_parser.add_argument(
+        "--chunk-size", type=int, default=2**20, help="Samples processed at a time"
+    )
+    identify_parser.add_argument(
+        "--history", help="Write the parameter history to this .npy file"
+    )
+    add_profile_arguments(identify_parser)
+    identify_parser.add_argument(
+        "--estimates", help="Write the estimated parameters to this .npy file"
+    )
+    add_cache_arguments(identify_parser)
+    add_dtype_argument(identify_parser, default=None)
+
+    soak_parser = subparsers.add_parser(
+        "soak", help="Stream a long simulation into the streaming estimators"
+    )
+    soak_parser.add_argument(
+        "controller_type", choices=["adaptive", "multilevel"], help="Controller type"
+    )
+    soak_parser.add_argument(
+        "--samples", type=int, default=10**7, help="Number of samples"
+    )
+    soak_parser.add_argument(
+        "--chunk-size", type=int, default=2**16, help="Samples per chunk"
+    )
+    soak_parser.add_argument(
+        "--variance", type=float, default=0.1, help="Variance of the noise"
+    )
+    soak_parser.add_argument(
+        "--forgetting_factor", type=float, default=1, help="Forgetting factor"
+    )
+    soak_parser.add_argument(
+        "--mode",
+        choices=["standard", "sqrt"],
+        default="sqrt",
+        help="Covariance update of the recursive least squares",
+    )
+    soak_parser.add_argument("--seed", type=int, help="Random seed")
+    add_dtype_argument(soak_parser)
+
+    closed_loop_parser = subparsers.add_parser(
+        "closed-loop", help="Self-tuning control of many plants in closed loop"
+    )
+    closed_loop_parser.add_argument(
+        "--samples", type=int, default=1000, help="Number of samples"
+    )
+    closed_loop_parser.add_argument(
+        "--length", type=int, default=6, help="Signal length of the sine reference"
+    )
+    closed_loop_parser.add_argument(
+        "--runs", type=int, default=1000, help="Number of independent plants"
+    )
+    closed_loop_parser.add_argument(
+        "--variance", type=float, default=0.001, help="Variance of the output noise"
+    )
+    closed_loop_parser.add_argument(
+        "--coefficients",
+        type=float,
+        nargs="+",
+        default=[1, 0.5, 0.25],
+        help="FIR coefficients of the plants",
+    )
+    closed_loop_parser.add_argument(
+        "--forgetting_factor", type=float, default=1, help="Forgetting factor"
+    )
+    closed_loop_parser.add_argument(
+        "--mode",
+        choices=["standard", "sqrt"],
+        default="standard",
+        help="Covariance update of the recursive least squares",
+    )
+    closed_loop_parser.add_argument(
+        "--control-weight", type=float, default=0.1, help="Weight of the control effort"
+    )
+    closed_loop_parser.add_argument(
+        "--excitation",
+        type=float,
+        default=0.001,
+        help="Variance of the probing noise added to the control input",
+    )
+    closed_loop_parser.add_argument(
+        "--decimation", type=int, default=1, help="Samples between stored estimates"
+    )
+    closed_loop_parser.add_argument(
+        "--seed", type=int, help="Random seed for reproducible runs"
+    )
+    closed_loop_parser.add_argument(
+        "--output", help="Save the tracking error and estimates to this .npz file"
+    )
+    add_dtype_argument(closed_loop_parser)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Serve simulate and identify requests from a warm worker pool"
+    )
+    add_address_arguments(serve_parser)
+    serve_parser.add_argument("--workers", type=int, help="Number of processes")
+    serve_parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help="Queued requests before new ones are rejected as busy",
+    )
+    serve_parser.add_argument(
+        "--max-batch",
+        type=int,
+        default=DEFAULT_MAX_BATCH,
+        help="Largest number of requests run as one batch",
+    )
+    serve_parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=DEFAULT_BATCH_WINDOW * 1000,
+        help="Milliseconds to wait for more requests of a batch",
+    )
+    add_cache_arguments(serve_parser)
+
+    load_test_parser = subparsers.add_parser(
+        "load-test", help="Load-test the identification service"
+    )
+    load_test_parser.add_argument(
+        "controller_type", choices=["adaptive", "multilevel"], help="Controller type"
+    )
+    add_address_arguments(load_test_parser)
+    load_test_parser.add_argument(
+        "--requests", type=int, default=1000, help="Number of requests"
+    )
+    load_test_parser.add_argument(
+        "--concurrency", type=int, default=8, help="Number of concurrent clients"
+    )
+    load_test_parser.add_argument(
+        "--samples", type=int, default=1000, help="Samples of every request"
+    )
+    load_test_parser.add_argument(
+        "--order", type=int, default=3, help="Number of FIR taps (adaptive only)"
+    )
+    load_test_parser.add_argument(
+        "--workers",
+        type=int,
+        help="Processes of the service started for the test without an address",
+    )
+
+    benchmark_parser = subparsers.add_parser(
+        "benchmark", help="Benchmark throughput and memory against a baseline"
+    )
+    benchmark_parser.add_argument(
+        "--names", nargs="+", choices=list(BENCHMARKS), help="Benchmarks to run"
+    )
+    benchmark_parser.add_argument(
+        "--samples",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_SAMPLES),
+        help="Sample counts",
+    )
+    benchmark_parser.add_argument(
+        "--orders", type=int, nargs="+", default=list(DEFAULT_ORDERS), help="Orders"
+    )
+    benchmark_parser.add_argument(
+        "--runs",
+        type=int,
+        nargs="+",
+        default=list(DEFAULT_RUNS),
+        help="Numbers of stacked runs",
+    )
+    benchmark_parser.add_argument(
+        "--dtypes",
+        nargs="+",
+        choices=["float64", "float32"],
+        default=list(DEFAULT_DTYPES),
+        help="Floating point types of the signals",
+    )
+    benchmark_parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed calls of every case"
+    )
+    benchmark_parser.add_argument("--save", help="Save the results to this JSON file")
+    benchmark_parser.add_argument(
+        "--baseline", help="Compare against the results in this JSON file"
+    )
+    benchmark_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Largest accepted relative throughput drop against the baseline",
+    )
 
     args = parser.parse_args()
 
     if args.controller == "adaptive":
-        controller = AdaptiveController(args.samples, args.length)
+        cache = open_cache(args)
+        controller = AdaptiveController(args.samples, args.length, cache)
         u_signal, v_signal, y_signal, model_parameters, _, _ = controller.simulate(
-            args.variance, args.a0, args.a1, args.a2
+            args.variance,
+            args.a0,
+            args.a1,
+            args.a2,
+            coefficients=args.coefficients,
+            rng=args.seed,
+            method=args.convolution,
+            chunk_size=args.simulate_chunk_size,
+            dtype=args.dtype,
         )
-        estimated_param, param_hist = controller.identify(
-            u_signal, y_signal, args.forgetting_factor
+        if args.save_signals:
+            save_signals(args.save_signals, u=u_signal, y=y_signal)
+        identified = profile_identify(
+            args,
+            controller.identify,
+            u_signal,
+            y_signal,
+            args.forgetting_factor,
+            order=len(model_parameters),
+            mode=args.mode,
+            convergence_tolerance=args.convergence_tolerance,
+            convergence_window=args.convergence_window,
+            method=args.method,
+            block_size=args.block_size,
         )
-        print(f"True Parameters: a0: {args.a0}, a1: {args.a1}, a2: {args.a2}")
+        estimated_param, param_hist = identified[:2]
+        if args.convergence_tolerance is not None:
+            if identified[2] is None:
+                print("Did not converge")
+            else:
+                print(f"Converged after {identified[2]} samples")
         print(
-            f"Estimated Parameters: a0: {estimated_param[0][0]}, a1: {estimated_param[1][0]}, a2: {estimated_param[2][0]}"
+            "True Parameters: "
+            + ", ".join(f"a{i}: {value}" for i, value in enumerate(model_parameters))
         )
-        labels = ["$a_0$", "$a_1$", "$a_2$"]
-        unified_plot(
-            range(len(y_signal)), param_hist, labels, title="Parameter Estimation"
+        print(
+            "Estimated Parameters: "
+            + ", ".join(f"a{i}: {value[0]}" for i, value in enumerate(estimated_param))
         )
+        print_cache_stats(cache)
+        if not args.no_plot and param_hist is not None:
+            from utils.plotter import unified_plot
+
+            labels = [f"$a_{i}$" for i in range(len(model_parameters))]
+            samples = np.arange(param_hist.shape[1])
+            if args.method == "block":
+                samples = np.minimum((samples + 1) * args.block_size, len(y_signal)) - 1
+            unified_plot(
+                samples,
+                param_hist,
+                labels,
+                title="Parameter Estimation",
+                output=args.output,
+            )
 
     elif args.controller == "multilevel":
-        controller = MultilevelController(args.samples, args.length)
+        cache = open_cache(args)
+        controller = MultilevelController(args.samples, args.length, cache)
         u_signal, v_signal, y_signal, model_parameters, connection_matrix = (
-            controller.simulate(args.variance, args.a1, args.b1, args.a2, args.b2)
+            controller.simulate(
+                args.variance,
+                args.a1,
+                args.b1,
+                args.a2,
+                args.b2,
+                rng=args.seed,
+                dtype=args.dtype,
+            )
+        )
+        if args.save_signals:
+            save_signals(
+                args.save_signals,
+                u=u_signal,
+                y=y_signal,
+                connection=connection_matrix,
+            )
+        estimated_param = profile_identify(
+            args, controller.identify, u_signal, y_signal, connection_matrix
         )
-        estimated_param = controller.identify(u_signal, y_signal, connection_matrix)
         print(f"True Parameters: {model_parameters.flatten()}")
         print(f"Estimated Parameters: {np.concatenate(estimated_param)}")
-        true_values = model_parameters.flatten().tolist()
-        estimated_values = np.concatenate(estimated_param).tolist()
-        labels = ["$a_1$", "$b_1$", "$a_2$", "$b_2$"]
-        radar_plot(true_values, estimated_values, labels, title="Parameter Estimation")
+        print_cache_stats(cache)
+        if not args.no_plot:
+            from utils.plotter import radar_plot
+
+            true_values = model_parameters.flatten().tolist()
+            estimated_values = np.concatenate(estimated_param).tolist()
+            labels = ["$a_1$", "$b_1$", "$a_2$", "$b_2$"]
+            radar_plot(
+                true_values,
+                estimated_values,
+                labels,
+                title="Parameter Estimation",
+                output=args.output,
+            )
+
+    elif args.controller == "sweep":
+        grid = parameter_grid(**dict(parse_grid_axis(axis) for axis in args.param))
+        summary = run_sweep(
+            args.controller_type,
+            grid,
+            args.repetitions,
+            args.samples,
+            args.length,
+            seed=args.seed,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            results_dir=args.results_dir,
+            convergence_tolerance=args.convergence_tolerance,
+            convergence_window=args.convergence_window,
+            cache=open_cache(args),
+            dtype=args.dtype,
+        )
+        for point, params in enumerate(grid):
+            print(
+                f"{params}: bias: {summary['bias'][point]}, "
+                f"variance: {summary['variance'][point]}, "
+                f"convergence time: {summary['convergence_time'][point]}"
+            )
+        if args.output:
+            np.savez(args.output, **summary)
+
+    elif args.controller == "identify":
+        cache = open_cache(args)
+        u_signal = load_signal(args.u)
+        y_signal = load_signal(args.y)
+        if args.controller_type == "adaptive":
+            controller = AdaptiveController(len(y_signal), 0, cache)
+            estimated_param, _ = profile_identify(
+                args,
+                controller.identify,
+                u_signal,
+                y_signal,
+                args.forgetting_factor,
+                order=args.order,
+                mode=args.mode,
+                chunk_size=args.chunk_size,
+                history_path=args.history,
+                store_history=args.history is not None,
+                method=args.method,
+                block_size=args.block_size,
+                dtype=args.dtype,
+            )
+        else:
+            connection_matrix = (
+                np.array([[0, 1], [1, 0]])
+                if args.connection is None
+                else np.asarray(load_signal(args.connection))
+            )
+            controller = MultilevelController(y_signal.shape[-1], 0, cache)
+            estimated_param = profile_identify(
+                args,
+                controller.identify,
+                u_signal,
+                y_signal,
+                connection_matrix,
+                chunk_size=args.chunk_size,
+                dtype=args.dtype,
+            )
+        print(f"Estimated Parameters: {np.asarray(estimated_param).flatten()}")
+        print_cache_stats(cache)
+        if args.estimates:
+            np.save(args.estimates, estimated_param)
+
+    elif args.controller == "soak":
+        if args.controller_type == "adaptive":
+            controller = AdaptiveController(args.samples, 6)
+            estimator = StreamingEstimator(
+                forgetting_factor=args.forgetting_factor,
+                mode=args.mode,
+                dtype=args.dtype,
+            )
+        else:
+            controller = MultilevelController(args.samples, 6)
+            estimator = StreamingMultilevelEstimator(
+                np.array([[0, 1], [1, 0]]),
+                args.forgetting_factor,
+                args.mode,
+                args.dtype,
+            )
+        start = time.perf_counter()
+        for u_chunk, _, y_chunk in controller.simulate_stream(
+            args.variance, args.chunk_size, rng=args.seed, dtype=args.dtype
+        ):
+            estimator.update_batch(u_chunk, y_chunk)
+        seconds = time.perf_counter() - start
+        print(
+            f"Processed {estimator.samples_seen} samples in {seconds:.3f} s "
+            f"({estimator.samples_seen / seconds:.3g} samples/s)"
+        )
+        print(f"Estimated Parameters: {np.ravel(estimator.estimated_param)}")
+
+    elif args.controller == "closed-loop":
+        controller = AdaptiveController(args.samples, args.length)
+        start = time.perf_counter()
+        u_signal, tracking_error, param_hist, model_param = (
+            controller.simulate_closed_loop(
+                args.variance,
+                coefficients=args.coefficients,
+                runs=args.runs,
+                forgetting_factor=args.forgetting_factor,
+                mode=args.mode,
+                control_weight=args.control_weight,
+                excitation=args.excitation,
+                decimation=args.decimation,
+                rng=args.seed,
+                dtype=args.dtype,
+            )
+        )
+        seconds = time.perf_counter() - start
+        rms_error = np.sqrt(np.mean(np.square(tracking_error, dtype=float), axis=1))
+        print(
+            f"Simulated {args.runs} closed loops in {seconds:.3f} s "
+            f"({args.runs / seconds:.3g} runs/s)"
+        )
+        print(
+            f"RMS tracking error: mean {rms_error.mean():.4g}, "
+            f"max {rms_error.max():.4g}"
+        )
+        print(f"True Parameters: {model_param}")
+        print(f"Mean Estimated Parameters: {param_hist[:, :, -1].mean(axis=0)}")
+        if args.output:
+            np.savez(
+                args.output,
+                tracking_error=tracking_error,
+                param_hist=param_hist,
+                rms_error=rms_error,
+            )
+
+    elif args.controller == "serve":
+        address = service_address(args)
+        if address is None:
+            parser.error("serve requires --socket or --port")
+        service = IdentificationService(
+            address,
+            args.workers,
+            args.queue_size,
+            args.max_batch,
+            args.batch_window / 1000,
+            cache_directory=args.cache_dir,
+            cache_max_bytes=int(args.cache_size * 2**20),
+        )
+        with service:
+            print(f"Serving on {service.address} with {service.workers} workers")
+            try:
+                service.wait()
+            except KeyboardInterrupt:
+                pass
+            print(service.metrics())
+
+    elif args.controller == "load-test":
+        address = service_address(args)
+        with tempfile.TemporaryDirectory() as socket_dir:
+            if address is None:
+                service = IdentificationService(
+                    os.path.join(socket_dir, "service.sock"), args.workers
+                ).start()
+                address = service.address
+            else:
+                service = None
+            try:
+                results = run_load_test(
+                    address,
+                    args.controller_type,
+                    args.requests,
+                    args.concurrency,
+                    args.samples,
+                    args.order,
+                )
+            finally:
+                if service is not None:
+                    service.close()
+        latency = results["latency"]
+        print(
+            f"Completed {args.requests - results['failed']} of {args.requests} "
+            f"requests in {results['seconds']:.3f} s "
+            f"({results['throughput']:.3g} requests/s)"
+        )
+        if latency["mean"] is not None:
+            print(
+                f"Latency: mean {latency['mean'] * 1000:.2f} ms, "
+                f"p50 {latency['p50'] * 1000:.2f} ms, "
+                f"p95 {latency['p95'] * 1000:.2f} ms, "
+                f"p99 {latency['p99'] * 1000:.2f} ms"
+            )
+        service_metrics = results["service"]
+        print(
+            f"Service: {service_metrics['batches']} batches, mean batch size "
+            f"{service_metrics['mean_batch_size']:.2f}, "
+            f"{service_metrics['rejected']} rejected"
+        )
+
+    elif args.controller == "benchmark":
+        results = run_benchmarks(
+            args.names,
+            args.samples,
+            args.orders,
+            args.runs,
+            repeat=args.repeat,
+            dtypes=args.dtypes,
+            callback=lambda result: print(
+                f"{result['name']} samples: {result['samples']}, "
+                f"order: {result['order']}, runs: {result['runs']}, "
+                f"dtype: {result['dtype']}: "
+                f"{result['samples_per_second']:.3g} samples/s, "
+                f"peak memory: {result['peak_memory_bytes'] / 2**20:.1f} MiB"
+            ),
+        )
+        if args.save:
+            save_results(args.save, results)
+        if args.baseline:
+            comparison = compare_results(
+                results, load_results(args.baseline), args.threshold
+            )
+            for case in comparison:
+                status = "REGRESSION" if case["regression"] else "ok"
+                print(f"{case['case']}: {case['ratio']:.2f}x baseline {status}")
+            if any(case["regression"] for case in comparison):
+                parser.exit(1, "Throughput dropped below the baseline threshold\n")
 
 
 if __name__ == "__main__":
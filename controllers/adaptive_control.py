@@ -1,5 +1,28 @@
 import numpy as np
-from utils.signal_utils import generate_noise, generate_sin, generate_noise_signal
+from utils.signal_utils import (
+    FIRFilter,
+    fir_filter,
+    float_dtype,
+    generate_noise,
+    generate_noise_chunks,
+    generate_sin,
+    generate_noise_signal,
+    make_rng,
+)
+from utils.cache import cached
+from utils.instrumentation import chunk_bounds, timed
+from controllers.rls import (
+    batch_rls_update,
+    block_rls_fir,
+    chunk_regressor,
+    closed_loop_kernel,
+    covariance_trace,
+    fir_regressor,
+    has_converged,
+    init_rls_state,
+    least_squares_fir,
+    rls_kernel,
+)
 
 
 class AdaptiveController:
@@ -7,18 +30,34 @@ class AdaptiveController:
     Class for adaptive control system simulation and parameter identification.
     """
 
-    def __init__(self, samples_number, signal_length):
+    def __init__(self, samples_number, signal_length, cache=None):
         """
         Initialize the AdaptiveController.
 
         Args:
             samples_number (int): Number of samples.
             signal_length (int): Length of the signal.
+            cache (ResultCache, optional): On-disk cache of the results of
+                seeded simulations and of identifications.
         """
         self.samples_number = samples_number
         self.signal_length = signal_length
+        self.cache = cache
 
-    def simulate(self, variance, a0=1, a1=2, a2=3):
+    @cached(seed="rng")
+    def simulate(
+        self,
+        variance,
+        a0=1,
+        a1=2,
+        a2=3,
+        coefficients=None,
+        rng=None,
+        runs=None,
+        method="auto",
+        chunk_size=None,
+        dtype=float,
+    ):
         """
         Simulate the adaptive control system.
 
@@ -27,21 +66,218 @@ class AdaptiveController:
             a0 (float): Parameter a0.
             a1 (float): Parameter a1.
             a2 (float): Parameter a2.
+            coefficients (array_like, optional): FIR coefficients of arbitrary length.
+                When given, they replace a0, a1 and a2.
+            rng (Generator or int, optional): Random number generator or seed.
+            runs (int, optional): Number of independent runs. Signals are returned
+                as (runs, samples) when given.
+            method (str): Convolution of the plant, 'direct', 'fft' (overlap-add)
+                or 'auto' to use FFT for long FIR models, as in fir_filter.
+            chunk_size (int, optional): Filter the input in chunks of this many
+                samples, carrying the filter state across chunks, so that the
+                convolution of long plants needs memory bounded by the chunk.
+            dtype (data-type): Floating point type of the signals, e.g. np.float32
+                to halve their memory; the model parameters stay float64.
 
         Returns:
             tuple: u_signal, v_signal, y_signal, model_param, x, sin
         """
-        sin, x = generate_sin(self.samples_number, self.signal_length)
-        model_param = np.array([a0, a1, a2])
+        rng = make_rng(rng)
+        sin, x = generate_sin(self.samples_number, self.signal_length, dtype)
+        if coefficients is None:
+            model_param = np.array([a0, a1, a2])
+        else:
+            model_param = np.asarray(coefficients, dtype=float)
 
-        u_signal = generate_noise(self.samples_number, variance)
-        v_signal = np.convolve(u_signal, model_param, mode="full")[: len(u_signal)]
-        noise = generate_noise(self.samples_number, variance)
+        u_signal = generate_noise(self.samples_number, variance, rng, runs, dtype)
+        if chunk_size is None:
+            v_signal = fir_filter(u_signal, model_param, method)
+        else:
+            plant = FIRFilter(model_param, u_signal.shape[:-1] or None, method, dtype)
+            v_signal = np.empty_like(u_signal)
+            for start in range(0, self.samples_number, chunk_size):
+                v_signal[..., start : start + chunk_size] = plant.filter_chunk(
+                    u_signal[..., start : start + chunk_size]
+                )
+        noise = generate_noise(self.samples_number, variance, rng, runs, dtype)
         y_signal = generate_noise_signal(v_signal, noise)
 
         return u_signal, v_signal, y_signal, model_param, x, sin
 
-    def identify(self, input_signal, output_signal, forgetting_factor):
+    def simulate_stream(
+        self,
+        variance,
+        chunk_size,
+        a0=1,
+        a1=2,
+        a2=3,
+        coefficients=None,
+        rng=None,
+        runs=None,
+        method="auto",
+        dtype=float,
+    ):
+        """
+        Simulate the adaptive control system chunk by chunk.
+
+        Streaming counterpart of simulate, in memory bounded by chunk_size for
+        any number of samples. The plant state is carried across chunks by an
+        FIRFilter. With the default PCG64 generator the concatenated chunks
+        equal the signals of simulate for the same rng.
+
+        Args:
+            variance (float): Variance of the noise.
+            chunk_size (int): Number of samples of every chunk.
+            a0, a1, a2, coefficients, rng, runs, method, dtype: As in simulate.
+
+        Yields:
+            tuple: u_chunk, v_chunk, y_chunk of shape (chunk,) or (runs, chunk).
+        """
+        rng = make_rng(rng)
+        if coefficients is None:
+            model_param = np.array([a0, a1, a2])
+        else:
+            model_param = np.asarray(coefficients, dtype=float)
+
+        u_chunks = generate_noise_chunks(
+            self.samples_number, variance, chunk_size, rng, runs, dtype
+        )
+        noise_chunks = generate_noise_chunks(
+            self.samples_number, variance, chunk_size, rng, runs, dtype
+        )
+        plant = FIRFilter(model_param[: self.samples_number], runs, method, dtype)
+
+        for u_chunk, noise_chunk in zip(u_chunks, noise_chunks):
+            v_chunk = plant.filter_chunk(u_chunk)
+            yield u_chunk, v_chunk, generate_noise_signal(v_chunk, noise_chunk)
+
+    @cached(seed="rng")
+    def simulate_closed_loop(
+        self,
+        variance,
+        a0=1,
+        a1=0.5,
+        a2=0.25,
+        coefficients=None,
+        runs=None,
+        forgetting_factor=1,
+        mode="standard",
+        control_weight=0.1,
+        excitation=0.001,
+        reference=None,
+        decimation=1,
+        rng=None,
+        dtype=float,
+    ):
+        """
+        Simulate self-tuning control of the FIR plant in closed loop.
+
+        At every sample the control input is computed from the current RLS
+        estimate by a certainty-equivalence law, the weighted one-step-ahead
+        controller driving the predicted output to the reference (see
+        closed_loop_kernel), and the estimate is then updated with the
+        measured output. Many independent plants are simulated at once, with
+        a compiled loop when numba is installed and vectorized over runs
+        otherwise.
+
+        Args:
+            variance (float): Variance of the output noise.
+            a0 (float): Parameter a0.
+            a1 (float): Parameter a1.
+            a2 (float): Parameter a2.
+            coefficients (array_like, optional): FIR coefficients of the plant,
+                of shape (order,) or (runs, order) for a different plant per
+                run. When given, they replace a0, a1 and a2.
+            runs (int, optional): Number of independent closed loops. Signals
+                are returned as (runs, samples) when given or when coefficients
+                has one row per run.
+            forgetting_factor (float): Forgetting factor of the estimators.
+            mode (str): 'standard' or 'sqrt' covariance update, as in identify.
+            control_weight (float): Positive weight of the control effort. The
+                loop tracks the reference without it, but it bounds the input
+                while the estimate of a0 is small, and plants with zeros outside
+                the unit circle need it large enough to stay stable.
+            excitation (float): Variance of the probing noise added to the
+                control input, which keeps the closed loop identifiable.
+            reference (ndarray, optional): Reference of shape (samples,), by
+                default the sine wave of generate_sin.
+            decimation (int): Number of samples between stored estimates.
+            rng (Generator or int, optional): Random number generator or seed.
+            dtype (data-type): Floating point type of the signals and estimators.
+
+        Returns:
+            tuple: u_signal, tracking_error, param_hist, model_param;
+            tracking_error is the reference minus the plant output, of shape
+            (runs, samples), and param_hist holds the estimates every decimation
+            samples, of shape (runs, order, samples // decimation).
+        """
+        if control_weight <= 0:
+            raise ValueError("control_weight must be positive")
+        rng = make_rng(rng)
+        if reference is None:
+            reference, _ = generate_sin(self.samples_number, self.signal_length, dtype)
+        elif np.shape(reference) != (self.samples_number,):
+            raise ValueError("reference must hold one value per sample")
+        if coefficients is None:
+            model_param = np.array([a0, a1, a2])
+        else:
+            model_param = np.asarray(coefficients, dtype=float)
+        batched = runs is not None or model_param.ndim == 2
+        runs = runs or (len(model_param) if model_param.ndim == 2 else 1)
+        order = model_param.shape[-1]
+        model_params = np.broadcast_to(model_param, (runs, order))
+
+        noise = generate_noise(self.samples_number, variance, rng, runs, dtype)
+        probing = generate_noise(self.samples_number, excitation, rng, runs, dtype)
+        estimated_param, weight_function = init_rls_state(order, mode=mode, dtype=dtype)
+        estimated_params = np.tile(estimated_param, (runs, 1))
+        weight_functions = np.tile(weight_function, (runs, 1, 1))
+        u_signal = np.empty((runs, self.samples_number), dtype=dtype)
+        tracking_error = np.empty_like(u_signal)
+        param_hist = np.empty(
+            (runs, order, self.samples_number // decimation), dtype=dtype
+        )
+        closed_loop_kernel(
+            reference,
+            model_params,
+            noise,
+            probing,
+            control_weight,
+            forgetting_factor,
+            estimated_params,
+            weight_functions,
+            u_signal,
+            tracking_error,
+            param_hist,
+            mode,
+            decimation,
+        )
+
+        # the kernel stores the plant output, turned into the error in place
+        np.subtract(reference, tracking_error, out=tracking_error)
+        if not batched:
+            return u_signal[0], tracking_error[0], param_hist[0], model_param
+        return u_signal, tracking_error, param_hist, model_param
+
+    @cached(side_effects=("history_path", "instrumentation"), ignore=("chunk_size",))
+    def identify(
+        self,
+        input_signal,
+        output_signal,
+        forgetting_factor,
+        order=3,
+        mode="standard",
+        dtype=None,
+        chunk_size=None,
+        history_path=None,
+        instrumentation=None,
+        convergence_tolerance=None,
+        convergence_window=500,
+        convergence_criterion="change",
+        method="rls",
+        block_size=1024,
+        store_history=True,
+    ):
         """
         Identify model parameters using recursive least squares.
 
@@ -49,39 +285,234 @@ class AdaptiveController:
             input_signal (ndarray): Input signal.
             output_signal (ndarray): Output signal.
             forgetting_factor (float): Forgetting factor for the algorithm.
+            order (int): Number of FIR taps to estimate.
+            mode (str): 'standard' covariance update or 'sqrt' for the square-root
+                update that stays positive definite with forgetting_factor < 1.
+            dtype (data-type, optional): Floating point type of the regressors,
+                estimates and history, by default that of a floating point
+                output_signal, so float32 signals are identified in float32.
+                The 'batch' and 'block' methods accumulate their normal
+                equations in float64 and only return dtype.
+            chunk_size (int, optional): Process the signals in chunks of this many
+                samples, so that memory-mapped signals are never loaded fully.
+            history_path (str, optional): Write param_hist to this .npy file,
+                memory-mapped, instead of keeping it in memory.
+            instrumentation (Instrumentation, optional): Times the 'regressor',
+                'update' (covariance, estimate and history store) and 'history'
+                (allocation and flush) phases, and receives the estimate and the
+                covariance trace every instrumentation.interval samples.
+            convergence_tolerance (float, optional): Stop once the estimates have
+                converged, checking the criterion at the end of every window of
+                convergence_window samples.
+            convergence_window (int): Number of samples of the convergence window.
+            convergence_criterion (str): 'change' when every estimate in the
+                window is within the tolerance of the last one, or 'trace' when
+                the trace of the weight function is below the tolerance.
+            method (str): 'rls' for the sample-wise update; 'batch' to solve the
+                least-squares problem that RLS converges to directly, from
+                correlation sums (computed with FFT for many taps); or 'block'
+                to update the estimate over blocks of block_size samples. Both
+                give the RLS estimate up to rounding; mode, chunk_size,
+                history_path, instrumentation and early stopping apply to
+                'rls' only.
+            block_size (int): Number of samples of every block in 'block' method.
+            store_history (bool): Keep the estimate after every sample. When
+                False param_hist is None, and memory no longer grows with the
+                number of samples ('rls' method only).
 
         Returns:
-            tuple: estimated_param, param_hist
+            tuple: estimated_param, param_hist; with convergence_tolerance also the
+            convergence index, the number of samples processed before stopping
+            (None when the estimates did not converge). param_hist is then
+            truncated to the convergence index. In 'batch' method param_hist is
+            None, and in 'block' method it holds the estimate at the end of every
+            block, of shape (order, blocks).
         """
-        estimated_param = np.zeros((3, 1))
-        weight_function = np.eye(3) * 10**3
-        param_hist = np.zeros((3, len(output_signal)))
-
-        regressor_vector = np.vstack(
-            [
-                np.array([input_signal[i], input_signal[i - 1], input_signal[i - 2]])
-                for i in range(2, len(input_signal))
-            ]
+        dtype = float_dtype(output_signal, dtype)
+        if method != "rls":
+            if convergence_tolerance is not None:
+                raise ValueError("Early stopping requires method='rls'")
+            if method == "batch":
+                estimated_param = least_squares_fir(
+                    input_signal, output_signal, order, forgetting_factor
+                )
+                return estimated_param.astype(dtype).reshape(-1, 1), None
+            if method == "block":
+                estimated_param, param_hist = block_rls_fir(
+                    input_signal, output_signal, order, forgetting_factor, block_size
+                )
+                return (
+                    estimated_param.astype(dtype).reshape(-1, 1),
+                    param_hist.astype(dtype),
+                )
+            raise ValueError(f"Unknown identification method: {method}")
+
+        if not store_history and history_path is not None:
+            raise ValueError("history_path requires store_history")
+
+        estimated_param, weight_function = init_rls_state(order, mode=mode, dtype=dtype)
+        samples = len(output_signal)
+        with timed(instrumentation, "history"):
+            if not store_history:
+                param_hist = None
+            elif history_path is None:
+                param_hist = np.zeros((order, samples), dtype=dtype)
+            else:
+                param_hist = np.lib.format.open_memmap(
+                    history_path, mode="w+", dtype=dtype, shape=(order, samples)
+                )
+
+        convergence_index = None
+        window = convergence_window if convergence_tolerance is not None else None
+        # without a history, the estimates of the current convergence window
+        # (chunks never cross a window boundary)
+        window_hist = (
+            np.zeros((order, window), dtype=dtype)
+            if window and param_hist is None
+            else None
         )
+        past_inputs = np.zeros(order - 1, dtype=dtype)
+        for start, stop in chunk_bounds(samples, chunk_size, instrumentation, window):
+            with timed(instrumentation, "regressor"):
+                regressor_matrix, past_inputs = chunk_regressor(
+                    past_inputs, input_signal[start:stop], order, dtype
+                )
+            if param_hist is not None:
+                chunk_hist = param_hist[:, start:stop]
+            elif window_hist is not None:
+                chunk_hist = window_hist[
+                    :, start % window : start % window + stop - start
+                ]
+            else:
+                chunk_hist = None
+            with timed(instrumentation, "update"):
+                rls_kernel(
+                    regressor_matrix,
+                    output_signal[start:stop],
+                    forgetting_factor,
+                    estimated_param,
+                    weight_function,
+                    chunk_hist,
+                    mode,
+                )
+            if instrumentation is not None:
+                instrumentation.progress(
+                    stop,
+                    lambda: (
+                        estimated_param.copy(),
+                        covariance_trace(weight_function, mode),
+                    ),
+                )
+            if window and stop % window == 0:
+                if has_converged(
+                    (
+                        window_hist
+                        if param_hist is None
+                        else param_hist[:, stop - window : stop]
+                    ),
+                    weight_function,
+                    convergence_tolerance,
+                    convergence_criterion,
+                    mode,
+                ):
+                    convergence_index = stop
+                    break
 
-        regressor_vector = np.vstack(
-            [
-                [input_signal[1], input_signal[0], 0],
-                [input_signal[0], 0, 0],
-                regressor_vector,
-            ]
+        if history_path is not None:
+            with timed(instrumentation, "history"):
+                param_hist.flush()
+        if convergence_tolerance is None:
+            return estimated_param.reshape(-1, 1), param_hist
+        if param_hist is not None:
+            param_hist = param_hist[:, : convergence_index or samples]
+        return estimated_param.reshape(-1, 1), param_hist, convergence_index
+
+    @cached()
+    def identify_batch(
+        self,
+        input_signals,
+        output_signals,
+        forgetting_factors,
+        order=3,
+        mode="standard",
+        dtype=None,
+        convergence_tolerance=None,
+        convergence_window=500,
+        convergence_criterion="change",
+    ):
+        """
+        Identify model parameters of many runs at once using recursive least squares.
+
+        Every run is updated in the same vectorized step, so the result for each
+        run matches what identify returns for that run alone.
+
+        Args:
+            input_signals (ndarray): Input signals stacked as (runs, samples).
+            output_signals (ndarray): Output signals stacked as (runs, samples).
+            forgetting_factors (float or ndarray): Forgetting factor shared by all
+                runs or one value per run.
+            order (int): Number of FIR taps to estimate.
+            mode (str): 'standard' or 'sqrt' covariance update, as in identify.
+            dtype (data-type, optional): Floating point type of the estimates and
+                history, by default that of the output signals, as in identify.
+            convergence_tolerance (float, optional): Stop every run once its
+                estimates have converged, as in identify. The loop ends when all
+                runs have converged.
+            convergence_window (int): Number of samples of the convergence window.
+            convergence_criterion (str): 'change' or 'trace', as in identify.
+
+        Returns:
+            tuple: estimated_params of shape (runs, order, 1),
+            param_hist of shape (runs, order, samples); with convergence_tolerance
+            also the convergence indices of shape (runs,), -1 for runs that did
+            not converge. The estimate of a converged run is the one at its
+            convergence index, and param_hist is truncated to the largest index
+            once all runs have converged.
+        """
+        dtype = float_dtype(output_signals, dtype)
+        input_signals = np.atleast_2d(np.asarray(input_signals, dtype=dtype))
+        output_signals = np.atleast_2d(np.asarray(output_signals, dtype=dtype))
+        runs, samples = output_signals.shape
+        forgetting_factors = np.broadcast_to(
+            np.asarray(forgetting_factors, dtype=dtype), (runs,)
         )
 
-        for i in range(len(output_signal)):
-            rv_n = regressor_vector[i].reshape(-1, 1)
-            weight_function = (1 / forgetting_factor) * (
-                weight_function
-                - (weight_function @ rv_n @ rv_n.T @ weight_function)
-                / (forgetting_factor + rv_n.T @ weight_function @ rv_n)
-            )
-            estimated_param = estimated_param + weight_function @ rv_n @ (
-                output_signal[i] - rv_n.T @ estimated_param
+        estimated_param, weight_function = init_rls_state(order, mode=mode, dtype=dtype)
+        estimated_params = np.tile(estimated_param, (runs, 1))
+        weight_functions = np.tile(weight_function, (runs, 1, 1))
+        param_hist = np.zeros((runs, order, samples), dtype=dtype)
+
+        convergence_indices = np.full(runs, -1)
+        regressor_vectors = fir_regressor(input_signals, order, dtype)
+
+        for i in range(samples):
+            weight_functions = batch_rls_update(
+                regressor_vectors[:, i],
+                output_signals[:, i],
+                forgetting_factors,
+                estimated_params,
+                weight_functions,
+                mode,
             )
-            param_hist[:, i] = estimated_param.flatten()
+            param_hist[:, :, i] = estimated_params
+
+            if convergence_tolerance is not None and (i + 1) % convergence_window == 0:
+                converged = has_converged(
+                    param_hist[:, :, i + 1 - convergence_window : i + 1],
+                    weight_functions,
+                    convergence_tolerance,
+                    convergence_criterion,
+                    mode,
+                )
+                convergence_indices[converged & (convergence_indices < 0)] = i + 1
+                if (convergence_indices > 0).all():
+                    param_hist = param_hist[:, :, : i + 1]
+                    break
 
-        return estimated_param, param_hist
+        if convergence_tolerance is None:
+            return estimated_params[:, :, None], param_hist
+        converged = convergence_indices > 0
+        estimated_params[converged] = param_hist[
+            converged, :, convergence_indices[converged] - 1
+        ]
+        return estimated_params[:, :, None], param_hist, convergence_indices
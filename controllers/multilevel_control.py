@@ -1,5 +1,127 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-from utils.signal_utils import generate_noise, generate_noise_signal
+from utils.signal_utils import (
+    float_dtype,
+    generate_noise,
+    generate_noise_chunks,
+    generate_noise_signal,
+    lagged_regressor,
+    make_rng,
+)
+from utils.cache import cached
+from utils.instrumentation import chunk_bounds, timed
+from controllers.rls import init_rls_state, rls_kernel
+
+# Number of right-hand side columns of the dense interconnection system solved
+# at a time.
+SOLVE_BLOCK = 2**16
+
+
+def _is_sparse(connection_matrix):
+    # a sparse matrix can only exist once the caller has imported scipy.sparse,
+    # so scipy (optional) is never imported here for dense inputs
+    sparse = sys.modules.get("scipy.sparse")
+    return sparse is not None and sparse.issparse(connection_matrix)
+
+
+def _connect(connection_matrix, signals):
+    """
+    Apply the connection matrix to signals of shape (..., subsystems, samples),
+    in the floating point type of the signals.
+    """
+    if connection_matrix.dtype != signals.dtype:
+        connection_matrix = connection_matrix.astype(signals.dtype)
+    moved = np.moveaxis(signals, -2, 0)
+    connected = connection_matrix @ moved.reshape(moved.shape[0], -1)
+    return np.moveaxis(np.asarray(connected).reshape(moved.shape), 0, -2)
+
+
+def _interconnection_solver(a, connection_matrix, dtype=float):
+    """
+    Return a function solving (I - A H) z = right_hand_side for right-hand sides
+    of shape (subsystems, columns), with the system in the floating point type
+    dtype. Sparse systems are factorized once with a sparse LU, so streamed
+    chunks reuse the factorization. Dense systems are solved with
+    np.linalg.solve, which factorizes them again for every block of columns:
+    O(subsystems^3) next to the O(subsystems^2 * columns) of the solve, and
+    scipy stays optional for dense connections.
+    """
+    if _is_sparse(connection_matrix):
+        from scipy import sparse
+        from scipy.sparse.linalg import splu
+
+        system = sparse.identity(len(a), format="csc") - sparse.diags(a) @ (
+            connection_matrix
+        )
+        return splu(sparse.csc_matrix(system, dtype=dtype)).solve
+    system = (np.eye(len(a)) - a[:, None] * connection_matrix).astype(dtype)
+
+    def solve(right_hand_side):
+        # np.linalg.solve works on float64 copies of float32 operands, so the
+        # columns are solved in blocks to keep those copies small
+        solution = np.empty_like(right_hand_side)
+        for start in range(0, right_hand_side.shape[-1], SOLVE_BLOCK):
+            block = slice(start, start + SOLVE_BLOCK)
+            solution[:, block] = np.linalg.solve(system, right_hand_side[:, block])
+        return solution
+
+    return solve
+
+
+def _interconnection_response(solve, b, u_signal, noise):
+    """
+    Compute the noiseless and noisy outputs of the interconnected subsystems,
+    solving for B u and the noise with the same factorization.
+    """
+    subsystems = len(b)
+    b = b.astype(u_signal.dtype)
+    right_hand_side = np.moveaxis(np.stack([b[:, None] * u_signal, noise]), -2, 0)
+    response = solve(right_hand_side.reshape(subsystems, -1)).reshape(
+        right_hand_side.shape
+    )
+    v_signal, noise_response = np.moveaxis(response, 0, -2)
+    return v_signal, generate_noise_signal(v_signal, noise_response)
+
+
+def _subsystem_regressors(x_estimated, input_signal):
+    """
+    Build the regressors [x_i(n), u_i(n)] of every subsystem, of shape
+    (..., subsystems, samples, 2).
+    """
+    return lagged_regressor(np.stack([x_estimated, input_signal], axis=-2), [1, 1])
+
+
+def _normal_equations(x_estimated, input_signal, output_signal):
+    """
+    Form the normal equations of every subsystem with regressors [x_i, u_i].
+
+    The regressors are kept as (2, samples) rows rather than the
+    (samples, 2) layout of _subsystem_regressors, which halves the time of the
+    matrix products.
+    """
+    input_matrix = np.stack([x_estimated, input_signal], axis=-2)
+    normal_matrix = input_matrix @ np.swapaxes(input_matrix, -1, -2)
+    moment_vector = input_matrix @ output_signal[..., None]
+    return normal_matrix, moment_vector
+
+
+def _solve_normal_equations(normal_matrix, moment_vector):
+    """
+    Solve the normal equations of every subsystem with a Cholesky factorization.
+
+    Falls back to the minimum-norm solution when a subsystem is not
+    identifiable, e.g. when it receives no interconnection signal.
+    """
+    try:
+        lower = np.linalg.cholesky(normal_matrix)
+    except np.linalg.LinAlgError:
+        return (np.linalg.pinv(normal_matrix) @ moment_vector)[..., 0]
+    estimated_param = np.linalg.solve(
+        np.swapaxes(lower, -1, -2), np.linalg.solve(lower, moment_vector)
+    )
+    return estimated_param[..., 0]
 
 
 class MultilevelController:
@@ -7,89 +129,295 @@ class MultilevelController:
     Class for multilevel control system simulation and parameter identification.
     """
 
-    def __init__(self, samples_number, signal_length):
+    def __init__(self, samples_number, signal_length, cache=None):
         """
         Initialize the MultilevelController.
 
         Args:
             samples_number (int): Number of samples.
             signal_length (int): Length of the signal.
+            cache (ResultCache, optional): On-disk cache of the results of
+                seeded simulations and of identifications.
         """
         self.samples_number = samples_number
         self.signal_length = signal_length
+        self.cache = cache
 
-    def simulate(self, variance, a1=0.5, b1=1, a2=0.25, b2=1):
+    @cached(seed="rng")
+    def simulate(
+        self,
+        variance,
+        a1=0.5,
+        b1=1,
+        a2=0.25,
+        b2=1,
+        rng=None,
+        runs=None,
+        a=None,
+        b=None,
+        connection_matrix=None,
+        dtype=float,
+    ):
         """
         Simulate the multilevel control system.
 
+        By default the system has two subsystems connected to each other. Any
+        number of subsystems can be simulated by passing the vectors a and b
+        together with a connection matrix, which may be a scipy.sparse matrix.
+
         Args:
             variance (float): Variance of the noise.
             a1 (float): Parameter a1.
             b1 (float): Parameter b1.
             a2 (float): Parameter a2.
             b2 (float): Parameter b2.
+            rng (Generator or int, optional): Random number generator or seed.
+            runs (int, optional): Number of independent runs. Signals are returned
+                as (runs, subsystems, samples) when given.
+            a (array_like, optional): Parameters a_i of every subsystem, replacing a1, a2.
+            b (array_like, optional): Parameters b_i of every subsystem, replacing b1, b2.
+            connection_matrix (ndarray or sparse matrix, optional): Connection matrix H
+                of shape (subsystems, subsystems).
+            dtype (data-type): Floating point type of the signals and of the
+                interconnection solve; the model parameters stay float64.
 
         Returns:
             tuple: u_signal, v_signal, y_signal, model_param, connection_matrix
         """
-        model_param = np.array([[a1, b1], [a2, b2]])
-        u_signal = np.array(
-            [
-                generate_noise(self.samples_number, variance),
-                generate_noise(self.samples_number, variance),
-            ]
-        )
-        noise = np.array(
-            [
-                generate_noise(self.samples_number, variance),
-                generate_noise(self.samples_number, variance),
-            ]
+        rng = make_rng(rng)
+        a, b, connection_matrix = self._subsystem_model(
+            a1, b1, a2, b2, a, b, connection_matrix
         )
+        subsystems = len(a)
 
-        identity_matrix = np.eye(2)
-        A = np.array([[a1, 0], [0, a2]])
-        B = np.array([[b1, 0], [0, b2]])
-        connection_matrix = np.array([[0, 1], [1, 0]])
+        model_param = np.column_stack([a, b])
+        shape = subsystems if runs is None else (runs, subsystems)
+        u_signal = generate_noise(self.samples_number, variance, rng, shape, dtype)
+        noise = generate_noise(self.samples_number, variance, rng, shape, dtype)
 
-        v_signal = np.linalg.inv(identity_matrix - A @ connection_matrix) @ B @ u_signal
-        y_signal = (
-            v_signal + np.linalg.inv(identity_matrix - A @ connection_matrix) @ noise
+        # B u and the noise are solved together, as the columns of one system
+        v_signal, y_signal = _interconnection_response(
+            _interconnection_solver(a, connection_matrix, dtype), b, u_signal, noise
         )
 
         return u_signal, v_signal, y_signal, model_param, connection_matrix
 
-    def identify(self, input_signal, output_signal, connection_matrix):
+    def simulate_stream(
+        self,
+        variance,
+        chunk_size,
+        a1=0.5,
+        b1=1,
+        a2=0.25,
+        b2=1,
+        rng=None,
+        runs=None,
+        a=None,
+        b=None,
+        connection_matrix=None,
+        dtype=float,
+    ):
+        """
+        Simulate the multilevel control system chunk by chunk.
+
+        Streaming counterpart of simulate, in memory bounded by chunk_size for
+        any number of samples. A sparse interconnection is solved with the same
+        sparse LU factorization for every chunk; a dense one is solved chunk by
+        chunk with np.linalg.solve. With the default PCG64 generator the
+        concatenated chunks equal the signals of simulate for the same rng.
+
+        Args:
+            variance (float): Variance of the noise.
+            chunk_size (int): Number of samples of every chunk.
+            a1, b1, a2, b2, rng, runs, a, b, connection_matrix, dtype: As in
+                simulate.
+
+        Yields:
+            tuple: u_chunk, v_chunk, y_chunk of shape (subsystems, chunk) or
+            (runs, subsystems, chunk).
+        """
+        rng = make_rng(rng)
+        a, b, connection_matrix = self._subsystem_model(
+            a1, b1, a2, b2, a, b, connection_matrix
+        )
+        shape = len(a) if runs is None else (runs, len(a))
+        u_chunks = generate_noise_chunks(
+            self.samples_number, variance, chunk_size, rng, shape, dtype
+        )
+        noise_chunks = generate_noise_chunks(
+            self.samples_number, variance, chunk_size, rng, shape, dtype
+        )
+        solve = _interconnection_solver(a, connection_matrix, dtype)
+
+        for u_chunk, noise_chunk in zip(u_chunks, noise_chunks):
+            v_chunk, y_chunk = _interconnection_response(solve, b, u_chunk, noise_chunk)
+            yield u_chunk, v_chunk, y_chunk
+
+    @staticmethod
+    def _subsystem_model(a1, b1, a2, b2, a, b, connection_matrix):
+        a = np.asarray([a1, a2] if a is None else a, dtype=float)
+        b = np.asarray([b1, b2] if b is None else b, dtype=float)
+        if connection_matrix is None:
+            connection_matrix = np.array([[0, 1], [1, 0]])
+        subsystems = len(a)
+        if len(b) != subsystems or connection_matrix.shape != (subsystems,) * 2:
+            raise ValueError(
+                "a, b and connection_matrix must describe the same number of subsystems"
+            )
+        return a, b, connection_matrix
+
+    @cached(side_effects=("instrumentation",), ignore=("workers", "chunk_size"))
+    def identify(
+        self,
+        input_signal,
+        output_signal,
+        connection_matrix,
+        workers=None,
+        chunk_size=None,
+        instrumentation=None,
+        dtype=None,
+    ):
         """
         Identify model parameters using least squares method.
 
+        The normal equations of every subsystem are solved with a Cholesky
+        factorization instead of an explicit inverse.
+
         Args:
-            input_signal (ndarray): Input signals.
-            output_signal (ndarray): Output signals.
-            connection_matrix (ndarray): Connection matrix.
+            input_signal (ndarray): Input signals, (subsystems, samples) or
+                (runs, subsystems, samples).
+            output_signal (ndarray): Output signals of the same shape.
+            connection_matrix (ndarray or sparse matrix): Connection matrix.
+            workers (int, optional): Number of threads sharing the subsystems.
+            chunk_size (int, optional): Accumulate the normal equations over chunks
+                of this many samples, so that memory-mapped signals are never
+                loaded fully into memory.
+            instrumentation (Instrumentation, optional): Times the 'regressor'
+                (interconnection signal), 'normal_equations' and 'solve' phases,
+                and receives the estimates and the traces of their covariances
+                every instrumentation.interval samples.
+            dtype (data-type, optional): Floating point type of the normal
+                equations and estimates, by default that of a floating point
+                output_signal.
 
         Returns:
-            list: Estimated parameters.
+            ndarray: Estimated parameters [a_i, b_i] of every subsystem, of shape
+            (subsystems, 2) or (runs, subsystems, 2).
         """
-        x_estimated = np.array(
-            [
-                connection_matrix[0] @ output_signal,
-                connection_matrix[1] @ output_signal,
-            ]
-        )
-        input_matrix = np.array(
-            [
-                [x_estimated[0], input_signal[0]],
-                [x_estimated[1], input_signal[1]],
-            ]
+        samples = output_signal.shape[-1]
+        dtype = float_dtype(output_signal, dtype)
+        normal_matrix, moment_vector = 0, 0
+
+        for start, stop in chunk_bounds(samples, chunk_size, instrumentation):
+            input_chunk = np.asarray(input_signal[..., start:stop], dtype=dtype)
+            output_chunk = np.asarray(output_signal[..., start:stop], dtype=dtype)
+            with timed(instrumentation, "regressor"):
+                x_chunk = _connect(connection_matrix, output_chunk)
+            with timed(instrumentation, "normal_equations"):
+                chunk_normal, chunk_moment = self._subsystem_normal_equations(
+                    x_chunk, input_chunk, output_chunk, workers
+                )
+                normal_matrix = normal_matrix + chunk_normal
+                moment_vector = moment_vector + chunk_moment
+            if instrumentation is not None:
+                instrumentation.progress(
+                    stop,
+                    lambda: (
+                        _solve_normal_equations(normal_matrix, moment_vector),
+                        np.trace(np.linalg.pinv(normal_matrix), axis1=-2, axis2=-1),
+                    ),
+                )
+
+        with timed(instrumentation, "solve"):
+            return _solve_normal_equations(normal_matrix, moment_vector)
+
+    @staticmethod
+    def _subsystem_normal_equations(x_estimated, input_signal, output_signal, workers):
+        if not workers or workers == 1:
+            return _normal_equations(x_estimated, input_signal, output_signal)
+
+        blocks = np.array_split(np.arange(output_signal.shape[-2]), workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            equations = list(
+                executor.map(
+                    lambda block: _normal_equations(
+                        x_estimated[..., block, :],
+                        input_signal[..., block, :],
+                        output_signal[..., block, :],
+                    ),
+                    blocks,
+                )
+            )
+        return (
+            np.concatenate([normal for normal, _ in equations], axis=-3),
+            np.concatenate([moment for _, moment in equations], axis=-3),
         )
 
-        estimated_param = [
-            output_signal[0]
-            @ input_matrix[0].T
-            @ np.linalg.inv(input_matrix[0] @ input_matrix[0].T),
-            output_signal[1]
-            @ input_matrix[1].T
-            @ np.linalg.inv(input_matrix[1] @ input_matrix[1].T),
-        ]
 
-        return estimated_param
+class StreamingMultilevelEstimator:
+    """
+    Recursive least squares identification of the multilevel system.
+
+    Every subsystem keeps its own RLS state for the parameters [a_i, b_i],
+    with the interconnection signal (H y)_i and the input u_i as regressors.
+    Measurements are processed chunk by chunk without keeping any history,
+    so memory does not depend on the stream length.
+    """
+
+    def __init__(
+        self, connection_matrix, forgetting_factor=1, mode="standard", dtype=float
+    ):
+        """
+        Initialize the StreamingMultilevelEstimator.
+
+        Args:
+            connection_matrix (ndarray or sparse matrix): Connection matrix H.
+            forgetting_factor (float): Forgetting factor for the algorithm.
+            mode (str): 'standard' or 'sqrt' covariance update, see rls_kernel.
+            dtype (data-type): Floating point type of the state and chunks.
+        """
+        self.connection_matrix = connection_matrix
+        self.forgetting_factor = forgetting_factor
+        self.mode = mode
+        self.samples_seen = 0
+        subsystems = connection_matrix.shape[0]
+        estimated_param, weight_function = init_rls_state(2, mode=mode, dtype=dtype)
+        self._estimated_params = np.tile(estimated_param, (subsystems, 1))
+        self.weight_functions = np.tile(weight_function, (subsystems, 1, 1))
+
+    @property
+    def estimated_param(self):
+        """
+        ndarray: Current estimates [a_i, b_i] of shape (subsystems, 2).
+        """
+        return self._estimated_params.copy()
+
+    def update_batch(self, u_chunk, y_chunk):
+        """
+        Update the estimates with a chunk of subsystem measurements.
+
+        Args:
+            u_chunk (ndarray): Input samples of shape (subsystems, samples).
+            y_chunk (ndarray): Output samples of shape (subsystems, samples).
+
+        Returns:
+            ndarray: Current estimates of shape (subsystems, 2).
+        """
+        dtype = self._estimated_params.dtype
+        u_chunk = np.asarray(u_chunk, dtype=dtype)
+        y_chunk = np.asarray(y_chunk, dtype=dtype)
+        x_chunk = _connect(self.connection_matrix, y_chunk)
+        regressor_matrices = _subsystem_regressors(x_chunk, u_chunk)
+
+        for subsystem in range(len(self._estimated_params)):
+            rls_kernel(
+                regressor_matrices[subsystem],
+                y_chunk[subsystem],
+                self.forgetting_factor,
+                self._estimated_params[subsystem],
+                self.weight_functions[subsystem],
+                mode=self.mode,
+            )
+
+        self.samples_seen += y_chunk.shape[-1]
+        return self.estimated_param
@@ -0,0 +1,914 @@
+from importlib.util import find_spec
+
+import numpy as np
+from utils.signal_utils import lagged_regressor
+
+# numba is optional, the NumPy kernels are used without it. It is only
+# imported when a kernel first runs, to keep imports of this module cheap.
+NUMBA_AVAILABLE = find_spec("numba") is not None
+
+
+def fir_regressor(input_signal, order, dtype=float):
+    """
+    Build the FIR regressor matrix of a signal.
+
+    Row i holds [u(i), u(i-1), ..., u(i-order+1)], with samples before the
+    start of the signal taken as zero.
+
+    Args:
+        input_signal (ndarray): Input signal, or (runs, samples) signals.
+        order (int): Number of taps of the FIR model.
+        dtype (data-type): Floating point type of the regressor matrix.
+
+    Returns:
+        ndarray: Read-only regressor matrix of shape (..., samples, order).
+    """
+    return lagged_regressor(input_signal, order, dtype=dtype)
+
+
+def chunk_regressor(past_inputs, input_chunk, order, dtype=float):
+    """
+    Build the FIR regressor matrix of a chunk that continues a signal.
+
+    Args:
+        past_inputs (ndarray): Last order-1 inputs before the chunk (zeros at the
+            start of the signal).
+        input_chunk (ndarray): Input samples of the chunk.
+        order (int): Number of taps of the FIR model.
+        dtype (data-type): Floating point type of the regressor matrix.
+
+    Returns:
+        tuple: regressor matrix of shape (len(input_chunk), order), past inputs
+        for the next chunk
+    """
+    input_chunk = np.asarray(input_chunk, dtype=dtype)
+    regressor_matrix = lagged_regressor(
+        input_chunk, order, past=past_inputs, dtype=dtype
+    )
+    tail = np.concatenate(
+        [past_inputs, input_chunk[max(len(input_chunk) - order + 1, 0) :]]
+    )
+    return regressor_matrix, tail[len(tail) - order + 1 :]
+
+
+def init_rls_state(order, initial_covariance=10**3, mode="standard", dtype=float):
+    """
+    Create the initial RLS state buffers.
+
+    Args:
+        order (int): Number of estimated parameters.
+        initial_covariance (float): Initial diagonal of the weight function.
+        mode (str): 'standard' to return the weight function itself or 'sqrt'
+            to return its square-root factor.
+        dtype (data-type): Floating point type of the buffers.
+
+    Returns:
+        tuple: estimated_param of shape (order,), weight_function (or its factor)
+        of shape (order, order)
+    """
+    if mode == "sqrt":
+        initial_covariance = np.sqrt(initial_covariance)
+    elif mode != "standard":
+        raise ValueError(f"Unknown RLS mode: {mode}")
+    weight_function = np.eye(order, dtype=dtype)
+    weight_function *= initial_covariance
+    return np.zeros(order, dtype=dtype), weight_function
+
+
+def covariance_trace(weight_function, mode="standard"):
+    """
+    Compute the trace of the weight function from the RLS state.
+
+    Args:
+        weight_function (ndarray): Weight function, or its square-root factor
+            in 'sqrt' mode, of shape (..., order, order).
+        mode (str): 'standard' or 'sqrt'.
+
+    Returns:
+        float or ndarray: Trace of the weight function.
+    """
+    if mode == "sqrt":
+        return np.square(weight_function).sum(axis=(-2, -1))
+    return np.trace(weight_function, axis1=-2, axis2=-1)
+
+
+def has_converged(
+    param_window, weight_function, tolerance, criterion="change", mode="standard"
+):
+    """
+    Check the convergence criterion of the RLS estimates over a window.
+
+    Args:
+        param_window (ndarray): Estimates over the window, of shape
+            (..., order, window).
+        weight_function (ndarray): Weight function, or its square-root factor in
+            'sqrt' mode, at the end of the window.
+        tolerance (float): Convergence tolerance.
+        criterion (str): 'change' when every estimate in the window is within
+            tolerance of the last one, or 'trace' when the trace of the weight
+            function is below tolerance.
+        mode (str): 'standard' or 'sqrt' weight function.
+
+    Returns:
+        bool or ndarray: Whether the estimates have converged.
+    """
+    if criterion == "change":
+        spread = np.abs(param_window - param_window[..., -1:]).max(axis=(-2, -1))
+        return spread < tolerance
+    if criterion == "trace":
+        return covariance_trace(weight_function, mode) < tolerance
+    raise ValueError(f"Unknown convergence criterion: {criterion}")
+
+
+def _rls_numpy(
+    regressor_matrix,
+    output_signal,
+    forgetting_factor,
+    estimated_param,
+    weight_function,
+    param_hist,
+):
+    weighted_rv = np.empty_like(estimated_param)
+    rv_weighted = np.empty_like(estimated_param)
+    gain = np.empty_like(estimated_param)
+    correction = np.empty_like(weight_function)
+    store_history = param_hist.shape[1] > 0
+
+    for i in range(output_signal.shape[0]):
+        rv_n = regressor_matrix[i]
+        np.dot(weight_function, rv_n, out=weighted_rv)
+        # both factors of the correction are taken from the weight function, so
+        # that rounding errors do not make it drift away from symmetry
+        np.dot(rv_n, weight_function, out=rv_weighted)
+        np.multiply(
+            weighted_rv, 1.0 / (forgetting_factor + rv_n @ weighted_rv), out=gain
+        )
+        np.multiply.outer(gain, rv_weighted, out=correction)
+        weight_function -= correction
+        weight_function /= forgetting_factor
+        error = output_signal[i] - rv_n @ estimated_param
+        np.multiply(gain, error, out=weighted_rv)
+        estimated_param += weighted_rv
+        if store_history:
+            param_hist[:, i] = estimated_param
+
+
+def _rls_loops(
+    regressor_matrix,
+    output_signal,
+    forgetting_factor,
+    estimated_param,
+    weight_function,
+    param_hist,
+):
+    order = estimated_param.shape[0]
+    weighted_rv = np.empty_like(estimated_param)
+    rv_weighted = np.empty_like(estimated_param)
+    store_history = param_hist.shape[1] > 0
+
+    for i in range(output_signal.shape[0]):
+        denominator = forgetting_factor
+        error = output_signal[i]
+        for row in range(order):
+            acc = 0.0
+            row_acc = 0.0
+            for col in range(order):
+                acc += weight_function[row, col] * regressor_matrix[i, col]
+                row_acc += regressor_matrix[i, col] * weight_function[col, row]
+            weighted_rv[row] = acc
+            rv_weighted[row] = row_acc
+            denominator += regressor_matrix[i, row] * acc
+            error -= regressor_matrix[i, row] * estimated_param[row]
+
+        for row in range(order):
+            gain = weighted_rv[row] / denominator
+            for col in range(order):
+                weight_function[row, col] = (
+                    weight_function[row, col] - gain * rv_weighted[col]
+                ) / forgetting_factor
+            estimated_param[row] += gain * error
+            if store_history:
+                param_hist[row, i] = estimated_param[row]
+
+
+def _sqrt_rls_numpy(
+    regressor_matrix,
+    output_signal,
+    forgetting_factor,
+    estimated_param,
+    weight_factor,
+    param_hist,
+):
+    factored_rv = np.empty_like(estimated_param)
+    weighted_rv = np.empty_like(estimated_param)
+    correction = np.empty_like(weight_factor)
+    sqrt_forgetting_factor = np.sqrt(forgetting_factor)
+    store_history = param_hist.shape[1] > 0
+
+    for i in range(output_signal.shape[0]):
+        rv_n = regressor_matrix[i]
+        np.dot(rv_n, weight_factor, out=factored_rv)
+        alpha = forgetting_factor + factored_rv @ factored_rv
+        np.dot(weight_factor, factored_rv, out=weighted_rv)
+        gamma = 1 / (alpha + np.sqrt(forgetting_factor * alpha))
+        np.multiply.outer(weighted_rv, factored_rv, out=correction)
+        correction *= gamma
+        weight_factor -= correction
+        weight_factor /= sqrt_forgetting_factor
+        error = output_signal[i] - rv_n @ estimated_param
+        weighted_rv *= error / alpha
+        estimated_param += weighted_rv
+        if store_history:
+            param_hist[:, i] = estimated_param
+
+
+def _sqrt_rls_loops(
+    regressor_matrix,
+    output_signal,
+    forgetting_factor,
+    estimated_param,
+    weight_factor,
+    param_hist,
+):
+    order = estimated_param.shape[0]
+    factored_rv = np.empty_like(estimated_param)
+    weighted_rv = np.empty_like(estimated_param)
+    sqrt_forgetting_factor = np.sqrt(forgetting_factor)
+    store_history = param_hist.shape[1] > 0
+
+    for i in range(output_signal.shape[0]):
+        alpha = forgetting_factor
+        error = output_signal[i]
+        for col in range(order):
+            acc = 0.0
+            for row in range(order):
+                acc += weight_factor[row, col] * regressor_matrix[i, row]
+            factored_rv[col] = acc
+            alpha += acc * acc
+            error -= regressor_matrix[i, col] * estimated_param[col]
+
+        for row in range(order):
+            acc = 0.0
+            for col in range(order):
+                acc += weight_factor[row, col] * factored_rv[col]
+            weighted_rv[row] = acc
+
+        gamma = 1.0 / (alpha + np.sqrt(forgetting_factor * alpha))
+        for row in range(order):
+            for col in range(order):
+                weight_factor[row, col] = (
+                    weight_factor[row, col]
+                    - gamma * weighted_rv[row] * factored_rv[col]
+                ) / sqrt_forgetting_factor
+            estimated_param[row] += weighted_rv[row] / alpha * error
+            if store_history:
+                param_hist[row, i] = estimated_param[row]
+
+
+def batch_rls_update(
+    regressors,
+    outputs,
+    forgetting_factors,
+    estimated_params,
+    weight_functions,
+    mode="standard",
+):
+    """
+    Update the RLS state of many runs with one sample of every run.
+
+    Args:
+        regressors (ndarray): Regressor vectors of shape (runs, order).
+        outputs (ndarray): Output samples of shape (runs,).
+        forgetting_factors (ndarray): Forgetting factor of every run, (runs,).
+        estimated_params (ndarray): Estimates of shape (runs, order), updated
+            in place.
+        weight_functions (ndarray): Weight functions, or their square-root
+            factors in 'sqrt' mode, of shape (runs, order, order).
+        mode (str): 'standard' or 'sqrt' covariance update.
+
+    Returns:
+        ndarray: The updated weight functions (or factors).
+    """
+    error = outputs - np.einsum("ri,ri->r", regressors, estimated_params)
+    if mode == "sqrt":
+        factored_rv = np.einsum("rji,rj->ri", weight_functions, regressors)
+        alpha = forgetting_factors + np.einsum("ri,ri->r", factored_rv, factored_rv)
+        weighted_rv = np.einsum("rij,rj->ri", weight_functions, factored_rv)
+        gamma = 1 / (alpha + np.sqrt(forgetting_factors * alpha))
+        weight_functions = (
+            weight_functions
+            - gamma[:, None, None] * weighted_rv[:, :, None] * factored_rv[:, None, :]
+        ) / np.sqrt(forgetting_factors)[:, None, None]
+        gain = weighted_rv / alpha[:, None]
+    else:
+        weighted_rv = np.einsum("rij,rj->ri", weight_functions, regressors)
+        rv_weighted = np.einsum("rj,rji->ri", regressors, weight_functions)
+        gain = (
+            weighted_rv
+            / (forgetting_factors + np.einsum("ri,ri->r", regressors, weighted_rv))[
+                :, None
+            ]
+        )
+        weight_functions = (
+            weight_functions - gain[:, :, None] * rv_weighted[:, None, :]
+        ) / forgetting_factors[:, None, None]
+    estimated_params += gain * error[:, None]
+    return weight_functions
+
+
+def _closed_loop_numpy(
+    reference,
+    model_params,
+    noise,
+    excitation,
+    control_weight,
+    forgetting_factor,
+    sqrt_mode,
+    estimated_params,
+    weight_functions,
+    u_signal,
+    y_signal,
+    param_hist,
+    decimation,
+):
+    runs, order = estimated_params.shape
+    regressors = np.zeros((runs, order), dtype=estimated_params.dtype)
+    forgetting_factors = np.full(runs, forgetting_factor)
+    mode = "sqrt" if sqrt_mode else "standard"
+
+    for i in range(reference.shape[0]):
+        regressors[:, 1:] = regressors[:, :-1].copy()
+        prediction = np.einsum("ri,ri->r", estimated_params[:, 1:], regressors[:, 1:])
+        gain = estimated_params[:, 0]
+        regressors[:, 0] = (
+            gain * (reference[i] - prediction) / (gain * gain + control_weight)
+            + excitation[:, i]
+        )
+        u_signal[:, i] = regressors[:, 0]
+        y_signal[:, i] = np.einsum("ri,ri->r", model_params, regressors) + noise[:, i]
+        weight_functions[...] = batch_rls_update(
+            regressors,
+            y_signal[:, i],
+            forgetting_factors,
+            estimated_params,
+            weight_functions,
+            mode,
+        )
+        if (i + 1) % decimation == 0:
+            param_hist[:, :, (i + 1) // decimation - 1] = estimated_params
+
+
+def _closed_loop_loops(
+    reference,
+    model_params,
+    noise,
+    excitation,
+    control_weight,
+    forgetting_factor,
+    sqrt_mode,
+    estimated_params,
+    weight_functions,
+    u_signal,
+    y_signal,
+    param_hist,
+    decimation,
+):
+    runs, order = estimated_params.shape
+    regressor = np.empty(order, dtype=estimated_params.dtype)
+    factored_rv = np.empty_like(regressor)
+    weighted_rv = np.empty_like(regressor)
+    rv_weighted = np.empty_like(regressor)
+    sqrt_forgetting_factor = np.sqrt(forgetting_factor)
+
+    for run in range(runs):
+        estimate = estimated_params[run]
+        weight = weight_functions[run]
+        regressor[:] = 0.0
+        for i in range(reference.shape[0]):
+            # certainty-equivalence control from the current estimate
+            prediction = 0.0
+            for tap in range(order - 1, 0, -1):
+                regressor[tap] = regressor[tap - 1]
+                prediction += estimate[tap] * regressor[tap]
+            gain = estimate[0]
+            regressor[0] = (
+                gain * (reference[i] - prediction) / (gain * gain + control_weight)
+                + excitation[run, i]
+            )
+            output = noise[run, i]
+            for tap in range(order):
+                output += model_params[run, tap] * regressor[tap]
+            u_signal[run, i] = regressor[0]
+            y_signal[run, i] = output
+
+            error = output
+            if sqrt_mode:
+                alpha = forgetting_factor
+                for col in range(order):
+                    acc = 0.0
+                    for row in range(order):
+                        acc += weight[row, col] * regressor[row]
+                    factored_rv[col] = acc
+                    alpha += acc * acc
+                    error -= regressor[col] * estimate[col]
+                for row in range(order):
+                    acc = 0.0
+                    for col in range(order):
+                        acc += weight[row, col] * factored_rv[col]
+                    weighted_rv[row] = acc
+                gamma = 1.0 / (alpha + np.sqrt(forgetting_factor * alpha))
+                for row in range(order):
+                    for col in range(order):
+                        weight[row, col] = (
+                            weight[row, col]
+                            - gamma * weighted_rv[row] * factored_rv[col]
+                        ) / sqrt_forgetting_factor
+                    estimate[row] += weighted_rv[row] / alpha * error
+            else:
+                denominator = forgetting_factor
+                for row in range(order):
+                    acc = 0.0
+                    row_acc = 0.0
+                    for col in range(order):
+                        acc += weight[row, col] * regressor[col]
+                        row_acc += regressor[col] * weight[col, row]
+                    weighted_rv[row] = acc
+                    rv_weighted[row] = row_acc
+                    denominator += regressor[row] * acc
+                    error -= regressor[row] * estimate[row]
+                for row in range(order):
+                    rls_gain = weighted_rv[row] / denominator
+                    for col in range(order):
+                        weight[row, col] = (
+                            weight[row, col] - rls_gain * rv_weighted[col]
+                        ) / forgetting_factor
+                    estimate[row] += rls_gain * error
+
+            if (i + 1) % decimation == 0:
+                for tap in range(order):
+                    param_hist[run, tap, (i + 1) // decimation - 1] = estimate[tap]
+
+
+_NUMPY_KERNELS = {"standard": _rls_numpy, "sqrt": _sqrt_rls_numpy}
+_LOOP_KERNELS = {
+    "standard": _rls_loops,
+    "sqrt": _sqrt_rls_loops,
+    "closed_loop": _closed_loop_loops,
+}
+
+_JIT_KERNELS = {}
+
+
+def _jit_kernel(name):
+    if name not in _JIT_KERNELS:
+        from numba import njit
+
+        _JIT_KERNELS[name] = njit(cache=True)(_LOOP_KERNELS[name])
+    return _JIT_KERNELS[name]
+
+
+def rls_kernel(
+    regressor_matrix,
+    output_signal,
+    forgetting_factor,
+    estimated_param,
+    weight_function,
+    param_hist=None,
+    mode="standard",
+):
+    """
+    Run recursive least squares over all samples, updating the state in place.
+
+    The gain vector is built once per sample and no arrays are allocated inside
+    the loop. The loop is compiled with numba when it is installed. In 'sqrt'
+    mode the square-root factor S of the weight function P = S S^T is updated
+    instead (Potter's algorithm), which keeps P symmetric and positive definite
+    for forgetting factors below 1, also in float32. Computation follows the
+    dtype of estimated_param.
+
+    Args:
+        regressor_matrix (ndarray): Regressors of shape (samples, order).
+        output_signal (ndarray): Output signal of length samples.
+        forgetting_factor (float): Forgetting factor for the algorithm.
+        estimated_param (ndarray): Parameter estimate of shape (order,), updated in place.
+        weight_function (ndarray): Weight function, or its square-root factor in
+            'sqrt' mode, of shape (order, order), updated in place.
+        param_hist (ndarray, optional): Buffer of shape (order, samples) receiving the
+            estimate after every sample. History is not stored when omitted.
+        mode (str): 'standard' or 'sqrt'.
+    """
+    if mode not in _NUMPY_KERNELS:
+        raise ValueError(f"Unknown RLS mode: {mode}")
+    dtype = estimated_param.dtype
+    if param_hist is None:
+        param_hist = np.empty((estimated_param.shape[0], 0), dtype=dtype)
+    kernel = _jit_kernel(mode) if NUMBA_AVAILABLE else _NUMPY_KERNELS[mode]
+    kernel(
+        np.ascontiguousarray(regressor_matrix, dtype=dtype),
+        np.ascontiguousarray(output_signal, dtype=dtype),
+        dtype.type(forgetting_factor),
+        estimated_param,
+        weight_function,
+        param_hist,
+    )
+
+
+def closed_loop_kernel(
+    reference,
+    model_params,
+    noise,
+    excitation,
+    control_weight,
+    forgetting_factor,
+    estimated_params,
+    weight_functions,
+    u_signal,
+    y_signal,
+    param_hist,
+    mode="standard",
+    decimation=1,
+):
+    """
+    Run self-tuning control of FIR plants, updating the state in place.
+
+    At every sample the control input is chosen from the current estimate
+    theta by the weighted one-step-ahead (certainty-equivalence) law
+
+        u(i) = theta_0 (r(i) - sum_k theta_k u(i-k)) / (theta_0^2 + control_weight)
+
+    plus the excitation, the plant output y(i) = sum_k a_k u(i-k) + noise(i)
+    is measured, and the estimate is updated by recursive least squares. Every
+    run is an independent plant and estimator. The loop is compiled with numba
+    when it is installed; otherwise the runs are updated together, vectorized
+    over runs, sample by sample. Computation follows the dtype of
+    estimated_params.
+
+    Args:
+        reference (ndarray): Reference signal of shape (samples,), shared by
+            all runs.
+        model_params (ndarray): Plant FIR coefficients of shape (runs, order).
+        noise (ndarray): Output noise of shape (runs, samples).
+        excitation (ndarray): Probing signals added to the control input, of
+            shape (runs, samples).
+        control_weight (float): Positive weight of the control effort, which
+            bounds the input while theta_0 is small and stabilizes plants whose
+            zeros lie outside the unit circle once it is large enough.
+        forgetting_factor (float): Forgetting factor of the estimators.
+        estimated_params (ndarray): Estimates of shape (runs, order), updated
+            in place.
+        weight_functions (ndarray): Weight functions, or their square-root
+            factors in 'sqrt' mode, of shape (runs, order, order), updated in
+            place.
+        u_signal (ndarray): Buffer of shape (runs, samples) receiving the inputs.
+        y_signal (ndarray): Buffer of shape (runs, samples) receiving the outputs.
+        param_hist (ndarray): Buffer of shape (runs, order, samples // decimation)
+            receiving the estimate after every decimation samples.
+        mode (str): 'standard' or 'sqrt' covariance update.
+        decimation (int): Number of samples between stored estimates.
+    """
+    if mode not in _NUMPY_KERNELS:
+        raise ValueError(f"Unknown RLS mode: {mode}")
+    dtype = estimated_params.dtype
+    kernel = _jit_kernel("closed_loop") if NUMBA_AVAILABLE else _closed_loop_numpy
+    kernel(
+        np.ascontiguousarray(reference, dtype=dtype),
+        np.ascontiguousarray(model_params, dtype=dtype),
+        np.ascontiguousarray(noise, dtype=dtype),
+        np.ascontiguousarray(excitation, dtype=dtype),
+        dtype.type(control_weight),
+        dtype.type(forgetting_factor),
+        mode == "sqrt",
+        estimated_params,
+        weight_functions,
+        u_signal,
+        y_signal,
+        param_hist,
+        decimation,
+    )
+
+
+# Correlations of FIR least squares are computed with FFT from this order on;
+# below it the direct dot products are faster.
+FFT_MIN_ORDER = 128
+
+
+def fir_correlations(input_signal, output_signal, order, use_fft=None):
+    """
+    Compute the normal equations of FIR least squares from correlation sums.
+
+    With zero initial conditions the normal matrix is the Toeplitz matrix of
+    the input autocorrelation, minus the products of the last samples that the
+    lagged regressors never reach. The moment vector is the input-output
+    cross-correlation.
+
+    Args:
+        input_signal (ndarray): Input signal.
+        output_signal (ndarray): Output signal.
+        order (int): Number of FIR taps.
+        use_fft (bool, optional): Compute the correlations with FFT, by default
+            from FFT_MIN_ORDER taps on.
+
+    Returns:
+        tuple: normal matrix of shape (order, order), moment vector of shape
+        (order,)
+    """
+    input_signal = np.asarray(input_signal, dtype=float)
+    output_signal = np.asarray(output_signal, dtype=float)
+    samples = len(input_signal)
+    if use_fft is None:
+        use_fft = order >= FFT_MIN_ORDER
+
+    if use_fft:
+        fft_size = 1 << (samples + order).bit_length()
+        input_spectrum = np.fft.rfft(input_signal, fft_size)
+        conjugate = input_spectrum.conj()
+        autocorrelation = np.fft.irfft(conjugate * input_spectrum, fft_size)[:order]
+        cross_correlation = np.fft.irfft(
+            conjugate * np.fft.rfft(output_signal, fft_size), fft_size
+        )[:order]
+    else:
+        autocorrelation = np.array(
+            [
+                input_signal[: max(samples - lag, 0)] @ input_signal[lag:]
+                for lag in range(order)
+            ]
+        )
+        cross_correlation = np.array(
+            [
+                input_signal[: max(samples - lag, 0)] @ output_signal[lag:]
+                for lag in range(order)
+            ]
+        )
+
+    lags = np.arange(order)
+    normal_matrix = autocorrelation[np.abs(lags[:, None] - lags)]
+    # entry (i, j) misses the products w(s) w(s + |i - j|), s < min(i, j), of the
+    # reversed input tail w(s) = u(N - 1 - s)
+    tail = np.zeros(order)
+    reached = min(order, samples)
+    tail[:reached] = input_signal[samples - reached :][::-1]
+    products = np.outer(tail, tail)
+    missing = np.zeros((order, order))
+    for row in range(1, order):
+        missing[row, 1:] = missing[row - 1, :-1] + products[row - 1, :-1]
+    return normal_matrix - missing, cross_correlation
+
+
+def _information_update(
+    information_matrix, moment_vector, regressor_matrix, output_chunk, forgetting_factor
+):
+    """
+    Add a block of samples to the exponentially weighted normal equations.
+    """
+    block = len(output_chunk)
+    if forgetting_factor == 1:
+        weighted_output = output_chunk
+        information_matrix += regressor_matrix.T @ regressor_matrix
+    else:
+        weights = forgetting_factor ** np.arange(block - 1, -1, -1)
+        weighted_output = output_chunk * weights
+        information_matrix *= forgetting_factor**block
+        moment_vector *= forgetting_factor**block
+        information_matrix += (regressor_matrix * weights[:, None]).T @ regressor_matrix
+    moment_vector += regressor_matrix.T @ weighted_output
+
+
+def least_squares_fir(
+    input_signal,
+    output_signal,
+    order,
+    forgetting_factor=1,
+    initial_covariance=10**3,
+    chunk_size=2**16,
+):
+    """
+    Solve the FIR identification problem of recursive least squares directly.
+
+    Sample-wise RLS started from the weight function initial_covariance * I
+    ends at the solution of the exponentially weighted, regularized normal
+    equations, which are formed here from correlation sums when
+    forgetting_factor is 1 and from chunks of regressors otherwise. The normal
+    equations are always accumulated in float64; signals of another type, such
+    as float32, are converted chunk by chunk rather than copied whole.
+
+    Args:
+        input_signal (ndarray): Input signal.
+        output_signal (ndarray): Output signal.
+        order (int): Number of FIR taps.
+        forgetting_factor (float): Forgetting factor.
+        initial_covariance (float): Initial diagonal of the RLS weight function.
+        chunk_size (int): Number of regressor rows formed at a time when
+            forgetting_factor is below 1 or the input is not float64.
+
+    Returns:
+        ndarray: Estimated parameters of shape (order,).
+    """
+    samples = len(output_signal)
+    regularization = forgetting_factor**samples / initial_covariance
+    if forgetting_factor == 1 and np.asarray(input_signal).dtype == np.float64:
+        normal_matrix, moment_vector = fir_correlations(
+            input_signal, output_signal, order
+        )
+    else:
+        normal_matrix, moment_vector = np.zeros((order, order)), np.zeros(order)
+        past_inputs = np.zeros(order - 1)
+        for start in range(0, samples, chunk_size):
+            regressor_matrix, past_inputs = chunk_regressor(
+                past_inputs, input_signal[start : start + chunk_size], order
+            )
+            _information_update(
+                normal_matrix,
+                moment_vector,
+                regressor_matrix,
+                np.asarray(output_signal[start : start + chunk_size], dtype=float),
+                forgetting_factor,
+            )
+    normal_matrix += regularization * np.eye(order)
+    return np.linalg.solve(normal_matrix, moment_vector)
+
+
+def block_rls_fir(
+    input_signal,
+    output_signal,
+    order,
+    forgetting_factor=1,
+    block_size=1024,
+    initial_covariance=10**3,
+):
+    """
+    Run recursive least squares over blocks of samples.
+
+    Every block updates the information matrix, the inverse of the RLS weight
+    function, and the moment vector with two matrix products, and the estimate
+    is solved once per block. The estimate at the end of every block equals
+    the sample-wise RLS estimate at that sample.
+
+    Args:
+        input_signal (ndarray): Input signal.
+        output_signal (ndarray): Output signal.
+        order (int): Number of FIR taps.
+        forgetting_factor (float): Forgetting factor.
+        block_size (int): Number of samples of every block.
+        initial_covariance (float): Initial diagonal of the RLS weight function.
+
+    Returns:
+        tuple: estimated parameters of shape (order,), estimates at the end of
+        every block of shape (order, blocks)
+    """
+    samples = len(output_signal)
+    information_matrix = np.eye(order) / initial_covariance
+    moment_vector = np.zeros(order)
+    param_hist = np.zeros((order, -(-samples // block_size)))
+    estimated_param = np.zeros(order)
+
+    past_inputs = np.zeros(order - 1)
+    for block, start in enumerate(range(0, samples, block_size)):
+        regressor_matrix, past_inputs = chunk_regressor(
+            past_inputs, input_signal[start : start + block_size], order
+        )
+        _information_update(
+            information_matrix,
+            moment_vector,
+            regressor_matrix,
+            np.asarray(output_signal[start : start + block_size], dtype=float),
+            forgetting_factor,
+        )
+        estimated_param = np.linalg.solve(information_matrix, moment_vector)
+        param_hist[:, block] = estimated_param
+    return estimated_param, param_hist
+
+
+class StreamingEstimator:
+    """
+    Stateful recursive least squares estimator for streamed FIR identification.
+
+    The regressor state is carried across calls, so feeding a signal in chunks
+    gives the same estimates as identifying it in one go. Memory does not grow
+    with the stream length: only the last history_size estimates, taken every
+    decimation samples, are kept in a ring buffer.
+    """
+
+    def __init__(
+        self,
+        order=3,
+        forgetting_factor=1,
+        history_size=0,
+        decimation=1,
+        mode="standard",
+        dtype=float,
+    ):
+        """
+        Initialize the StreamingEstimator.
+
+        Args:
+            order (int): Number of FIR taps to estimate.
+            forgetting_factor (float): Forgetting factor for the algorithm.
+            history_size (int): Number of past estimates kept in the ring buffer.
+                No history is kept when 0.
+            decimation (int): Store one estimate every decimation samples.
+            mode (str): 'standard' or 'sqrt' covariance update, see rls_kernel.
+            dtype (data-type): Floating point type of the state and history.
+        """
+        self.order = order
+        self.forgetting_factor = forgetting_factor
+        self.decimation = decimation
+        self.mode = mode
+        self.samples_seen = 0
+        self._estimated_param, self.weight_function = init_rls_state(
+            order, mode=mode, dtype=dtype
+        )
+        self._past_inputs = np.zeros(order - 1, dtype=dtype)
+        self._history = np.zeros((order, history_size), dtype=dtype)
+        self._history_index = np.full(history_size, -1, dtype=np.int64)
+        self._history_count = 0
+
+    @property
+    def estimated_param(self):
+        """
+        ndarray: Current parameter estimate of shape (order, 1).
+        """
+        return self._estimated_param.reshape(-1, 1).copy()
+
+    def update(self, u, y):
+        """
+        Update the estimate with a single input/output sample.
+
+        Args:
+            u (float): Input sample.
+            y (float): Output sample.
+
+        Returns:
+            ndarray: Current parameter estimate of shape (order, 1).
+        """
+        return self.update_batch([u], [y])
+
+    def update_batch(self, u_chunk, y_chunk):
+        """
+        Update the estimate with a chunk of input/output samples.
+
+        Args:
+            u_chunk (ndarray): Input samples.
+            y_chunk (ndarray): Output samples of the same length.
+
+        Returns:
+            ndarray: Current parameter estimate of shape (order, 1).
+        """
+        dtype = self._estimated_param.dtype
+        u_chunk = np.asarray(u_chunk, dtype=dtype)
+        y_chunk = np.asarray(y_chunk, dtype=dtype)
+        if len(u_chunk) != len(y_chunk):
+            raise ValueError("u_chunk and y_chunk must have the same length")
+        if len(u_chunk) == 0:
+            return self.estimated_param
+
+        regressor_matrix, past_inputs = chunk_regressor(
+            self._past_inputs, u_chunk, self.order, dtype
+        )
+        store_history = self._history.shape[1] > 0
+        chunk_hist = (
+            np.zeros((self.order, len(u_chunk)), dtype=dtype) if store_history else None
+        )
+
+        rls_kernel(
+            regressor_matrix,
+            y_chunk,
+            self.forgetting_factor,
+            self._estimated_param,
+            self.weight_function,
+            chunk_hist,
+            self.mode,
+        )
+
+        if store_history:
+            sample_index = self.samples_seen + np.arange(len(u_chunk))
+            kept = (sample_index + 1) % self.decimation == 0
+            self._store(sample_index[kept], chunk_hist[:, kept])
+
+        self._past_inputs = past_inputs
+        self.samples_seen += len(u_chunk)
+        return self.estimated_param
+
+    def _store(self, sample_index, estimates):
+        history_size = self._history.shape[1]
+        if len(sample_index) > history_size:
+            sample_index = sample_index[-history_size:]
+            estimates = estimates[:, -history_size:]
+        slots = (self._history_count + np.arange(len(sample_index))) % history_size
+        self._history[:, slots] = estimates
+        self._history_index[slots] = sample_index
+        self._history_count += len(sample_index)
+
+    def history(self):
+        """
+        Return the stored estimates in chronological order.
+
+        Returns:
+            tuple: sample_index of the stored estimates, param_hist of shape
+            (order, stored)
+        """
+        history_size = self._history.shape[1]
+        stored = min(self._history_count, history_size)
+        slots = (self._history_count - stored + np.arange(stored)) % max(
+            history_size, 1
+        )
+        return self._history_index[slots], self._history[:, slots]
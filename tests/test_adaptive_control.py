@@ -1,6 +1,10 @@
+import os
+import tempfile
+import tracemalloc
 import unittest
 import numpy as np
 from controllers.adaptive_control import AdaptiveController
+from controllers.rls import StreamingEstimator
 
 
 class TestAdaptiveController(unittest.TestCase):
@@ -32,6 +36,96 @@ class TestAdaptiveController(unittest.TestCase):
         self.assertEqual(len(v_signal), 1000)
         self.assertEqual(len(y_signal), 1000)
 
+    def test_simulate_seeded_runs(self):
+        """
+        Test the simulate method with a seed and several runs.
+
+        Verifies that a seed makes the simulation reproducible and that the
+        batched signals have shape (runs, samples), with each run's noiseless
+        output being the convolution of its input with the model parameters.
+        """
+        u_signal, v_signal, y_signal, model_param, _, _ = self.controller.simulate(
+            0.1, rng=3, runs=5
+        )
+        self.assertEqual(u_signal.shape, (5, 1000))
+        self.assertEqual(y_signal.shape, (5, 1000))
+        np.testing.assert_array_equal(
+            y_signal, self.controller.simulate(0.1, rng=3, runs=5)[2]
+        )
+        for run in range(5):
+            np.testing.assert_allclose(
+                v_signal[run], np.convolve(u_signal[run], model_param)[:1000]
+            )
+
+    def test_simulate_long_plant(self):
+        """
+        Test the simulate method with a long FIR plant.
+
+        Verifies that the direct, FFT and chunked convolutions of batched runs
+        give the same noiseless output.
+        """
+        coefficients = np.random.default_rng(5).normal(size=400)
+        v_signals = [
+            self.controller.simulate(
+                0.1,
+                coefficients=coefficients,
+                rng=6,
+                runs=2,
+                method=method,
+                chunk_size=chunk_size,
+            )[1]
+            for method, chunk_size in (("direct", None), ("fft", None), ("auto", 128))
+        ]
+        self.assertEqual(v_signals[0].shape, (2, 1000))
+        np.testing.assert_allclose(v_signals[1], v_signals[0], atol=1e-10)
+        np.testing.assert_allclose(v_signals[2], v_signals[0], atol=1e-10)
+
+    def test_simulate_stream(self):
+        """
+        Test the simulate_stream method.
+
+        Verifies that the concatenated chunks of batched runs equal the signals
+        of simulate with the same seed, with the plant state carried across
+        chunks.
+        """
+        expected = self.controller.simulate(
+            0.1, coefficients=np.arange(20.0), rng=2, runs=3
+        )
+        chunks = self.controller.simulate_stream(
+            0.1, 128, coefficients=np.arange(20.0), rng=2, runs=3
+        )
+        for streamed, signal in zip(zip(*chunks), expected[:3]):
+            np.testing.assert_allclose(
+                np.concatenate(streamed, axis=-1), signal, atol=1e-12
+            )
+
+    def test_simulate_stream_flat_memory(self):
+        """
+        Test streaming a long simulation into the StreamingEstimator.
+
+        Ensures that the peak memory of identifying 10^6 streamed samples stays
+        bounded by the chunk size rather than the number of samples. A short
+        stream is identified first so that numba compilation is not traced.
+        """
+        for u_chunk, _, y_chunk in self.controller.simulate_stream(0.1, 100):
+            StreamingEstimator(mode="sqrt").update_batch(u_chunk, y_chunk)
+
+        controller = AdaptiveController(10**6, 6)
+        estimator = StreamingEstimator(mode="sqrt")
+        tracemalloc.start()
+        try:
+            for u_chunk, _, y_chunk in controller.simulate_stream(0.1, 10**4, rng=3):
+                estimator.update_batch(u_chunk, y_chunk)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(estimator.samples_seen, 10**6)
+        self.assertLess(peak_memory, 2 * 10**6)
+        np.testing.assert_allclose(
+            estimator.estimated_param[:, 0], [1, 2, 3], atol=0.05
+        )
+
     def test_identify(self):
         """
         Test the identify method.
@@ -45,6 +139,359 @@ class TestAdaptiveController(unittest.TestCase):
         self.assertEqual(estimated_param.shape, (3, 1))
         self.assertEqual(param_hist.shape, (3, len(y_signal)))
 
+    def test_identify_long_run_forgetting(self):
+        """
+        Test the identify method over a long run with forgetting_factor < 1.
+
+        Compares the estimates and history over 60000 samples at
+        forgetting_factor=0.999 with the textbook covariance update
+        P = (P - P phi phi^T P / (lambda + phi^T P phi)) / lambda, and checks
+        that they stay close to the true parameters.
+        """
+        controller = AdaptiveController(60000, 6)
+        u_signal, _, y_signal, _, _, _ = controller.simulate(0.1, 1, 2, 3, rng=5)
+        estimated_param, param_hist = controller.identify(u_signal, y_signal, 0.999)
+
+        expected_param = np.zeros((3, 1))
+        weight_function = np.eye(3) * 10**3
+        expected_hist = np.zeros((3, 60000))
+        padded_input = np.concatenate([np.zeros(2), u_signal])
+        for i in range(60000):
+            rv_n = padded_input[i : i + 3][::-1].reshape(-1, 1)
+            weight_function = (1 / 0.999) * (
+                weight_function
+                - (weight_function @ rv_n @ rv_n.T @ weight_function)
+                / (0.999 + rv_n.T @ weight_function @ rv_n)
+            )
+            expected_param = expected_param + weight_function @ rv_n @ (
+                y_signal[i] - rv_n.T @ expected_param
+            )
+            expected_hist[:, i] = expected_param.ravel()
+
+        np.testing.assert_allclose(estimated_param, expected_param, atol=1e-8)
+        np.testing.assert_allclose(param_hist, expected_hist, atol=1e-8)
+        np.testing.assert_allclose(estimated_param.ravel(), [1, 2, 3], atol=0.1)
+
+    def test_identify_order_n(self):
+        """
+        Test the identify method with a configurable model order.
+
+        Simulates a plant with an arbitrary coefficient vector and checks that
+        identification with a matching model order returns estimates and history
+        of that order close to the true coefficients.
+        """
+        coefficients = [1.0, 0.5, -0.5, 0.25, 2.0]
+        u_signal, _, y_signal, model_param, _, _ = self.controller.simulate(
+            0.01, coefficients=coefficients
+        )
+        np.testing.assert_array_equal(model_param, coefficients)
+
+        estimated_param, param_hist = self.controller.identify(
+            u_signal, y_signal, 1, order=5
+        )
+        self.assertEqual(estimated_param.shape, (5, 1))
+        self.assertEqual(param_hist.shape, (5, 1000))
+        np.testing.assert_allclose(estimated_param.ravel(), coefficients, atol=0.2)
+
+    def test_identify_methods(self):
+        """
+        Test the batch and block methods of the identify method.
+
+        Verifies that both give the sample-wise RLS estimate at
+        forgetting_factor=1, and that unknown methods and early stopping
+        outside the RLS method are rejected.
+        """
+        u_signal, _, y_signal, _, _, _ = self.controller.simulate(0.1, 1, 2, 3, rng=4)
+        estimated_param, _ = self.controller.identify(u_signal, y_signal, 1)
+
+        batch_param, batch_hist = self.controller.identify(
+            u_signal, y_signal, 1, method="batch"
+        )
+        self.assertIsNone(batch_hist)
+        np.testing.assert_allclose(batch_param, estimated_param, rtol=1e-9)
+
+        block_param, block_hist = self.controller.identify(
+            u_signal, y_signal, 1, method="block", block_size=100
+        )
+        self.assertEqual(block_hist.shape, (3, 10))
+        np.testing.assert_allclose(block_param, estimated_param, rtol=1e-9)
+
+        with self.assertRaises(ValueError):
+            self.controller.identify(u_signal, y_signal, 1, method="fft")
+        with self.assertRaises(ValueError):
+            self.controller.identify(
+                u_signal, y_signal, 1, method="batch", convergence_tolerance=0.1
+            )
+
+    def test_identify_batch(self):
+        """
+        Test the identify_batch method.
+
+        Runs several 5000-sample simulations with different forgetting factors,
+        down to 0.98, through the batched identification and checks that every
+        run reproduces the estimates and parameter history of the single-run
+        identify method.
+        """
+        controller = AdaptiveController(5000, 6)
+        runs = [controller.simulate(0.1, 1, 2, 3) for _ in range(4)]
+        u_signals = np.array([run[0] for run in runs])
+        y_signals = np.array([run[2] for run in runs])
+        forgetting_factors = np.array([1, 0.999, 0.99, 0.98])
+
+        estimated_params, param_hist = controller.identify_batch(
+            u_signals, y_signals, forgetting_factors
+        )
+        self.assertEqual(estimated_params.shape, (4, 3, 1))
+        self.assertEqual(param_hist.shape, (4, 3, 5000))
+
+        for run in range(4):
+            estimated_param, run_hist = controller.identify(
+                u_signals[run], y_signals[run], forgetting_factors[run]
+            )
+            np.testing.assert_allclose(
+                estimated_params[run], estimated_param, atol=1e-6
+            )
+            np.testing.assert_allclose(param_hist[run], run_hist, atol=1e-6)
+
+    def test_simulate_closed_loop(self):
+        """
+        Test the simulate_closed_loop method.
+
+        Verifies that self-tuning control of many minimum-phase plants, asked
+        to follow a unit step, identifies every plant and that the tracking
+        error shrinks from the step size as the estimates converge, and that
+        the histories are decimated. A single run returns one-dimensional
+        signals.
+        """
+        rng = np.random.default_rng(2)
+        # zeros of the plants stay inside the unit circle
+        coefficients = rng.uniform(-0.5, 0.5, (200, 3))
+        coefficients[:, 0] += 1.5
+        u_signal, tracking_error, param_hist, model_param = (
+            self.controller.simulate_closed_loop(
+                0.001,
+                coefficients=coefficients,
+                reference=np.ones(1000),
+                rng=3,
+                decimation=10,
+                mode="sqrt",
+            )
+        )
+        self.assertEqual(u_signal.shape, (200, 1000))
+        self.assertEqual(param_hist.shape, (200, 3, 100))
+        np.testing.assert_array_equal(model_param, coefficients)
+        np.testing.assert_allclose(param_hist[:, :, -1], coefficients, atol=0.1)
+        self.assertGreater(np.sqrt(np.mean(tracking_error[:, :5] ** 2)), 0.5)
+        self.assertLess(np.sqrt(np.mean(tracking_error[:, -200:] ** 2)), 0.15)
+
+        u_signal, tracking_error, param_hist, _ = self.controller.simulate_closed_loop(
+            0.001, rng=3, dtype=np.float32
+        )
+        self.assertEqual(tracking_error.shape, (1000,))
+        self.assertEqual(param_hist.shape, (3, 1000))
+        self.assertEqual(param_hist.dtype, np.float32)
+        np.testing.assert_allclose(param_hist[:, -1], [1, 0.5, 0.25], atol=0.05)
+        with self.assertRaises(ValueError):
+            self.controller.simulate_closed_loop(0.001, control_weight=0)
+
+    def test_simulate_closed_loop_forgetting(self):
+        """
+        Test the simulate_closed_loop method with forgetting_factor < 1.
+
+        Runs 5000 samples at forgetting_factor=0.98 with both covariance
+        updates and checks that the standard update stays finite, follows the
+        reference and gives the same estimates as the square-root update.
+        """
+        controller = AdaptiveController(5000, 6)
+        results = {
+            mode: controller.simulate_closed_loop(
+                0.001, runs=50, forgetting_factor=0.98, rng=4, mode=mode
+            )
+            for mode in ("standard", "sqrt")
+        }
+        _, tracking_error, param_hist, _ = results["standard"]
+        self.assertTrue(np.all(np.isfinite(param_hist)))
+        self.assertLess(np.sqrt(np.mean(tracking_error[:, -1000:] ** 2)), 0.1)
+        np.testing.assert_allclose(param_hist, results["sqrt"][2], atol=1e-8)
+
+    def test_identify_batch_sqrt_float32(self):
+        """
+        Test the identify_batch method in square-root mode with float32 storage.
+
+        Verifies that the batched square-root identification keeps float32
+        results and matches the single-run square-root identify method.
+        """
+        runs = [self.controller.simulate(0.1, 1, 2, 3) for _ in range(3)]
+        u_signals = np.array([run[0] for run in runs])
+        y_signals = np.array([run[2] for run in runs])
+
+        estimated_params, param_hist = self.controller.identify_batch(
+            u_signals, y_signals, 0.99, mode="sqrt", dtype=np.float32
+        )
+        self.assertEqual(param_hist.dtype, np.float32)
+
+        for run in range(3):
+            estimated_param, _ = self.controller.identify(
+                u_signals[run], y_signals[run], 0.99, mode="sqrt"
+            )
+            np.testing.assert_allclose(
+                estimated_params[run], estimated_param, atol=1e-3
+            )
+
+    def test_float32_simulate_identify(self):
+        """
+        Test simulating and identifying in single precision.
+
+        Verifies that every signal, estimate and history stays float32 for all
+        identification methods, and that the estimation error differs from the
+        float64 one by less than 1e-4.
+        """
+        controller = AdaptiveController(20000, 6)
+        signals = {
+            dtype: controller.simulate(0.1, rng=8, dtype=dtype)
+            for dtype in (np.float64, np.float32)
+        }
+        for signal in signals[np.float32][:3] + signals[np.float32][4:]:
+            self.assertEqual(signal.dtype, np.float32)
+
+        model_param = signals[np.float64][3]
+        for method in ("rls", "batch", "block"):
+            errors = {}
+            for dtype, (u_signal, _, y_signal, _, _, _) in signals.items():
+                estimated_param, param_hist = controller.identify(
+                    u_signal, y_signal, 0.999, mode="sqrt", method=method
+                )
+                self.assertEqual(estimated_param.dtype, dtype)
+                if param_hist is not None:
+                    self.assertEqual(param_hist.dtype, dtype)
+                errors[dtype] = estimated_param[:, 0] - model_param
+            np.testing.assert_allclose(
+                errors[np.float32], errors[np.float64], atol=1e-4
+            )
+
+    def test_identify_chunked_history_path(self):
+        """
+        Test the identify method with chunks and a memory-mapped history.
+
+        Ensures that processing the signals in chunks that do not divide the
+        number of samples, with the history written to a .npy file, gives the
+        same results as identifying them in one pass.
+        """
+        u_signal, _, y_signal, _, _, _ = self.controller.simulate(0.1, 1, 2, 3)
+        estimated_param, param_hist = self.controller.identify(u_signal, y_signal, 0.99)
+
+        with tempfile.TemporaryDirectory() as history_dir:
+            history_path = os.path.join(history_dir, "history.npy")
+            chunked_param, chunked_hist = self.controller.identify(
+                u_signal,
+                y_signal,
+                0.99,
+                chunk_size=128,
+                history_path=history_path,
+            )
+            np.testing.assert_allclose(chunked_param, estimated_param)
+            np.testing.assert_allclose(chunked_hist, param_hist)
+            np.testing.assert_allclose(np.load(history_path), param_hist)
+            del chunked_hist
+
+    def test_identify_without_history(self):
+        """
+        Test the identify method with store_history=False.
+
+        Ensures that chunked identification of 10^6 samples without a history
+        gives the estimate of the full run in memory bounded by the chunk size,
+        and that early stopping still finds the same convergence index.
+        """
+        controller = AdaptiveController(10**6, 6)
+        u_signal, _, y_signal, _, _, _ = controller.simulate(0.1, 1, 2, 3, rng=2)
+        estimated_param, _ = controller.identify(u_signal, y_signal, 1)
+
+        tracemalloc.start()
+        try:
+            chunked_param, param_hist = controller.identify(
+                u_signal, y_signal, 1, chunk_size=10**4, store_history=False
+            )
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertIsNone(param_hist)
+        self.assertLess(peak_memory, 2 * 10**6)
+        np.testing.assert_allclose(chunked_param, estimated_param)
+
+        expected = controller.identify(
+            u_signal, y_signal, 1, convergence_tolerance=0.01, convergence_window=500
+        )
+        estimated_param, param_hist, convergence_index = controller.identify(
+            u_signal,
+            y_signal,
+            1,
+            chunk_size=1200,
+            convergence_tolerance=0.01,
+            convergence_window=500,
+            store_history=False,
+        )
+        self.assertIsNone(param_hist)
+        self.assertEqual(convergence_index, expected[2])
+        np.testing.assert_allclose(estimated_param, expected[0])
+        with self.assertRaises(ValueError):
+            controller.identify(
+                u_signal, y_signal, 1, history_path="hist.npy", store_history=False
+            )
+
+    def test_identify_convergence(self):
+        """
+        Test the identify method with early stopping.
+
+        Verifies that the estimates stop at the convergence index with a
+        truncated history matching the full run, and that an unreachable
+        tolerance processes every sample and reports no convergence index.
+        """
+        controller = AdaptiveController(20000, 6)
+        u_signal, _, y_signal, _, _, _ = controller.simulate(0.1, 1, 2, 3, rng=1)
+        _, full_hist = controller.identify(u_signal, y_signal, 1)
+
+        estimated_param, param_hist, convergence_index = controller.identify(
+            u_signal, y_signal, 1, convergence_tolerance=0.01, convergence_window=500
+        )
+        self.assertLess(convergence_index, 20000)
+        self.assertEqual(convergence_index % 500, 0)
+        self.assertEqual(param_hist.shape, (3, convergence_index))
+        np.testing.assert_allclose(param_hist, full_hist[:, :convergence_index])
+        np.testing.assert_allclose(estimated_param[:, 0], param_hist[:, -1])
+
+        _, param_hist, convergence_index = controller.identify(
+            u_signal,
+            y_signal,
+            1,
+            convergence_tolerance=1e-3,
+            convergence_criterion="trace",
+        )
+        self.assertIsNone(convergence_index)
+        self.assertEqual(param_hist.shape, (3, 20000))
+
+    def test_identify_batch_convergence(self):
+        """
+        Test the identify_batch method with early stopping.
+
+        Ensures that every run reports the convergence index and estimate of
+        the single-run identify method, and that the history is truncated at
+        the last convergence index.
+        """
+        controller = AdaptiveController(20000, 6)
+        u_signals, _, y_signals, _, _, _ = controller.simulate(
+            0.1, 1, 2, 3, rng=1, runs=3
+        )
+        estimated_params, param_hist, convergence_indices = controller.identify_batch(
+            u_signals, y_signals, 1, convergence_tolerance=0.01
+        )
+        self.assertEqual(param_hist.shape[-1], convergence_indices.max())
+        for run in range(3):
+            estimated_param, _, convergence_index = controller.identify(
+                u_signals[run], y_signals[run], 1, convergence_tolerance=0.01
+            )
+            self.assertEqual(convergence_indices[run], convergence_index)
+            np.testing.assert_allclose(estimated_params[run], estimated_param)
+
 
 if __name__ == "__main__":
     unittest.main()
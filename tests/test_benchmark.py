@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+from utils.benchmark import (
+    benchmark_case,
+    compare_results,
+    load_results,
+    run_benchmarks,
+    save_results,
+)
+
+
+class TestBenchmark(unittest.TestCase):
+    """
+    Unit tests for the benchmark functions in the utils.benchmark module.
+    """
+
+    def test_benchmark_case(self):
+        """
+        Test the benchmark_case function.
+
+        Verifies that a case reports a positive throughput and peak memory, and
+        that the order is dropped for benchmarks it does not apply to.
+        """
+        result = benchmark_case("multilevel_identify", 500, order=5, runs=2, repeat=1)
+        self.assertIsNone(result["order"])
+        self.assertGreater(result["samples_per_second"], 0)
+        self.assertGreater(result["peak_memory_bytes"], 0)
+
+    def test_benchmark_case_float32(self):
+        """
+        Test the benchmark_case function in single precision.
+
+        Verifies that the dtype is recorded and that simulating in float32 takes
+        well below the peak memory of float64.
+        """
+        double = benchmark_case("multilevel_simulate", 10**5, runs=2, repeat=1)
+        single = benchmark_case(
+            "multilevel_simulate", 10**5, runs=2, repeat=1, dtype="float32"
+        )
+        self.assertEqual(double["dtype"], "float64")
+        self.assertEqual(single["dtype"], "float32")
+        self.assertLess(single["peak_memory_bytes"], 0.6 * double["peak_memory_bytes"])
+
+    def test_run_benchmarks_save_load(self):
+        """
+        Test the run_benchmarks, save_results and load_results functions.
+
+        Checks that cases above max_total_samples are skipped, that every case
+        runs for every dtype, and that saved results are loaded back unchanged.
+        """
+        results = run_benchmarks(
+            ["adaptive_identify", "denoise_filter"],
+            samples=[200, 400],
+            orders=[2, 3],
+            runs=[1, 2],
+            repeat=1,
+            max_total_samples=400,
+            dtypes=["float64", "float32"],
+        )
+        self.assertEqual(len(results["results"]), 2 * (2 * 3 + 3))
+
+        with tempfile.TemporaryDirectory() as results_dir:
+            path = os.path.join(results_dir, "baseline.json")
+            save_results(path, results)
+            self.assertEqual(load_results(path), results)
+
+    def test_compare_results(self):
+        """
+        Test the compare_results function.
+
+        Ensures that only throughput drops past the threshold are reported as
+        regressions and that cases missing from the baseline are ignored.
+        """
+
+        def results(*throughputs):
+            return {
+                "results": [
+                    {
+                        "name": "denoise_filter",
+                        "samples": samples,
+                        "order": None,
+                        "runs": 1,
+                        "samples_per_second": throughput,
+                    }
+                    for samples, throughput in throughputs
+                ]
+            }
+
+        comparison = compare_results(
+            results((100, 90.0), (200, 70.0), (300, 1.0)),
+            results((100, 100.0), (200, 100.0)),
+            threshold=0.2,
+        )
+        self.assertEqual(len(comparison), 2)
+        self.assertEqual([case["regression"] for case in comparison], [False, True])
+        self.assertAlmostEqual(comparison[1]["ratio"], 0.7)
+
+
+if __name__ == "__main__":
+    unittest.main()
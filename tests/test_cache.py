@@ -0,0 +1,156 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from controllers.adaptive_control import AdaptiveController
+from controllers.multilevel_control import MultilevelController
+from utils.cache import ResultCache
+from utils.instrumentation import Instrumentation
+
+
+class TestResultCache(unittest.TestCase):
+    """
+    Unit tests for the ResultCache class and the cached controller methods.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment for each test case.
+
+        Creates an empty cache in a temporary directory and an adaptive
+        controller using it.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = ResultCache(self.directory)
+        self.controller = AdaptiveController(1000, 6, cache=self.cache)
+
+    def test_simulate_identify_hits(self):
+        """
+        Test repeated seeded simulations and identifications.
+
+        Verifies that the second run is served from the cache with the same
+        results, and that a different seed or different input signals miss.
+        """
+        results = []
+        for _ in range(2):
+            u_signal, _, y_signal, _, _, _ = self.controller.simulate(0.1, rng=4)
+            results.append(self.controller.identify(u_signal, y_signal, 0.99))
+        self.assertEqual(self.cache.stats()["hits"], 2)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+        for expected, cached in zip(*results):
+            np.testing.assert_array_equal(cached, expected)
+
+        self.controller.simulate(0.1, rng=5)
+        self.controller.identify(u_signal, -y_signal, 0.99)
+        self.assertEqual(self.cache.stats()["misses"], 4)
+        self.assertEqual(self.cache.stats()["entries"], 4)
+
+    def test_execution_arguments_ignored(self):
+        """
+        Test identifications differing only in execution arguments.
+
+        Verifies that multilevel identifications with other workers or
+        chunk_size, and adaptive ones with another chunk_size, hit the entry
+        of the first call.
+        """
+        controller = MultilevelController(500, 6, cache=self.cache)
+        u_signal, _, y_signal, _, connection_matrix = controller.simulate(0.1, rng=2)
+        expected = controller.identify(u_signal, y_signal, connection_matrix)
+        for options in (dict(workers=2), dict(chunk_size=128, workers=1)):
+            np.testing.assert_array_equal(
+                controller.identify(u_signal, y_signal, connection_matrix, **options),
+                expected,
+            )
+        self.assertEqual(self.cache.hits, 2)
+
+        u_signal, _, y_signal, _, _, _ = self.controller.simulate(0.1, rng=4)
+        expected = self.controller.identify(u_signal, y_signal, 0.99)
+        cached = self.controller.identify(u_signal, y_signal, 0.99, chunk_size=100)
+        self.assertEqual(self.cache.hits, 3)
+        for result, expected_result in zip(cached, expected):
+            np.testing.assert_array_equal(result, expected_result)
+
+    def test_generator_state(self):
+        """
+        Test caching a simulation drawing from a Generator.
+
+        Ensures that a hit leaves the generator in the state it would have after
+        running the simulation.
+        """
+        first = np.random.default_rng(7)
+        self.controller.simulate(0.1, rng=first)
+        second = np.random.default_rng(7)
+        self.controller.simulate(0.1, rng=second)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(second.random(), first.random())
+
+    def test_bypass(self):
+        """
+        Test the calls that bypass the cache.
+
+        Checks that unseeded simulations and identifications with side effects
+        always run and are not stored.
+        """
+        u_signal, _, y_signal, _, _, _ = self.controller.simulate(0.1)
+        history_path = os.path.join(self.directory, "history.npy")
+        self.controller.identify(u_signal, y_signal, 1, history_path=history_path)
+        self.controller.identify(
+            u_signal, y_signal, 1, instrumentation=Instrumentation()
+        )
+        self.assertEqual(self.cache.stats()["bypassed"], 3)
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    @unittest.skipUnless(importlib.util.find_spec("scipy"), "requires scipy")
+    def test_sparse_multilevel(self):
+        """
+        Test caching the multilevel controller with a sparse connection matrix.
+
+        Verifies that the sparse connection matrix returned by simulate is
+        restored on a hit and that identify hits with it as an argument.
+        """
+        from scipy import sparse
+
+        controller = MultilevelController(500, 6, cache=self.cache)
+        connection_matrix = sparse.diags([np.ones(3)], [1], shape=(4, 4), format="csr")
+        model = dict(
+            a=np.full(4, 0.3), b=np.ones(4), connection_matrix=connection_matrix
+        )
+        results = []
+        for _ in range(2):
+            u_signal, _, y_signal, _, connection = controller.simulate(
+                0.1, rng=1, **model
+            )
+            results.append(controller.identify(u_signal, y_signal, connection))
+        self.assertTrue(sparse.issparse(connection))
+        np.testing.assert_array_equal(connection.toarray(), connection_matrix.toarray())
+        np.testing.assert_array_equal(results[1], results[0])
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_lru_eviction(self):
+        """
+        Test the eviction of the least recently used entries.
+
+        Ensures that an entry read after being stored outlives an entry stored
+        later but not read since, once the size cap is exceeded.
+        """
+        cache = ResultCache(self.directory, max_bytes=20000)
+        signal = np.zeros(1000)
+        cache.store("first", signal)
+        cache.store("second", signal)
+        os.utime(os.path.join(self.directory, "first"), (0, 0))
+        os.utime(os.path.join(self.directory, "second"), (1, 1))
+        self.assertTrue(cache.load("first")[0])
+
+        cache.store("third", (signal, None))
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertFalse(cache.load("second")[0])
+        found, result, _ = cache.load("third")
+        self.assertTrue(found)
+        self.assertIsNone(result[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,217 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_TIME_BUDGET_US = int(os.environ.get("CLI_IMPORT_TIME_BUDGET_US", 750000))
+
+
+def run_python(*args):
+    """
+    Run the Python interpreter in the project root and capture its output.
+    """
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+class TestCli(unittest.TestCase):
+    """
+    Unit tests for the command-line interface in the cli.cli module.
+    """
+
+    def test_import_time_budget(self):
+        """
+        Test the startup cost of the CLI module.
+
+        Measures the import with python -X importtime and checks that neither
+        matplotlib nor the optional numba and scipy packages are loaded, and
+        that the cumulative import time stays within the budget.
+        """
+        result = run_python("-X", "importtime", "-c", "import cli.cli")
+        imports = {}
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, name = line.split("|")
+                if cumulative.strip().isdigit():
+                    imports[name.strip()] = int(cumulative)
+
+        for heavy in ("matplotlib", "numba", "scipy"):
+            self.assertNotIn(heavy, imports)
+        self.assertLess(imports["cli.cli"], IMPORT_TIME_BUDGET_US)
+
+    def test_no_plot(self):
+        """
+        Test the --no-plot option.
+
+        Verifies that the estimates are printed without creating a plot.
+        """
+        result = run_python("run_cli.py", "adaptive", "--samples", "200", "--no-plot")
+        self.assertIn("Estimated Parameters", result.stdout)
+
+    def test_output(self):
+        """
+        Test the --output option.
+
+        Ensures that the plot is written to the requested file.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            output = os.path.join(output_dir, "radar.png")
+            run_python(
+                "run_cli.py", "multilevel", "--samples", "200", "--output", output
+            )
+            self.assertTrue(os.path.getsize(output) > 0)
+
+    def test_profile(self):
+        """
+        Test the --profile and --profile-output options.
+
+        Verifies that the per-phase breakdown is printed and that the cProfile
+        statistics are written to the requested file.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            output = os.path.join(output_dir, "identify.prof")
+            result = run_python(
+                "run_cli.py",
+                "multilevel",
+                "--samples",
+                "200",
+                "--no-plot",
+                "--profile",
+                "--profile-output",
+                output,
+            )
+            self.assertIn("normal_equations", result.stdout)
+            self.assertTrue(os.path.getsize(output) > 0)
+
+    def test_cache_dir(self):
+        """
+        Test the --cache-dir option.
+
+        Ensures that a rerun of a seeded simulation is read from the cache and
+        prints the same estimates.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            arguments = ["adaptive", "--samples", "200", "--seed", "2", "--no-plot"]
+            first = run_python("run_cli.py", *arguments, "--cache-dir", cache_dir)
+            second = run_python("run_cli.py", *arguments, "--cache-dir", cache_dir)
+        self.assertIn("Cache: 0 hits, 2 misses", first.stdout)
+        self.assertIn("Cache: 2 hits, 0 misses", second.stdout)
+        self.assertEqual(
+            first.stdout.split("Cache")[0], second.stdout.split("Cache")[0]
+        )
+
+    def test_soak(self):
+        """
+        Test the soak command.
+
+        Verifies that a short multilevel stream is processed in chunks and that
+        the throughput and estimates are printed.
+        """
+        result = run_python(
+            "run_cli.py",
+            "soak",
+            "multilevel",
+            "--samples",
+            "1000",
+            "--chunk-size",
+            "300",
+        )
+        self.assertIn("Processed 1000 samples", result.stdout)
+        self.assertIn("Estimated Parameters", result.stdout)
+
+    def test_closed_loop(self):
+        """
+        Test the closed-loop command.
+
+        Ensures that the tracking error summary is printed and that the
+        decimated estimates of every run are saved.
+        """
+        with tempfile.TemporaryDirectory() as output_dir:
+            output = os.path.join(output_dir, "closed_loop.npz")
+            result = run_python(
+                "run_cli.py",
+                "closed-loop",
+                "--samples",
+                "500",
+                "--runs",
+                "20",
+                "--decimation",
+                "50",
+                "--output",
+                output,
+            )
+            with np.load(output) as arrays:
+                self.assertEqual(arrays["param_hist"].shape, (20, 3, 10))
+        self.assertIn("RMS tracking error", result.stdout)
+
+    def test_load_test(self):
+        """
+        Test the load-test command.
+
+        Verifies that a service started for the test completes every request
+        and that the latency and batching are printed.
+        """
+        result = run_python(
+            "run_cli.py",
+            "load-test",
+            "multilevel",
+            "--requests",
+            "20",
+            "--samples",
+            "200",
+            "--workers",
+            "1",
+        )
+        self.assertIn("Completed 20 of 20 requests", result.stdout)
+        self.assertIn("Latency: mean", result.stdout)
+        self.assertIn("mean batch size", result.stdout)
+
+    def test_identify_saved_signals(self):
+        """
+        Test the identify command on signals saved with --save-signals.
+
+        Ensures that identifying the saved signals in chunks prints the same
+        estimates as the simulation command and writes the estimates file.
+        """
+        with tempfile.TemporaryDirectory() as signal_dir:
+            simulated = run_python(
+                "run_cli.py",
+                "adaptive",
+                "--samples",
+                "500",
+                "--seed",
+                "3",
+                "--no-plot",
+                "--save-signals",
+                signal_dir,
+            )
+            estimates = os.path.join(signal_dir, "estimates.npy")
+            identified = run_python(
+                "run_cli.py",
+                "identify",
+                "adaptive",
+                "--u",
+                os.path.join(signal_dir, "u.npy"),
+                "--y",
+                os.path.join(signal_dir, "y.npy"),
+                "--chunk-size",
+                "64",
+                "--estimates",
+                estimates,
+            )
+            self.assertTrue(os.path.exists(estimates))
+        expected = simulated.stdout.split("Estimated Parameters:")[1].split(",")
+        for value in expected:
+            self.assertIn(value.split(":")[1].strip()[:8], identified.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
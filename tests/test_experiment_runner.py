@@ -0,0 +1,166 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from utils.cache import ResultCache
+from utils.experiment_runner import convergence_time, parameter_grid, run_sweep
+
+
+class TestExperimentRunner(unittest.TestCase):
+    """
+    Unit tests for the Monte-Carlo sweep functions in the utils.experiment_runner module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment for each test case.
+
+        Builds a small adaptive grid over noise variance and forgetting factor.
+        """
+        self.grid = parameter_grid(variance=[0.1, 0.2], forgetting_factor=[1, 0.99])
+
+    def test_parameter_grid(self):
+        """
+        Test the parameter_grid function.
+
+        Verifies that the grid holds every combination of the swept values.
+        """
+        self.assertEqual(len(self.grid), 4)
+        self.assertIn({"variance": 0.2, "forgetting_factor": 0.99}, self.grid)
+
+    def test_convergence_time(self):
+        """
+        Test the convergence_time function.
+
+        Checks the index after which a history stays within tolerance, and that
+        a run ending outside the tolerance reports the full number of samples.
+        """
+        param_hist = np.array([[[0.0, 0.5, 0.95, 1.2, 1.05, 1.0]], [[0.0] * 6]])
+        np.testing.assert_array_equal(convergence_time(param_hist, [1.0], 0.1), [4, 6])
+
+    def test_run_sweep_workers(self):
+        """
+        Test the run_sweep function with a process pool.
+
+        Verifies the shapes of the aggregated arrays and that the results do not
+        depend on the number of worker processes.
+        """
+        pooled = run_sweep(
+            "adaptive", self.grid, 8, 500, seed=5, workers=2, chunk_size=3
+        )
+        inline = run_sweep(
+            "adaptive", self.grid, 8, 500, seed=5, workers=1, chunk_size=3
+        )
+        self.assertEqual(pooled["bias"].shape, (4, 3))
+        self.assertEqual(pooled["variance"].shape, (4, 3))
+        self.assertEqual(pooled["convergence_time"].shape, (4,))
+        self.assertEqual(pooled["estimates"].shape, (4, 8, 3))
+        for key in pooled:
+            np.testing.assert_array_equal(pooled[key], inline[key])
+
+    def test_run_sweep_cache(self):
+        """
+        Test the run_sweep function with a result cache.
+
+        Verifies that rerunning a sweep reads every simulation and
+        identification from the cache and gives the same results.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = ResultCache(cache_dir)
+            first = run_sweep("adaptive", self.grid, 4, 500, workers=1, cache=cache)
+            second = run_sweep("adaptive", self.grid, 4, 500, workers=1, cache=cache)
+        self.assertEqual(cache.misses, 8)
+        self.assertEqual(cache.hits, 8)
+        for key in first:
+            np.testing.assert_array_equal(second[key], first[key])
+
+    def test_run_sweep_early_stopping(self):
+        """
+        Test the run_sweep function with early stopping.
+
+        Verifies that the convergence time reports the mean early-stopping
+        index, at least one convergence window and below the number of samples.
+        """
+        summary = run_sweep(
+            "adaptive",
+            parameter_grid(variance=[0.1]),
+            4,
+            3000,
+            workers=1,
+            convergence_tolerance=0.05,
+            convergence_window=250,
+        )
+        self.assertGreaterEqual(summary["convergence_time"][0], 250)
+        self.assertLess(summary["convergence_time"][0], 3000)
+
+    def test_run_sweep_resume(self):
+        """
+        Test resuming a partially finished sweep.
+
+        Removes one finished job from the results directory and checks that a
+        rerun only recomputes that job and gives the same results, and that
+        sweeps with other parameters or repetitions in the same directory
+        recompute the stored jobs instead of reusing them.
+        """
+        with tempfile.TemporaryDirectory() as results_dir:
+            first = run_sweep(
+                "multilevel",
+                parameter_grid(variance=[0.1], a1=[0.5, 0.3]),
+                4,
+                300,
+                seed=2,
+                workers=1,
+                chunk_size=2,
+                results_dir=results_dir,
+            )
+            os.remove(os.path.join(results_dir, "point1_chunk1.npz"))
+            kept = os.path.join(results_dir, "point0_chunk0.npz")
+            kept_mtime = os.stat(kept).st_mtime_ns
+
+            resumed = run_sweep(
+                "multilevel",
+                parameter_grid(variance=[0.1], a1=[0.5, 0.3]),
+                4,
+                300,
+                seed=2,
+                workers=1,
+                chunk_size=2,
+                results_dir=results_dir,
+            )
+            self.assertEqual(os.stat(kept).st_mtime_ns, kept_mtime)
+            self.assertEqual(len(os.listdir(results_dir)), 4)
+            np.testing.assert_array_equal(first["estimates"], resumed["estimates"])
+
+            for grid, repetitions in (
+                (parameter_grid(variance=[0.1], a1=[0.7, 0.3]), 4),
+                (parameter_grid(variance=[0.1], a1=[0.5, 0.3]), 8),
+            ):
+                changed = run_sweep(
+                    "multilevel",
+                    grid,
+                    repetitions,
+                    300,
+                    seed=2,
+                    workers=1,
+                    chunk_size=2,
+                    results_dir=results_dir,
+                )
+                expected = run_sweep(
+                    "multilevel",
+                    grid,
+                    repetitions,
+                    300,
+                    seed=2,
+                    workers=1,
+                    chunk_size=2,
+                )
+                np.testing.assert_array_equal(
+                    changed["true_param"], expected["true_param"]
+                )
+                np.testing.assert_array_equal(
+                    changed["estimates"], expected["estimates"]
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+from controllers.adaptive_control import AdaptiveController
+from controllers.multilevel_control import MultilevelController
+from utils.instrumentation import Instrumentation, chunk_bounds
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Unit tests for the Instrumentation class and the instrumented identify methods.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment for each test case.
+
+        Creates an instrumentation that records every callback.
+        """
+        self.calls = []
+        self.instrumentation = Instrumentation(
+            300,
+            lambda samples, estimate, trace: self.calls.append(
+                (samples, estimate, trace)
+            ),
+        )
+
+    def test_chunk_bounds(self):
+        """
+        Test the chunk_bounds function.
+
+        Verifies that the chunks end at multiples of the chunk size and of the
+        callback interval, and that no interval is added without a callback.
+        """
+        self.assertEqual(
+            chunk_bounds(1000, 400, self.instrumentation),
+            [(0, 300), (300, 400), (400, 600), (600, 800), (800, 900), (900, 1000)],
+        )
+        self.assertEqual(
+            chunk_bounds(1000, 400, Instrumentation(300)),
+            [(0, 400), (400, 800), (800, 1000)],
+        )
+        self.assertEqual(chunk_bounds(1000), [(0, 1000)])
+
+    def test_adaptive_identify(self):
+        """
+        Test the instrumented AdaptiveController.identify method.
+
+        Ensures that instrumentation does not change the estimates, that the
+        phases are timed, and that every callback receives the estimate stored
+        in the history at that sample.
+        """
+        controller = AdaptiveController(1000, 6)
+        u_signal, _, y_signal, _, _, _ = controller.simulate(0.1, rng=0)
+        estimated_param, param_hist = controller.identify(
+            u_signal, y_signal, 0.99, mode="sqrt"
+        )
+        instrumented_param, instrumented_hist = controller.identify(
+            u_signal, y_signal, 0.99, mode="sqrt", instrumentation=self.instrumentation
+        )
+
+        np.testing.assert_allclose(instrumented_param, estimated_param)
+        np.testing.assert_allclose(instrumented_hist, param_hist)
+        self.assertEqual(
+            set(self.instrumentation.phase_times), {"history", "regressor", "update"}
+        )
+        self.assertEqual(self.instrumentation.samples, 1000)
+        self.assertEqual([call[0] for call in self.calls], [300, 600, 900])
+        for samples, estimate, trace in self.calls:
+            np.testing.assert_allclose(estimate, param_hist[:, samples - 1])
+            self.assertGreater(trace, 0)
+        self.assertIn("update", self.instrumentation.report())
+
+    def test_multilevel_identify(self):
+        """
+        Test the instrumented MultilevelController.identify method.
+
+        Checks that the estimates are unchanged and that every callback receives
+        the estimates of every subsystem and one covariance trace per subsystem.
+        """
+        controller = MultilevelController(1000, 6)
+        u_signal, _, y_signal, _, connection_matrix = controller.simulate(0.1, rng=0)
+        estimated_param = controller.identify(
+            u_signal,
+            y_signal,
+            connection_matrix,
+            chunk_size=250,
+            instrumentation=self.instrumentation,
+        )
+
+        np.testing.assert_allclose(
+            estimated_param,
+            controller.identify(u_signal, y_signal, connection_matrix),
+        )
+        self.assertEqual(self.instrumentation.phase_calls["regressor"], 7)
+        self.assertEqual(len(self.calls), 3)
+        self.assertEqual(self.calls[-1][1].shape, (2, 2))
+        self.assertEqual(self.calls[-1][2].shape, (2,))
+
+
+if __name__ == "__main__":
+    unittest.main()
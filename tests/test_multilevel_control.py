@@ -1,6 +1,10 @@
+import importlib.util
 import unittest
 import numpy as np
-from controllers.multilevel_control import MultilevelController
+from controllers.multilevel_control import (
+    MultilevelController,
+    StreamingMultilevelEstimator,
+)
 
 
 class TestMultilevelController(unittest.TestCase):
@@ -32,6 +36,19 @@ class TestMultilevelController(unittest.TestCase):
         self.assertEqual(v_signal.shape, (2, 1000))
         self.assertEqual(y_signal.shape, (2, 1000))
 
+    def test_simulate_seeded(self):
+        """
+        Test the simulate method with a seed.
+
+        Verifies that the same seed reproduces the same signals and that
+        different seeds give different noise.
+        """
+        first = self.controller.simulate(0.1, rng=11)
+        second = self.controller.simulate(0.1, rng=11)
+        third = self.controller.simulate(0.1, rng=12)
+        np.testing.assert_array_equal(first[2], second[2])
+        self.assertFalse(np.array_equal(first[2], third[2]))
+
     def test_identify(self):
         """
         Test the identify method.
@@ -48,6 +65,233 @@ class TestMultilevelController(unittest.TestCase):
         )
         self.assertEqual(len(estimated_param), 2)
 
+    def test_identify_chunked(self):
+        """
+        Test the identify method with chunks of samples.
+
+        Verifies that accumulating the normal equations over chunks gives the
+        same estimates as a single pass over the signals.
+        """
+        u_signal, _, y_signal, _, connection_matrix = self.controller.simulate(
+            0.1, runs=3
+        )
+        np.testing.assert_allclose(
+            self.controller.identify(
+                u_signal, y_signal, connection_matrix, chunk_size=77
+            ),
+            self.controller.identify(u_signal, y_signal, connection_matrix),
+        )
+
+    def test_identify_matches_normal_equations(self):
+        """
+        Test the identify method against the explicit normal-equation solution.
+
+        Checks that the Cholesky-based estimates equal y Phi^T (Phi Phi^T)^-1
+        computed for each subsystem.
+        """
+        u_signal, _, y_signal, _, connection_matrix = self.controller.simulate(
+            0.1, rng=1
+        )
+        estimated_param = self.controller.identify(
+            u_signal, y_signal, connection_matrix
+        )
+        for subsystem in range(2):
+            input_matrix = np.array(
+                [connection_matrix[subsystem] @ y_signal, u_signal[subsystem]]
+            )
+            expected = (
+                y_signal[subsystem]
+                @ input_matrix.T
+                @ np.linalg.inv(input_matrix @ input_matrix.T)
+            )
+            np.testing.assert_allclose(estimated_param[subsystem], expected)
+
+    def test_simulate_identify_runs(self):
+        """
+        Test the simulate and identify methods batched over several runs.
+
+        Verifies the (runs, 2, samples) signal shapes and that the batched
+        estimates equal the single-run estimates of every run.
+        """
+        u_signal, v_signal, y_signal, _, connection_matrix = self.controller.simulate(
+            0.1, rng=2, runs=6
+        )
+        self.assertEqual(u_signal.shape, (6, 2, 1000))
+        self.assertEqual(v_signal.shape, (6, 2, 1000))
+        self.assertEqual(y_signal.shape, (6, 2, 1000))
+
+        estimated_params = self.controller.identify(
+            u_signal, y_signal, connection_matrix
+        )
+        self.assertEqual(estimated_params.shape, (6, 2, 2))
+        for run in range(6):
+            np.testing.assert_allclose(
+                estimated_params[run],
+                self.controller.identify(
+                    u_signal[run], y_signal[run], connection_matrix
+                ),
+            )
+
+    @unittest.skipUnless(importlib.util.find_spec("scipy"), "requires scipy")
+    def test_n_subsystems_sparse(self):
+        """
+        Test the simulate and identify methods with many sparse-connected subsystems.
+
+        Simulates a chain of 40 subsystems with a scipy.sparse connection matrix
+        and checks that the sparse and dense paths give the same signals, that
+        the estimates are close to the true parameters and that splitting the
+        subsystems over several threads does not change them.
+        """
+        from scipy import sparse
+
+        subsystems = 40
+        rng = np.random.default_rng(0)
+        a = rng.uniform(0.1, 0.5, subsystems)
+        b = rng.uniform(0.5, 1.5, subsystems)
+        connection_matrix = sparse.diags(
+            [np.full(subsystems - 1, 0.5), np.full(subsystems - 1, 0.5)],
+            [1, -1],
+            format="csr",
+        )
+
+        u_signal, _, y_signal, model_param, _ = self.controller.simulate(
+            0.1, rng=5, a=a, b=b, connection_matrix=connection_matrix
+        )
+        _, _, dense_y_signal, _, _ = self.controller.simulate(
+            0.1, rng=5, a=a, b=b, connection_matrix=connection_matrix.toarray()
+        )
+        self.assertEqual(y_signal.shape, (subsystems, 1000))
+        np.testing.assert_allclose(y_signal, dense_y_signal, atol=1e-12)
+
+        estimated_param = self.controller.identify(
+            u_signal, y_signal, connection_matrix
+        )
+        self.assertEqual(estimated_param.shape, (subsystems, 2))
+        self.assertLess(np.median(np.abs(estimated_param - model_param)), 0.1)
+        np.testing.assert_array_equal(
+            self.controller.identify(u_signal, y_signal, connection_matrix, workers=3),
+            estimated_param,
+        )
+
+    @unittest.skipUnless(importlib.util.find_spec("scipy"), "requires scipy")
+    def test_simulate_stream(self):
+        """
+        Test the simulate_stream method.
+
+        Checks that the chunks of batched runs of a sparse chain of subsystems
+        equal the signals of simulate with the same seed.
+        """
+        from scipy import sparse
+
+        connection_matrix = sparse.diags([np.ones(4)], [1], shape=(5, 5), format="csr")
+        model = dict(
+            a=np.full(5, 0.3), b=np.ones(5), connection_matrix=connection_matrix
+        )
+        expected = self.controller.simulate(0.1, rng=7, runs=2, **model)
+        chunks = self.controller.simulate_stream(0.1, 300, rng=7, runs=2, **model)
+        for streamed, signal in zip(zip(*chunks), expected[:3]):
+            np.testing.assert_allclose(np.concatenate(streamed, axis=-1), signal)
+
+    @unittest.skipUnless(importlib.util.find_spec("scipy"), "requires scipy")
+    def test_float32_simulate_identify(self):
+        """
+        Test simulating and identifying in single precision.
+
+        Checks that the signals and estimates of dense and sparse systems, batch
+        and streamed, stay float32 and that their estimation error differs from
+        the float64 one by less than 1e-4.
+        """
+        from scipy import sparse
+
+        controller = MultilevelController(20000, 6)
+        connection_matrix = sparse.diags(
+            [np.ones(3), [1.0]], [1, -3], shape=(4, 4), format="csr"
+        )
+        for model in (
+            {},
+            dict(a=np.full(4, 0.3), b=np.ones(4), connection_matrix=connection_matrix),
+        ):
+            estimates = {}
+            for dtype in (np.float64, np.float32):
+                u_signal, v_signal, y_signal, model_param, connection = (
+                    controller.simulate(0.1, rng=6, runs=2, dtype=dtype, **model)
+                )
+                for signal in (u_signal, v_signal, y_signal):
+                    self.assertEqual(signal.dtype, dtype)
+                estimates[dtype] = controller.identify(u_signal, y_signal, connection)
+                self.assertEqual(estimates[dtype].dtype, dtype)
+            np.testing.assert_allclose(
+                estimates[np.float32], estimates[np.float64], atol=1e-4
+            )
+
+        estimator = StreamingMultilevelEstimator(
+            connection, mode="sqrt", dtype=np.float32
+        )
+        for u_chunk, _, y_chunk in controller.simulate_stream(
+            0.1, 5000, dtype=np.float32, rng=6, **model
+        ):
+            self.assertEqual(y_chunk.dtype, np.float32)
+            estimator.update_batch(u_chunk, y_chunk)
+        self.assertEqual(estimator.estimated_param.dtype, np.float32)
+        np.testing.assert_allclose(estimator.estimated_param, model_param, atol=0.1)
+
+    def test_simulate_mismatched_subsystems(self):
+        """
+        Test that simulate rejects parameters of inconsistent sizes.
+        """
+        with self.assertRaises(ValueError):
+            self.controller.simulate(0.1, a=[0.1, 0.2, 0.3], b=[1, 1, 1])
+
+    def test_streaming_estimator(self):
+        """
+        Test the StreamingMultilevelEstimator class.
+
+        Feeds the measurements in chunks and checks that, without forgetting,
+        the recursive estimates agree with the batch least squares estimates.
+        """
+        u_signal, _, y_signal, _, connection_matrix = self.controller.simulate(
+            0.1, rng=8
+        )
+        estimator = StreamingMultilevelEstimator(connection_matrix)
+        for start in range(0, 1000, 128):
+            estimator.update_batch(
+                u_signal[:, start : start + 128], y_signal[:, start : start + 128]
+            )
+
+        self.assertEqual(estimator.samples_seen, 1000)
+        np.testing.assert_allclose(
+            estimator.estimated_param,
+            self.controller.identify(u_signal, y_signal, connection_matrix),
+            atol=1e-3,
+        )
+
+    def test_streaming_estimator_forgetting(self):
+        """
+        Test the StreamingMultilevelEstimator with forgetting.
+
+        Changes a1 halfway through the stream and checks that an estimator with
+        forgetting follows the batch estimate of the second half, which differs
+        from the estimate of the first half.
+        """
+        controller = MultilevelController(2000, 6)
+        estimator = StreamingMultilevelEstimator(
+            np.array([[0, 1], [1, 0]]), forgetting_factor=0.995, mode="sqrt"
+        )
+        batch_estimates = []
+        for a1, seed in [(0.5, 1), (-0.3, 2)]:
+            u_signal, _, y_signal, _, connection_matrix = controller.simulate(
+                0.1, a1=a1, rng=seed
+            )
+            estimator.update_batch(u_signal, y_signal)
+            batch_estimates.append(
+                controller.identify(u_signal, y_signal, connection_matrix)
+            )
+
+        np.testing.assert_allclose(
+            estimator.estimated_param, batch_estimates[1], atol=0.15
+        )
+        self.assertLess(estimator.estimated_param[0, 0], 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,9 @@
+import os
+import tempfile
 import unittest
+import matplotlib.pyplot as plt
 import numpy as np
-from utils.plotter import unified_plot, radar_plot
+from utils.plotter import unified_plot, radar_plot, decimate_envelope
 
 
 class TestPlotter(unittest.TestCase):
@@ -40,6 +43,64 @@ class TestPlotter(unittest.TestCase):
         except Exception as e:
             self.fail(f"radar_plot raised an exception: {e}")
 
+    def test_decimate_envelope(self):
+        """
+        Test the decimate_envelope function.
+
+        Verifies that a long series is reduced to two points per bin and that
+        the envelope keeps the global minimum and maximum of every series.
+        """
+        x = np.arange(100000)
+        y = [np.sin(x / 1000.0), np.random.randn(100000)]
+        x_decimated, y_decimated = decimate_envelope(x, y, 640)
+        self.assertEqual(x_decimated.shape, (1280,))
+        self.assertEqual(y_decimated.shape, (2, 1280))
+        for series, decimated in zip(y, y_decimated):
+            self.assertEqual(decimated.min(), series.min())
+            self.assertEqual(decimated.max(), series.max())
+
+    def test_plots_to_files(self):
+        """
+        Test rendering plots to PNG and SVG files.
+
+        Ensures that many long plots are written to files without a display and
+        without leaving any figure registered with pyplot.
+        """
+        x = np.arange(10**5)
+        y = np.random.randn(3, 10**5)
+        with tempfile.TemporaryDirectory() as output_dir:
+            for i in range(5):
+                unified_plot(
+                    x,
+                    y,
+                    ["a", "b", "c"],
+                    output=os.path.join(output_dir, f"plot{i}.png"),
+                )
+            radar_plot(
+                [1, 2, 3],
+                [1, 2, 2],
+                ["A", "B", "C"],
+                output=os.path.join(output_dir, "radar.svg"),
+            )
+            self.assertEqual(len(os.listdir(output_dir)), 6)
+        self.assertEqual(plt.get_fignums(), [])
+
+    def test_radar_plot_keeps_inputs(self):
+        """
+        Test that radar_plot does not modify the caller's value lists.
+        """
+        true_values = [0.5, 0.7, 0.2]
+        estimated_values = [0.6, 0.6, 0.3]
+        with tempfile.TemporaryDirectory() as output_dir:
+            radar_plot(
+                true_values,
+                estimated_values,
+                ["A", "B", "C"],
+                output=os.path.join(output_dir, "radar.png"),
+            )
+        self.assertEqual(true_values, [0.5, 0.7, 0.2])
+        self.assertEqual(estimated_values, [0.6, 0.6, 0.3])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,344 @@
+import unittest
+import numpy as np
+from controllers import rls
+from controllers.rls import (
+    StreamingEstimator,
+    block_rls_fir,
+    fir_correlations,
+    fir_regressor,
+    init_rls_state,
+    least_squares_fir,
+    rls_kernel,
+)
+
+
+class TestRls(unittest.TestCase):
+    """
+    Unit tests for the recursive least squares kernel in the controllers.rls module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment for each test case.
+
+        Generates a random input signal and the output of a 5-tap FIR model
+        driven by it.
+        """
+        rng = np.random.default_rng(0)
+        self.coefficients = np.array([0.5, -1.0, 2.0, 0.25, 1.5])
+        self.input_signal = rng.standard_normal(2000)
+        self.output_signal = np.convolve(self.input_signal, self.coefficients)[:2000]
+
+    def test_fir_regressor(self):
+        """
+        Test the fir_regressor function.
+
+        Verifies that each row holds the current and delayed input samples and
+        that samples before the start of the signal are zero.
+        """
+        regressor_matrix = fir_regressor([1.0, 2.0, 3.0, 4.0], 3)
+        np.testing.assert_array_equal(
+            regressor_matrix,
+            [[1, 0, 0], [2, 1, 0], [3, 2, 1], [4, 3, 2]],
+        )
+
+    def test_rls_kernel_order_n(self):
+        """
+        Test the rls_kernel function.
+
+        Ensures that the kernel recovers the coefficients of a noiseless FIR
+        model of order 5 and fills the parameter history in place.
+        """
+        estimated_param, weight_function = init_rls_state(5)
+        param_hist = np.zeros((5, 2000))
+        rls_kernel(
+            fir_regressor(self.input_signal, 5),
+            self.output_signal,
+            1,
+            estimated_param,
+            weight_function,
+            param_hist,
+        )
+        np.testing.assert_allclose(estimated_param, self.coefficients, atol=1e-6)
+        np.testing.assert_array_equal(param_hist[:, -1], estimated_param)
+
+    def test_kernels_agree(self):
+        """
+        Test that the loop and NumPy kernels agree.
+
+        Runs the scalar-loop kernel and the in-place NumPy kernel on the same
+        data and checks that they produce the same estimates and history.
+        """
+        regressor_matrix = fir_regressor(self.input_signal, 5)
+        results = []
+        for kernel in (rls._rls_loops, rls._rls_numpy):
+            estimated_param, weight_function = init_rls_state(5)
+            param_hist = np.zeros((5, 2000))
+            kernel(
+                regressor_matrix,
+                self.output_signal,
+                0.99,
+                estimated_param,
+                weight_function,
+                param_hist,
+            )
+            results.append(param_hist)
+        np.testing.assert_allclose(results[0], results[1], atol=1e-8)
+
+    def test_kernels_long_run_forgetting(self):
+        """
+        Test both standard kernels over a long run with forgetting_factor < 1.
+
+        Over 60000 samples at forgetting_factor=0.999 the weight function must
+        stay symmetric and the estimates of the loop and NumPy kernels must
+        agree and stay close to the FIR coefficients.
+        """
+        rng = np.random.default_rng(2)
+        input_signal = rng.standard_normal(60000)
+        output_signal = np.convolve(input_signal, [1.0, 2.0, 3.0])[:60000]
+        output_signal += 0.1 * rng.standard_normal(60000)
+        regressor_matrix = fir_regressor(input_signal, 3)
+        results = []
+        for kernel in (rls._rls_loops, rls._rls_numpy):
+            estimated_param, weight_function = init_rls_state(3)
+            kernel(
+                regressor_matrix,
+                output_signal,
+                0.999,
+                estimated_param,
+                weight_function,
+                np.zeros((3, 0)),
+            )
+            np.testing.assert_allclose(weight_function, weight_function.T, atol=1e-12)
+            results.append(estimated_param)
+        np.testing.assert_allclose(results[0], results[1], atol=1e-8)
+        np.testing.assert_allclose(results[0], [1.0, 2.0, 3.0], atol=0.05)
+
+    def test_closed_loop_kernels_agree(self):
+        """
+        Test that the loop and NumPy closed-loop kernels agree.
+
+        Runs self-tuning control of three plants with both covariance updates
+        and checks that the scalar-loop kernel, run plant by plant, and the
+        NumPy kernel, vectorized over plants, give the same inputs, outputs
+        and decimated estimates.
+        """
+        rng = np.random.default_rng(1)
+        runs, samples = 3, 400
+        reference = np.sin(np.linspace(0, 6, samples))
+        model_params = rng.uniform(0.2, 1.0, (runs, 3))
+        noise = rng.normal(0, 0.05, (runs, samples))
+        excitation = rng.normal(0, 0.1, (runs, samples))
+        for mode in ("standard", "sqrt"):
+            results = []
+            for kernel in (rls._closed_loop_loops, rls._closed_loop_numpy):
+                estimated_param, weight_function = init_rls_state(3, mode=mode)
+                buffers = (
+                    np.tile(estimated_param, (runs, 1)),
+                    np.tile(weight_function, (runs, 1, 1)),
+                    np.zeros((runs, samples)),
+                    np.zeros((runs, samples)),
+                    np.zeros((runs, 3, samples // 10)),
+                )
+                kernel(
+                    reference,
+                    model_params,
+                    noise,
+                    excitation,
+                    0.1,
+                    0.99,
+                    mode == "sqrt",
+                    *buffers,
+                    10,
+                )
+                results.append(buffers)
+            for loop_result, numpy_result in zip(*results):
+                np.testing.assert_allclose(loop_result, numpy_result, atol=1e-8)
+            np.testing.assert_array_equal(results[0][4][:, :, -1], results[0][0])
+
+    def test_fir_correlations(self):
+        """
+        Test the fir_correlations function.
+
+        Verifies that the normal equations from correlation sums, direct and
+        with FFT, match the products of the regressor matrix, also for a
+        signal shorter than the number of taps.
+        """
+        for samples, order in ((2000, 5), (7, 10)):
+            input_signal = self.input_signal[:samples]
+            regressor_matrix = fir_regressor(input_signal, order)
+            for use_fft in (False, True):
+                normal_matrix, moment_vector = fir_correlations(
+                    input_signal, self.output_signal[:samples], order, use_fft
+                )
+                np.testing.assert_allclose(
+                    normal_matrix, regressor_matrix.T @ regressor_matrix, atol=1e-9
+                )
+                np.testing.assert_allclose(
+                    moment_vector,
+                    regressor_matrix.T @ self.output_signal[:samples],
+                    atol=1e-9,
+                )
+
+    def test_least_squares_and_block_rls(self):
+        """
+        Test the least_squares_fir and block_rls_fir functions.
+
+        Ensures that the direct solution matches the final sample-wise RLS
+        estimate and that block RLS matches it at the end of every block, with
+        and without forgetting.
+        """
+        output_signal = self.output_signal + 0.1 * np.random.default_rng(
+            1
+        ).standard_normal(2000)
+        regressor_matrix = fir_regressor(self.input_signal, 5)
+        for forgetting_factor in (1, 0.99):
+            estimated_param, weight_function = init_rls_state(5, mode="sqrt")
+            param_hist = np.zeros((5, 2000))
+            rls_kernel(
+                regressor_matrix,
+                output_signal,
+                forgetting_factor,
+                estimated_param,
+                weight_function,
+                param_hist,
+                mode="sqrt",
+            )
+
+            np.testing.assert_allclose(
+                least_squares_fir(
+                    self.input_signal, output_signal, 5, forgetting_factor
+                ),
+                estimated_param,
+                rtol=1e-9,
+            )
+            block_param, block_hist = block_rls_fir(
+                self.input_signal, output_signal, 5, forgetting_factor, 300
+            )
+            self.assertEqual(block_hist.shape, (5, 7))
+            np.testing.assert_allclose(block_param, estimated_param, rtol=1e-9)
+            np.testing.assert_allclose(
+                block_hist[:, :-1], param_hist[:, 299::300], rtol=1e-9
+            )
+
+    def test_streaming_estimator_chunks(self):
+        """
+        Test the StreamingEstimator update methods.
+
+        Feeds the signal in uneven chunks and sample by sample and checks that
+        the final estimate equals the one from a single pass over the whole signal.
+        """
+        regressor_matrix = fir_regressor(self.input_signal, 5)
+        estimated_param, weight_function = init_rls_state(5)
+        rls_kernel(
+            regressor_matrix, self.output_signal, 0.99, estimated_param, weight_function
+        )
+
+        estimator = StreamingEstimator(order=5, forgetting_factor=0.99)
+        for start, stop in [(0, 1), (1, 7), (7, 1500), (1500, 1990)]:
+            estimator.update_batch(
+                self.input_signal[start:stop], self.output_signal[start:stop]
+            )
+        for i in range(1990, 2000):
+            estimator.update(self.input_signal[i], self.output_signal[i])
+
+        self.assertEqual(estimator.samples_seen, 2000)
+        np.testing.assert_allclose(
+            estimator.estimated_param.ravel(), estimated_param, atol=1e-8
+        )
+
+    def test_streaming_estimator_history(self):
+        """
+        Test the ring-buffer history of the StreamingEstimator.
+
+        Verifies that only the last history_size decimated estimates are kept,
+        in chronological order, regardless of how many samples were streamed.
+        """
+        estimator = StreamingEstimator(order=5, history_size=4, decimation=100)
+        for start in range(0, 2000, 300):
+            estimator.update_batch(
+                self.input_signal[start : start + 300],
+                self.output_signal[start : start + 300],
+            )
+
+        sample_index, param_hist = estimator.history()
+        np.testing.assert_array_equal(sample_index, [1699, 1799, 1899, 1999])
+        self.assertEqual(param_hist.shape, (5, 4))
+        np.testing.assert_array_equal(
+            param_hist[:, -1], estimator.estimated_param.ravel()
+        )
+
+    def test_sqrt_mode_matches_standard(self):
+        """
+        Test the square-root RLS mode against the standard update.
+
+        Checks that both modes give the same estimates and that the weight
+        function rebuilt from the square-root factor equals the standard one.
+        """
+        regressor_matrix = fir_regressor(self.input_signal, 5)
+        states = {}
+        for mode in ("standard", "sqrt"):
+            estimated_param, weight_function = init_rls_state(5, mode=mode)
+            rls_kernel(
+                regressor_matrix,
+                self.output_signal,
+                0.995,
+                estimated_param,
+                weight_function,
+                mode=mode,
+            )
+            states[mode] = estimated_param, weight_function
+
+        np.testing.assert_allclose(states["sqrt"][0], states["standard"][0], atol=1e-8)
+        weight_factor = states["sqrt"][1]
+        np.testing.assert_allclose(
+            weight_factor @ weight_factor.T, states["standard"][1], atol=1e-8
+        )
+
+    @unittest.skipUnless(rls.NUMBA_AVAILABLE, "1e7-sample run needs numba")
+    def test_sqrt_mode_long_run_float32(self):
+        """
+        Test the square-root RLS mode over 1e7 samples in float32.
+
+        With forgetting_factor=1 and with forgetting_factor=0.999, the float32
+        square-root estimates must match the float64 standard ones, compared
+        every 1e5 samples over the whole run, and stay finite.
+        """
+        rng = np.random.default_rng(1)
+        samples, chunk = 10**7, 10**6
+        input_signal = rng.standard_normal(samples)
+        output_signal = np.convolve(input_signal, [1.0, 2.0, 3.0])[:samples]
+        output_signal += 0.1 * rng.standard_normal(samples)
+
+        for forgetting_factor in (1, 0.999):
+            standard = StreamingEstimator(
+                3, forgetting_factor, history_size=100, decimation=10**5
+            )
+            sqrt_float32 = StreamingEstimator(
+                3,
+                forgetting_factor,
+                history_size=100,
+                decimation=10**5,
+                mode="sqrt",
+                dtype=np.float32,
+            )
+            for start in range(0, samples, chunk):
+                u_chunk = input_signal[start : start + chunk]
+                y_chunk = output_signal[start : start + chunk]
+                for estimator in (standard, sqrt_float32):
+                    estimator.update_batch(u_chunk, y_chunk)
+
+            self.assertEqual(sqrt_float32.estimated_param.dtype, np.float32)
+            self.assertTrue(np.all(np.isfinite(sqrt_float32.weight_function)))
+            sample_index, standard_hist = standard.history()
+            np.testing.assert_array_equal(sqrt_float32.history()[0], sample_index)
+            np.testing.assert_allclose(
+                sqrt_float32.history()[1], standard_hist, atol=1e-3
+            )
+            np.testing.assert_allclose(
+                sqrt_float32.estimated_param.ravel(), [1.0, 2.0, 3.0], atol=0.05
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
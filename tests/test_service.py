@@ -0,0 +1,228 @@
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+from controllers.adaptive_control import AdaptiveController
+from controllers.multilevel_control import MultilevelController
+from utils.service import (
+    IdentificationService,
+    ServiceBusy,
+    ServiceClient,
+    ServiceError,
+    run_load_test,
+)
+
+
+class TestIdentificationService(unittest.TestCase):
+    """
+    Unit tests for the IdentificationService and ServiceClient classes.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment for each test case.
+
+        Starts a service with one warm worker on a Unix socket in a temporary
+        directory, collecting requests into batches over 50 ms.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.service = IdentificationService(
+            os.path.join(self.directory, "service.sock"), workers=1, batch_window=0.05
+        ).start()
+        self.addCleanup(self.service.close)
+
+    def test_simulate_identify(self):
+        """
+        Test simulate and identify requests of the adaptive controller.
+
+        Verifies that the results equal those of the controller run locally,
+        and that param_hist is streamed in chunks of the requested size.
+        """
+        controller = AdaptiveController(500, 6)
+        expected = controller.simulate(0.1, rng=3)
+        with ServiceClient(self.service.address) as client:
+            simulated = client.simulate("adaptive", 500, 0.1, rng=3)
+            for result, expected_result in zip(simulated, expected):
+                np.testing.assert_array_equal(result, expected_result)
+
+            u_signal, y_signal = simulated[0], simulated[2]
+            expected = controller.identify(u_signal, y_signal, 0.99, mode="sqrt")
+            identified = client.identify(
+                "adaptive", u_signal, y_signal, forgetting_factor=0.99, mode="sqrt"
+            )
+            for result, expected_result in zip(identified, expected):
+                np.testing.assert_array_equal(result, expected_result)
+
+            (estimated_param, param_hist), chunks = client.identify_stream(
+                "adaptive", u_signal, y_signal, history_chunk=128, forgetting_factor=1
+            )
+            self.assertIsNone(param_hist)
+            chunks = list(chunks)
+        self.assertEqual([start for start, _ in chunks], [0, 128, 256, 384])
+        np.testing.assert_array_equal(
+            np.concatenate([chunk for _, chunk in chunks], axis=1)[:, -1:],
+            estimated_param,
+        )
+
+    def test_stacked_multilevel(self):
+        """
+        Test concurrent multilevel identify requests.
+
+        Ensures that requests sharing the connection matrix are stacked into a
+        single batch with the same estimates as identifying them one by one.
+        """
+        controller = MultilevelController(300, 6)
+        signals = [controller.simulate(0.1, rng=seed) for seed in range(4)]
+        estimates = {}
+
+        def identify(index):
+            u_signal, _, y_signal, _, connection_matrix = signals[index]
+            with ServiceClient(self.service.address) as client:
+                estimates[index] = client.identify(
+                    "multilevel",
+                    u_signal,
+                    y_signal,
+                    connection_matrix=connection_matrix,
+                )
+
+        threads = [threading.Thread(target=identify, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for index, (u_signal, _, y_signal, _, connection_matrix) in enumerate(signals):
+            np.testing.assert_array_equal(
+                estimates[index],
+                controller.identify(u_signal, y_signal, connection_matrix),
+            )
+        metrics = self.service.metrics()
+        self.assertEqual(metrics["completed"], 4)
+        self.assertLess(metrics["batches"], 4)
+
+    def test_errors(self):
+        """
+        Test failing and unsupported requests.
+
+        Checks that they raise ServiceError on the client, are counted as
+        failed, and that the connection keeps serving further requests.
+        """
+        signal = np.zeros(100)
+        with ServiceClient(self.service.address) as client:
+            with self.assertRaises(ServiceError):
+                client.identify("adaptive", signal, signal, history_path="hist.npy")
+            with self.assertRaises(ServiceError):
+                client.identify("adaptive", signal, signal, forgetting=1)
+            estimated_param, _ = client.identify(
+                "adaptive", signal, signal, forgetting_factor=1
+            )
+            metrics = client.metrics()
+        np.testing.assert_array_equal(estimated_param, np.zeros((3, 1)))
+        self.assertEqual(metrics["failed"], 1)
+        self.assertEqual(metrics["completed"], 1)
+
+    def test_backpressure(self):
+        """
+        Test the bounded request queue.
+
+        Verifies that requests beyond the queue and the batches in flight are
+        rejected as busy rather than queued, while the accepted ones complete.
+        """
+        service = IdentificationService(
+            ("127.0.0.1", 0), workers=1, queue_size=1, max_batch=1
+        ).start()
+        self.addCleanup(service.close)
+        u_signal, _, y_signal, _, _, _ = AdaptiveController(10**6, 6).simulate(
+            0.1, rng=0
+        )
+        outcomes = []
+
+        def identify():
+            with ServiceClient(service.address, busy_retries=0) as client:
+                try:
+                    client.identify("adaptive", u_signal, y_signal, forgetting_factor=1)
+                    outcomes.append("completed")
+                except ServiceBusy:
+                    outcomes.append("busy")
+
+        threads = [threading.Thread(target=identify) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = service.metrics()
+        self.assertIn("busy", outcomes)
+        self.assertEqual(metrics["rejected"], outcomes.count("busy"))
+        self.assertEqual(metrics["completed"], outcomes.count("completed"))
+
+    def test_worker_crash(self):
+        """
+        Test killing a worker process while requests are running.
+
+        Ensures that the clients of the running requests receive an error reply
+        instead of waiting forever, and that the pool is restarted so that
+        later requests complete.
+        """
+        service = IdentificationService(
+            os.path.join(self.directory, "crash.sock"), workers=1
+        ).start()
+        self.addCleanup(service.close)
+        worker = service._executor.submit(os.getpid).result()
+        u_signal, _, y_signal, _, _, _ = AdaptiveController(2 * 10**6, 6).simulate(
+            0.1, rng=0
+        )
+        outcomes = []
+
+        def identify():
+            with ServiceClient(service.address, timeout=60) as client:
+                try:
+                    client.identify("adaptive", u_signal, y_signal, forgetting_factor=1)
+                    outcomes.append("completed")
+                except ServiceError:
+                    outcomes.append("error")
+
+        threads = [threading.Thread(target=identify) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while not service.metrics()["batches"]:
+            time.sleep(0.001)
+        os.kill(worker, signal.SIGKILL)
+        for thread in threads:
+            thread.join(60)
+
+        self.assertFalse(any(thread.is_alive() for thread in threads))
+        self.assertEqual(len(outcomes), 3)
+        self.assertIn("error", outcomes)
+        with ServiceClient(service.address, timeout=60) as client:
+            estimated_param, _ = client.identify(
+                "adaptive", u_signal[:1000], y_signal[:1000], forgetting_factor=1
+            )
+        self.assertEqual(estimated_param.shape, (3, 1))
+        metrics = service.metrics()
+        self.assertEqual(metrics["restarts"], 1)
+        self.assertEqual(metrics["failed"], outcomes.count("error"))
+
+    def test_run_load_test(self):
+        """
+        Test the run_load_test function.
+
+        Ensures that every request completes and that the latency and the
+        service metrics are reported.
+        """
+        results = run_load_test(
+            self.service.address, requests=20, concurrency=4, samples_number=200
+        )
+        self.assertEqual(results["failed"], 0)
+        self.assertGreater(results["throughput"], 0)
+        self.assertLessEqual(results["latency"]["p50"], results["latency"]["p99"])
+        self.assertEqual(results["service"]["completed"], 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+from utils.signal_io import (
+    count_csv_rows,
+    csv_to_npy,
+    load_signal,
+    read_csv_chunks,
+    save_signal,
+)
+
+
+class TestSignalIo(unittest.TestCase):
+    """
+    Unit tests for the signal file functions in the utils.signal_io module.
+    """
+
+    def setUp(self):
+        """
+        Set up the test environment for each test case.
+
+        Creates a temporary directory and a CSV file with a header line and
+        two signals stored as columns.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.signals = np.random.default_rng(0).normal(size=(2, 1000))
+        self.csv_path = os.path.join(self.directory.name, "signals.csv")
+        np.savetxt(self.csv_path, self.signals.T, delimiter=",", header="u,y")
+
+    def tearDown(self):
+        """
+        Remove the temporary directory after each test case.
+        """
+        self.directory.cleanup()
+
+    def test_read_csv_chunks(self):
+        """
+        Test the count_csv_rows and read_csv_chunks functions.
+
+        Verifies that the header is skipped and that the chunks cover every row.
+        """
+        self.assertEqual(count_csv_rows(self.csv_path, skip_header=1), 1000)
+        chunks = list(read_csv_chunks(self.csv_path, chunk_rows=300, skip_header=1))
+        self.assertEqual([len(chunk) for chunk in chunks], [300, 300, 300, 100])
+        np.testing.assert_allclose(np.concatenate(chunks).T, self.signals)
+
+    def test_csv_to_npy(self):
+        """
+        Test the csv_to_npy function.
+
+        Ensures that the CSV columns are stored as rows of a memory-mapped array.
+        """
+        npy_path = os.path.join(self.directory.name, "signals.npy")
+        signals = csv_to_npy(self.csv_path, npy_path, chunk_rows=128, skip_header=1)
+        self.assertIsInstance(signals, np.memmap)
+        np.testing.assert_allclose(signals, self.signals)
+        del signals
+
+    def test_save_load_signal(self):
+        """
+        Test the save_signal and load_signal functions.
+
+        Checks that a signal copied in chunks is loaded back memory-mapped, and
+        that a single CSV column is loaded as a 1-D signal.
+        """
+        npy_path = os.path.join(self.directory.name, "u.npy")
+        save_signal(npy_path, self.signals, chunk_size=333)
+        signals = load_signal(npy_path)
+        self.assertIsInstance(signals, np.memmap)
+        np.testing.assert_array_equal(signals, self.signals)
+        del signals
+
+        column_path = os.path.join(self.directory.name, "u.csv")
+        np.savetxt(column_path, self.signals[0])
+        np.testing.assert_allclose(load_signal(column_path), self.signals[0])
+
+        with self.assertRaises(ValueError):
+            load_signal(os.path.join(self.directory.name, "u.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,9 +2,17 @@ import unittest
 import numpy as np
 from utils.signal_utils import (
     generate_sin,
+    generate_sin_chunks,
     generate_noise,
+    generate_noise_chunks,
     generate_noise_signal,
     denoise_filter,
+    fir_filter,
+    FIRFilter,
+    float_dtype,
+    lagged_regressor,
+    MovingAverageFilter,
+    spawn_rngs,
 )
 
 
@@ -24,6 +32,49 @@ class TestSignalUtils(unittest.TestCase):
         self.assertEqual(len(sin), 1000)
         self.assertEqual(len(x), 1000)
 
+    def test_generate_sin_chunks(self):
+        """
+        Test the generate_sin_chunks function.
+
+        Ensures that the concatenated chunks equal the output of generate_sin.
+        """
+        chunks = list(generate_sin_chunks(1000, 6, 300))
+        self.assertEqual([len(sin) for sin, _ in chunks], [300, 300, 300, 100])
+        sin, x = generate_sin(1000, 6)
+        np.testing.assert_array_equal(np.concatenate([c[0] for c in chunks]), sin)
+        np.testing.assert_array_equal(np.concatenate([c[1] for c in chunks]), x)
+
+    def test_generate_noise_chunks(self):
+        """
+        Test the generate_noise_chunks function.
+
+        Verifies that two interleaved noise streams equal two successive
+        generate_noise calls, that the generator is advanced past both, and
+        that other bit generators give chunks of the right shape.
+        """
+        rng = np.random.default_rng(3)
+        first = generate_noise(1000, 0.2, rng, runs=(2, 3))
+        second = generate_noise(1000, 0.2, rng, runs=(2, 3))
+        following = rng.random()
+
+        rng = np.random.default_rng(3)
+        first_chunks = generate_noise_chunks(1000, 0.2, 128, rng, runs=(2, 3))
+        second_chunks = generate_noise_chunks(1000, 0.2, 128, rng, runs=(2, 3))
+        streamed = [
+            np.concatenate(chunks, axis=-1)
+            for chunks in zip(*zip(first_chunks, second_chunks))
+        ]
+        np.testing.assert_array_equal(streamed[0], first)
+        np.testing.assert_array_equal(streamed[1], second)
+        self.assertEqual(rng.random(), following)
+
+        chunks = list(
+            generate_noise_chunks(
+                10, 0.2, 4, np.random.Generator(np.random.MT19937(0)), runs=2
+            )
+        )
+        self.assertEqual([chunk.shape for chunk in chunks], [(2, 4), (2, 4), (2, 2)])
+
     def test_generate_noise(self):
         """
         Test the generate_noise function.
@@ -33,6 +84,71 @@ class TestSignalUtils(unittest.TestCase):
         noise = generate_noise(1000, 0.1)
         self.assertEqual(len(noise), 1000)
 
+    def test_generate_noise_float32(self):
+        """
+        Test the generate_noise function in single precision.
+
+        Verifies that float32 noise, whole or in chunks, is the float64 noise of
+        the same seed rounded to float32.
+        """
+        double = generate_noise(100000, 0.2, 4, runs=2)
+        single = generate_noise(100000, 0.2, 4, runs=2, dtype=np.float32)
+        self.assertEqual(single.dtype, np.float32)
+        np.testing.assert_array_equal(single, double.astype(np.float32))
+        chunks = generate_noise_chunks(100000, 0.2, 30000, 4, runs=2, dtype=np.float32)
+        np.testing.assert_array_equal(np.concatenate(list(chunks), axis=-1), single)
+
+    def test_float32_filters(self):
+        """
+        Test the filters on float32 signals.
+
+        Ensures that fir_filter, FIRFilter and denoise_filter keep float32
+        signals in single precision, within float32 rounding of the float64
+        output, and that integer signals are filtered in float64.
+        """
+        signal = generate_noise(5000, 0.1, 1)
+        for coefficients in (np.arange(1.0, 4.0), np.linspace(1, 0, 40)):
+            expected = fir_filter(signal, coefficients)
+            filtered = fir_filter(signal.astype(np.float32), coefficients)
+            self.assertEqual(filtered.dtype, np.float32)
+            np.testing.assert_allclose(filtered, expected, atol=1e-5)
+
+        fir = FIRFilter(np.linspace(1, 0, 40), dtype=np.float32)
+        chunk = fir.filter_chunk(signal[:1000])
+        self.assertEqual(chunk.dtype, np.float32)
+        denoised = denoise_filter(signal.astype(np.float32), 10)
+        self.assertEqual(denoised.dtype, np.float32)
+        np.testing.assert_allclose(denoised, denoise_filter(signal, 10), atol=1e-6)
+
+        self.assertEqual(fir_filter(np.arange(10), [1, 2]).dtype, np.float64)
+        self.assertEqual(float_dtype(np.arange(10)), np.float64)
+        self.assertEqual(float_dtype(signal, np.float32), np.float32)
+
+    def test_generate_noise_seeded_runs(self):
+        """
+        Test the generate_noise function with a seed and several runs.
+
+        Verifies that the same seed reproduces the same noise, that many runs
+        are drawn in one call with shape (runs, samples), and that the noise
+        respects the requested variance bounds.
+        """
+        noise = generate_noise(1000, 0.1, rng=42, runs=8)
+        self.assertEqual(noise.shape, (8, 1000))
+        np.testing.assert_array_equal(noise, generate_noise(1000, 0.1, rng=42, runs=8))
+        self.assertLessEqual(np.abs(noise).max(), np.sqrt(12 * 0.1) / 2)
+
+    def test_spawn_rngs(self):
+        """
+        Test the spawn_rngs function.
+
+        Ensures that the spawned generators are reproducible from the root seed
+        and produce different streams for different workers.
+        """
+        first = [rng.random(5) for rng in spawn_rngs(4, seed=7)]
+        second = [rng.random(5) for rng in spawn_rngs(4, seed=7)]
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(len({tuple(stream) for stream in first}), 4)
+
     def test_generate_noise_signal(self):
         """
         Test the generate_noise_signal function.
@@ -46,6 +162,92 @@ class TestSignalUtils(unittest.TestCase):
         self.assertEqual(len(noisy_signal), 1000)
         self.assertTrue(np.all(noisy_signal == noise))
 
+    def test_fir_filter(self):
+        """
+        Test the fir_filter function.
+
+        Verifies that the direct and FFT methods give the first samples of the
+        full convolution of batched signals, also for models with more taps
+        than samples, and that unknown methods are rejected.
+        """
+        rng = np.random.default_rng(2)
+        for samples, taps in ((1000, 3), (5000, 300), (100, 500)):
+            signals = rng.normal(size=(3, samples))
+            coefficients = rng.normal(size=taps)
+            expected = np.array(
+                [np.convolve(signal, coefficients)[:samples] for signal in signals]
+            )
+            for method in ("direct", "fft", "auto"):
+                np.testing.assert_allclose(
+                    fir_filter(signals, coefficients, method), expected, atol=1e-10
+                )
+
+        with self.assertRaises(ValueError):
+            fir_filter(signals, coefficients, "fir")
+
+    def test_fir_filter_chunks(self):
+        """
+        Test the FIRFilter class.
+
+        Ensures that filtering batched signals in chunks shorter than the model,
+        carrying the filter state, matches fir_filter on the whole signals.
+        """
+        rng = np.random.default_rng(3)
+        signals = rng.normal(size=(2, 4000))
+        coefficients = rng.normal(size=700)
+        plant = FIRFilter(coefficients, channels=2)
+        filtered = np.concatenate(
+            [
+                plant.filter_chunk(signals[:, start : start + 500])
+                for start in range(0, 4000, 500)
+            ],
+            axis=-1,
+        )
+        self.assertEqual(plant.samples_seen, 4000)
+        np.testing.assert_allclose(
+            filtered, fir_filter(signals, coefficients, "direct"), atol=1e-10
+        )
+
+    def test_lagged_regressor(self):
+        """
+        Test the lagged_regressor function.
+
+        Checks the FIR columns of one signal against their definition, the
+        columns of an ARX regressor with delayed outputs, and that a batched
+        regressor is a read-only view.
+        """
+        u = np.arange(1.0, 6.0)
+        y = 10 * u
+        np.testing.assert_array_equal(
+            lagged_regressor(u, 3),
+            [[1, 0, 0], [2, 1, 0], [3, 2, 1], [4, 3, 2], [5, 4, 3]],
+        )
+        np.testing.assert_array_equal(
+            lagged_regressor(np.stack([u, y]), [1, 2], [0, 1]),
+            [[1, 0, 0], [2, 10, 0], [3, 20, 10], [4, 30, 20], [5, 40, 30]],
+        )
+
+        signals = np.random.default_rng(0).normal(size=(4, 100))
+        regressor_matrix = lagged_regressor(signals, 5)
+        self.assertEqual(regressor_matrix.shape, (4, 100, 5))
+        self.assertFalse(regressor_matrix.flags.writeable)
+        np.testing.assert_array_equal(regressor_matrix[2, 50], signals[2, 50:45:-1])
+
+    def test_lagged_regressor_past(self):
+        """
+        Test the lagged_regressor function with past samples.
+
+        Verifies that building the regressors of two chunks, the second one
+        continuing from the tail of the first, matches a single call.
+        """
+        signals = np.random.default_rng(1).normal(size=(2, 3, 50))
+        lags, delays = [2, 3, 1], [0, 1, 2]
+        full = lagged_regressor(signals, lags, delays)
+        continued = lagged_regressor(
+            signals[..., 20:], lags, delays, past=signals[..., 17:20]
+        )
+        np.testing.assert_array_equal(continued, full[..., 20:, :])
+
     def test_denoise_filter(self):
         """
         Test the denoise_filter function.
@@ -56,6 +258,40 @@ class TestSignalUtils(unittest.TestCase):
         denoised_signal = denoise_filter(noisy_signal, 10)
         self.assertEqual(len(denoised_signal), 1000)
 
+    def test_denoise_filter_values(self):
+        """
+        Test the values of the denoise_filter function.
+
+        Verifies that the first time_horizon samples are NaN and every other
+        sample is the mean of the time_horizon samples preceding it.
+        """
+        noisy_signal = np.random.randn(200)
+        denoised_signal = denoise_filter(noisy_signal, 10)
+        self.assertTrue(np.all(np.isnan(denoised_signal[:10])))
+        expected = [np.mean(noisy_signal[i - 10 : i]) for i in range(10, 200)]
+        np.testing.assert_allclose(denoised_signal[10:], expected)
+
+    def test_moving_average_filter(self):
+        """
+        Test the MovingAverageFilter class.
+
+        Filters a 2-D (channels, samples) signal in uneven chunks and checks that
+        the concatenated output equals denoise_filter applied to each channel.
+        """
+        noisy_signal = np.random.randn(3, 1000)
+        moving_average = MovingAverageFilter(10, channels=3)
+        denoised_signal = np.concatenate(
+            [
+                moving_average.filter_chunk(noisy_signal[:, start:stop])
+                for start, stop in [(0, 4), (4, 4), (4, 25), (25, 1000)]
+            ],
+            axis=1,
+        )
+        for channel in range(3):
+            np.testing.assert_allclose(
+                denoised_signal[channel], denoise_filter(noisy_signal[channel], 10)
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
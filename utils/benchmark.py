@@ -0,0 +1,250 @@
+import json
+import platform
+import time
+import tracemalloc
+
+import numpy as np
+from controllers.adaptive_control import AdaptiveController
+from controllers.multilevel_control import MultilevelController
+from controllers.rls import NUMBA_AVAILABLE
+from utils.signal_utils import denoise_filter
+
+DEFAULT_SAMPLES = (10**3, 10**4, 10**5, 10**6, 10**7)
+DEFAULT_ORDERS = (3, 8)
+DEFAULT_RUNS = (1, 16)
+DEFAULT_DTYPES = ("float64",)
+MAX_TOTAL_SAMPLES = 10**7
+
+
+def _adaptive_identify(samples, order, runs, rng, dtype):
+    controller = AdaptiveController(samples, 6)
+    u_signal, _, y_signal, _, _, _ = controller.simulate(
+        0.1,
+        coefficients=rng.uniform(-1, 1, order),
+        rng=rng,
+        runs=None if runs == 1 else runs,
+        dtype=dtype,
+    )
+    if runs == 1:
+        return lambda: controller.identify(u_signal, y_signal, 0.999, order=order)
+    return lambda: controller.identify_batch(
+        u_signal, y_signal, 0.999, order=order, mode="sqrt"
+    )
+
+
+def _multilevel_simulate(samples, order, runs, rng, dtype):
+    controller = MultilevelController(samples, 6)
+    return lambda: controller.simulate(0.1, rng=rng, runs=runs, dtype=dtype)
+
+
+def _multilevel_identify(samples, order, runs, rng, dtype):
+    controller = MultilevelController(samples, 6)
+    u_signal, _, y_signal, _, connection_matrix = controller.simulate(
+        0.1, rng=rng, runs=runs, dtype=dtype
+    )
+    return lambda: controller.identify(u_signal, y_signal, connection_matrix)
+
+
+def _denoise_filter(samples, order, runs, rng, dtype):
+    noise_signal = rng.normal(size=(runs, samples)).astype(dtype)
+    return lambda: denoise_filter(noise_signal, 10)
+
+
+# Benchmarked functions mapped to a setup function returning the timed call and
+# to whether the model order applies to them.
+BENCHMARKS = {
+    "adaptive_identify": (_adaptive_identify, True),
+    "multilevel_simulate": (_multilevel_simulate, False),
+    "multilevel_identify": (_multilevel_identify, False),
+    "denoise_filter": (_denoise_filter, False),
+}
+
+
+def benchmark_case(name, samples, order=3, runs=1, repeat=3, seed=0, dtype="float64"):
+    """
+    Measure the throughput and peak memory of one benchmark case.
+
+    The inputs are generated before timing. The call is run once untimed, so
+    that numba compilation is not measured, then timed repeat times keeping the
+    fastest run, and finally run once more under tracemalloc to record the peak
+    memory allocated by the call.
+
+    Args:
+        name (str): Benchmark name, a key of BENCHMARKS.
+        samples (int): Number of samples of every run.
+        order (int): Model order, where it applies.
+        runs (int): Number of stacked runs.
+        repeat (int): Number of timed calls.
+        seed (int): Seed of the generated inputs.
+        dtype (str): Floating point type of the signals, e.g. 'float32'.
+
+    Returns:
+        dict: The case parameters with 'seconds', 'samples_per_second' and
+        'peak_memory_bytes'.
+    """
+    setup, uses_order = BENCHMARKS[name]
+    if not uses_order:
+        order = None
+    call = setup(samples, order, runs, np.random.default_rng(seed), np.dtype(dtype))
+
+    call()
+    seconds = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        call()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": name,
+        "samples": samples,
+        "order": order,
+        "runs": runs,
+        "dtype": np.dtype(dtype).name,
+        "seconds": seconds,
+        "samples_per_second": samples * runs / seconds,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def run_benchmarks(
+    names=None,
+    samples=DEFAULT_SAMPLES,
+    orders=DEFAULT_ORDERS,
+    runs=DEFAULT_RUNS,
+    repeat=3,
+    seed=0,
+    max_total_samples=MAX_TOTAL_SAMPLES,
+    callback=None,
+    dtypes=DEFAULT_DTYPES,
+):
+    """
+    Run the benchmark matrix.
+
+    Cases whose samples times runs exceed max_total_samples are skipped, so the
+    largest sample counts are only benchmarked for single runs by default.
+
+    Args:
+        names (list of str, optional): Benchmarks to run, defaults to all.
+        samples (list of int): Sample counts.
+        orders (list of int): Model orders, used by the benchmarks they apply to.
+        runs (list of int): Numbers of stacked runs.
+        repeat (int): Number of timed calls of every case.
+        seed (int): Seed of the generated inputs.
+        max_total_samples (int): Largest number of samples over all runs of a case.
+        callback (callable, optional): Called with every finished case.
+        dtypes (list of str): Floating point types of the signals; benchmarking
+            'float64' and 'float32' shows the memory saved by single precision.
+
+    Returns:
+        dict: 'environment' with the Python, NumPy and numba setup, and
+        'results' with one dict per case as returned by benchmark_case.
+    """
+    results = []
+    for name in names or BENCHMARKS:
+        for case_orders in [orders] if BENCHMARKS[name][1] else [[None]]:
+            for order in case_orders:
+                for samples_number in samples:
+                    for runs_number in runs:
+                        if samples_number * runs_number > max_total_samples:
+                            continue
+                        for dtype in dtypes:
+                            result = benchmark_case(
+                                name,
+                                samples_number,
+                                order,
+                                runs_number,
+                                repeat,
+                                seed,
+                                dtype,
+                            )
+                            results.append(result)
+                            if callback is not None:
+                                callback(result)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "numba": NUMBA_AVAILABLE,
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def save_results(path, results):
+    """
+    Save benchmark results as JSON.
+
+    Args:
+        path (str): Output file.
+        results (dict): Results as returned by run_benchmarks.
+    """
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+
+
+def load_results(path):
+    """
+    Load benchmark results saved with save_results.
+
+    Args:
+        path (str): JSON file.
+
+    Returns:
+        dict: The benchmark results.
+    """
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def _case_key(result):
+    # baselines saved before the dtype axis was added are float64
+    return (
+        result["name"],
+        result["samples"],
+        result["order"],
+        result["runs"],
+        result.get("dtype", "float64"),
+    )
+
+
+def compare_results(current, baseline, threshold=0.2):
+    """
+    Compare benchmark results against a baseline.
+
+    Args:
+        current (dict): Results as returned by run_benchmarks.
+        baseline (dict): Baseline results in the same format.
+        threshold (float): Largest accepted relative drop in throughput.
+
+    Returns:
+        list of dict: For every case present in both results, its key, the
+        baseline and current throughput, their ratio and whether the drop
+        exceeds the threshold ('regression').
+    """
+    baseline_results = {_case_key(result): result for result in baseline["results"]}
+    comparison = []
+    for result in current["results"]:
+        key = _case_key(result)
+        if key not in baseline_results:
+            continue
+        reference = baseline_results[key]["samples_per_second"]
+        ratio = result["samples_per_second"] / reference
+        comparison.append(
+            {
+                "case": key,
+                "baseline": reference,
+                "current": result["samples_per_second"],
+                "ratio": ratio,
+                "regression": ratio < 1 - threshold,
+            }
+        )
+    return comparison
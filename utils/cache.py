@@ -0,0 +1,378 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+# Bumped whenever the key or the stored layout changes, so that entries written
+# by an older version are never read back.
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 2**30
+_MANIFEST = "manifest.json"
+
+
+class _Uncacheable(TypeError):
+    """
+    Raised for arguments or results that the cache cannot hash or store.
+    """
+
+
+def _is_sparse(value):
+    # as in the multilevel controller, scipy (optional) is only looked up once
+    # the caller has imported it
+    sparse = sys.modules.get("scipy.sparse")
+    return sparse is not None and sparse.issparse(value)
+
+
+def _array_digest(array):
+    array = np.ascontiguousarray(array)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    if array.dtype.hasobject:
+        raise _Uncacheable("object arrays are not hashed")
+    digest.update(memoryview(array.reshape(-1)).cast("B"))
+    return digest.hexdigest()
+
+
+def canonical(value):
+    """
+    Convert an argument into a JSON-serializable description that identifies it.
+
+    Arrays, including memory-mapped ones, and sparse matrices are replaced by a
+    digest of their dtype, shape and contents.
+
+    Args:
+        value: None, a bool, number or string, a NumPy scalar, array, dtype or
+            Generator, a sparse matrix, or a list, tuple or dict of these.
+
+    Returns:
+        list: JSON-serializable description of value.
+
+    Raises:
+        TypeError: When value cannot be described.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return [type(value).__name__, value]
+    if isinstance(value, np.generic):
+        return ["numpy", value.dtype.str, value.item()]
+    if isinstance(value, np.ndarray):
+        return ["array", _array_digest(value)]
+    if isinstance(value, (list, tuple)):
+        return [type(value).__name__, [canonical(item) for item in value]]
+    if isinstance(value, dict):
+        return ["dict", [[str(key), canonical(value[key])] for key in sorted(value)]]
+    if isinstance(value, np.random.Generator):
+        state = value.bit_generator.state
+        try:
+            json.dumps(state)
+        except TypeError:
+            raise _Uncacheable("generator state is not serializable") from None
+        return ["generator", state]
+    if isinstance(value, (type, np.dtype)):
+        try:
+            return ["dtype", np.dtype(value).str]
+        except TypeError:
+            raise _Uncacheable(f"type {value!r} is not hashed") from None
+    if _is_sparse(value):
+        matrix = value.tocsr()
+        matrix.sum_duplicates()
+        matrix.sort_indices()
+        return [
+            "sparse",
+            matrix.shape,
+            [
+                _array_digest(part)
+                for part in (matrix.indptr, matrix.indices, matrix.data)
+            ],
+        ]
+    raise _Uncacheable(f"{type(value).__name__} arguments are not hashed")
+
+
+def hash_description(*parts):
+    """
+    Hash the canonical description of values.
+
+    Args:
+        *parts: Values accepted by canonical.
+
+    Returns:
+        str: Hex digest of their description.
+
+    Raises:
+        TypeError: When a part cannot be described.
+    """
+    description = json.dumps(canonical(list(parts)))
+    return hashlib.blake2b(description.encode(), digest_size=20).hexdigest()
+
+
+def _directory_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of simulate and identify results.
+
+    Every entry is a directory named after the hash of the call, holding the
+    arrays of the result as .npy files and a JSON manifest. Entries are evicted
+    least recently used first once the cache exceeds max_bytes; the modification
+    time of an entry is refreshed on every hit and serves as its access time.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Initialize the ResultCache.
+
+        Args:
+            directory (str): Cache directory, created when missing. It may be
+                shared by processes, as entries are written atomically.
+            max_bytes (int): Size cap of all entries together.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, *parts):
+        """
+        Hash the description of a call.
+
+        Args:
+            *parts: Controller configuration, method name and arguments.
+
+        Returns:
+            str: Hex digest naming the cache entry.
+
+        Raises:
+            TypeError: When a part cannot be hashed.
+        """
+        description = json.dumps([CACHE_VERSION, canonical(list(parts))])
+        return hashlib.blake2b(description.encode(), digest_size=20).hexdigest()
+
+    def _entries(self):
+        return [
+            entry
+            for entry in os.scandir(self.directory)
+            if entry.is_dir() and not entry.name.startswith(".")
+        ]
+
+    def load(self, key):
+        """
+        Load a cached result.
+
+        Args:
+            key (str): Key of the entry.
+
+        Returns:
+            tuple: (found, result, manifest), with found False on a miss.
+        """
+        path = os.path.join(self.directory, key)
+        try:
+            with open(os.path.join(path, _MANIFEST)) as manifest_file:
+                manifest = json.load(manifest_file)
+            items = []
+            for index, item in enumerate(manifest["items"]):
+                blob = os.path.join(path, f"{index}.npy")
+                if item["kind"] == "array":
+                    items.append(np.load(blob))
+                elif item["kind"] == "scalar":
+                    items.append(np.load(blob)[()])
+                elif item["kind"] == "sparse":
+                    from scipy import sparse
+
+                    items.append(sparse.load_npz(os.path.join(path, f"{index}.npz")))
+                else:
+                    items.append(item["value"])
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            # Missing, partially evicted or corrupted entries are misses.
+            return False, None, None
+        result = tuple(items) if manifest["tuple"] else items[0]
+        return True, result, manifest
+
+    def store(self, key, result, **metadata):
+        """
+        Store a result and evict the least recently used entries over the cap.
+
+        Args:
+            key (str): Key of the entry.
+            result: ndarray, scalar, None, sparse matrix or a tuple of them.
+            **metadata: JSON-serializable values stored in the manifest.
+
+        Raises:
+            TypeError: When the result holds other types.
+        """
+        is_tuple = isinstance(result, tuple)
+        temporary = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        try:
+            items = []
+            for index, item in enumerate(result if is_tuple else (result,)):
+                blob = os.path.join(temporary, f"{index}.npy")
+                if isinstance(item, np.ndarray):
+                    if item.dtype.hasobject:
+                        raise _Uncacheable("object arrays are not stored")
+                    np.save(blob, item)
+                    items.append({"kind": "array"})
+                elif isinstance(item, np.generic):
+                    np.save(blob, item)
+                    items.append({"kind": "scalar"})
+                elif item is None or isinstance(item, (bool, int, float, str)):
+                    items.append({"kind": "value", "value": item})
+                elif _is_sparse(item):
+                    from scipy import sparse
+
+                    sparse.save_npz(os.path.join(temporary, f"{index}.npz"), item)
+                    items.append({"kind": "sparse"})
+                else:
+                    raise _Uncacheable(f"{type(item).__name__} results are not stored")
+            with open(os.path.join(temporary, _MANIFEST), "w") as manifest_file:
+                json.dump(
+                    {"tuple": is_tuple, "items": items, **metadata}, manifest_file
+                )
+
+            if _directory_size(temporary) > self.max_bytes:
+                return
+            try:
+                os.rename(temporary, os.path.join(self.directory, key))
+            except OSError:
+                # Stored concurrently by another process.
+                return
+        finally:
+            shutil.rmtree(temporary, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits max_bytes.
+        """
+        entries = []
+        for entry in self._entries():
+            try:
+                entries.append(
+                    (entry.stat().st_mtime, _directory_size(entry.path), entry)
+                )
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda item: item[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry.path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        for entry in self._entries():
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def stats(self):
+        """
+        Report the use of the cache.
+
+        Returns:
+            dict: 'hits', 'misses' and 'bypassed' calls of this instance, and the
+            number of 'entries' and their total 'bytes' on disk.
+        """
+        sizes = []
+        for entry in self._entries():
+            try:
+                sizes.append(_directory_size(entry.path))
+            except OSError:
+                continue
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+        }
+
+
+def cached(seed=None, side_effects=(), ignore=()):
+    """
+    Cache the results of a controller method in the controller's ResultCache.
+
+    The method runs uncached when the controller has no cache (its cache
+    attribute is None), when the seed argument is None, so that fresh random
+    draws are never replayed, when any side_effects argument is set, or when an
+    argument cannot be hashed. The key covers the controller configuration,
+    the method, every argument with its default applied except the ignored
+    ones, and the contents of input arrays. When the seed argument is a Generator, its state after the
+    call is stored too and restored on a hit, so that later draws from it are
+    the same as if the method had run.
+
+    Args:
+        seed (str, optional): Name of the random number generator argument.
+        side_effects (tuple of str): Arguments that, when not None, make the
+            call bypass the cache, such as output paths or callbacks.
+        ignore (tuple of str): Arguments left out of the key because they only
+            change how the result is computed, such as thread counts or chunk
+            sizes, so that calls differing in them share an entry.
+
+    Returns:
+        callable: Decorator of the method.
+    """
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, "cache", None)
+            if cache is None:
+                return method(self, *args, **kwargs)
+
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            del arguments["self"]
+            for name in ignore:
+                del arguments[name]
+            rng = arguments.get(seed) if seed is not None else None
+            if (seed is not None and rng is None) or any(
+                arguments.get(name) is not None for name in side_effects
+            ):
+                cache.bypassed += 1
+                return method(self, *args, **kwargs)
+
+            config = {
+                name: value for name, value in vars(self).items() if name != "cache"
+            }
+            try:
+                key = cache.key(
+                    type(self).__qualname__, method.__name__, config, arguments
+                )
+            except _Uncacheable:
+                cache.bypassed += 1
+                return method(self, *args, **kwargs)
+
+            found, result, manifest = cache.load(key)
+            if found:
+                cache.hits += 1
+                if isinstance(rng, np.random.Generator):
+                    rng.bit_generator.state = manifest["rng_state"]
+                return result
+
+            cache.misses += 1
+            result = method(self, *args, **kwargs)
+            metadata = {}
+            if isinstance(rng, np.random.Generator):
+                metadata["rng_state"] = rng.bit_generator.state
+            try:
+                cache.store(key, result, **metadata)
+            except _Uncacheable:
+                pass
+            return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,311 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from controllers.adaptive_control import AdaptiveController
+from controllers.multilevel_control import MultilevelController
+from utils.cache import hash_description
+
+ADAPTIVE_PARAMS = ("a0", "a1", "a2", "coefficients")
+MULTILEVEL_PARAMS = ("a1", "b1", "a2", "b2", "a", "b", "connection_matrix")
+
+
+def parameter_grid(**axes):
+    """
+    Build the cartesian product of parameter values.
+
+    Args:
+        **axes: Parameter name mapped to the list of values to sweep.
+
+    Returns:
+        list: One dict of parameter values per grid point.
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def convergence_time(param_hist, true_param, tolerance):
+    """
+    Compute the convergence time of parameter histories.
+
+    The convergence time is the first sample after which every parameter
+    stays within tolerance of its true value until the end of the history.
+
+    Args:
+        param_hist (ndarray): Parameter histories of shape (runs, params, samples).
+        true_param (ndarray): True parameters of shape (params,).
+        tolerance (float): Absolute tolerance on every parameter.
+
+    Returns:
+        ndarray: Convergence time of every run; equal to samples when the final
+        estimate is outside the tolerance.
+    """
+    outside = (
+        np.abs(param_hist - np.asarray(true_param)[:, None]).max(axis=1) > tolerance
+    )
+    samples = outside.shape[-1]
+    last_outside = samples - np.argmax(outside[:, ::-1], axis=1)
+    return np.where(outside.any(axis=1), last_outside, 0)
+
+
+def _run_job(
+    controller_type,
+    samples_number,
+    signal_length,
+    params,
+    repetitions,
+    seed_sequence,
+    tolerance,
+    convergence_tolerance=None,
+    convergence_window=500,
+    cache=None,
+    dtype=float,
+):
+    rng = np.random.default_rng(seed_sequence)
+    variance = params.get("variance", 0.1)
+
+    if controller_type == "adaptive":
+        controller = AdaptiveController(samples_number, signal_length, cache)
+        u_signal, _, y_signal, model_param, _, _ = controller.simulate(
+            variance,
+            **{name: params[name] for name in ADAPTIVE_PARAMS if name in params},
+            rng=rng,
+            runs=repetitions,
+            dtype=dtype,
+        )
+        identified = controller.identify_batch(
+            u_signal,
+            y_signal,
+            params.get("forgetting_factor", 1),
+            order=len(model_param),
+            mode=params.get("mode", "sqrt"),
+            convergence_tolerance=convergence_tolerance,
+            convergence_window=convergence_window,
+        )
+        if convergence_tolerance is None:
+            estimated_params, param_hist = identified
+            convergence = convergence_time(param_hist, model_param, tolerance)
+        else:
+            estimated_params, _, convergence_indices = identified
+            convergence = np.where(
+                convergence_indices < 0, samples_number, convergence_indices
+            )
+        return model_param, estimated_params[:, :, 0], convergence
+
+    if controller_type == "multilevel":
+        controller = MultilevelController(samples_number, signal_length, cache)
+        u_signal, _, y_signal, model_param, connection_matrix = controller.simulate(
+            variance,
+            **{name: params[name] for name in MULTILEVEL_PARAMS if name in params},
+            rng=rng,
+            runs=repetitions,
+            dtype=dtype,
+        )
+        estimated_params = controller.identify(u_signal, y_signal, connection_matrix)
+        return (
+            model_param.flatten(),
+            estimated_params.reshape(repetitions, -1),
+            np.full(repetitions, np.nan),
+        )
+
+    raise ValueError(f"Unknown controller type: {controller_type}")
+
+
+def _job_path(results_dir, point, chunk):
+    return os.path.join(results_dir, f"point{point}_chunk{chunk}.npz")
+
+
+def _job_signature(job, seed, point, chunk):
+    """
+    Hash everything a job's result depends on, so that a stored job is only
+    reused by a sweep that would compute the same result.
+    """
+    (
+        controller_type,
+        samples_number,
+        signal_length,
+        params,
+        runs,
+        _,
+        tolerance,
+        convergence_tolerance,
+        convergence_window,
+        _,
+        dtype,
+    ) = job
+    return hash_description(
+        controller_type,
+        samples_number,
+        signal_length,
+        params,
+        runs,
+        [seed, point, chunk],
+        tolerance,
+        convergence_tolerance,
+        convergence_window,
+        dtype,
+    )
+
+
+def _save_job(path, signature, true_param, estimates, convergence):
+    temporary_path = path + ".tmp.npz"
+    np.savez(
+        temporary_path,
+        signature=signature,
+        true_param=true_param,
+        estimates=estimates,
+        convergence=convergence,
+    )
+    os.replace(temporary_path, path)
+
+
+def _load_job(path, signature):
+    # None when the stored job was written by a different sweep (or by a
+    # version without signatures), so that it is computed again
+    with np.load(path) as job:
+        if "signature" not in job.files or str(job["signature"]) != signature:
+            return None
+        return job["true_param"], job["estimates"], job["convergence"]
+
+
+def _collect(finished, results, results_dir, signatures):
+    for key, result in finished:
+        results[key] = result
+        if results_dir is not None:
+            _save_job(_job_path(results_dir, *key), signatures[key], *result)
+
+
+def run_sweep(
+    controller_type,
+    grid,
+    repetitions,
+    samples_number,
+    signal_length=6,
+    seed=0,
+    workers=None,
+    chunk_size=None,
+    tolerance=0.1,
+    results_dir=None,
+    convergence_tolerance=None,
+    convergence_window=500,
+    cache=None,
+    dtype=float,
+):
+    """
+    Run a Monte-Carlo parameter sweep over a process pool.
+
+    Every grid point is simulated and identified repetitions times. The runs
+    of a point are split into jobs of chunk_size runs, and every job draws from
+    its own random stream derived from (seed, point, chunk), so the results do
+    not depend on the number of workers or on the order in which jobs finish.
+    When results_dir is given, every finished job is written there and jobs
+    already present are skipped, so an interrupted sweep can be resumed. Every
+    stored job carries a hash of its controller type, parameters, runs,
+    samples, seed and dtype; stored jobs of a different sweep are recomputed
+    and overwritten.
+
+    Args:
+        controller_type (str): 'adaptive' or 'multilevel'.
+        grid (list of dict): Grid points, as returned by parameter_grid. Keys are
+            'variance', the model parameters accepted by the controller's simulate
+            method and, for the adaptive controller, 'forgetting_factor' and the
+            RLS 'mode' (square-root by default, as it stays stable for
+            forgetting factors below 1).
+        repetitions (int): Monte-Carlo runs per grid point.
+        samples_number (int): Number of samples of every run.
+        signal_length (int): Length of the signal.
+        seed (int): Root seed of the sweep.
+        workers (int, optional): Number of worker processes. Jobs run in the
+            calling process when 1; defaults to the number of CPUs.
+        chunk_size (int, optional): Runs per job, defaults to repetitions.
+        tolerance (float): Tolerance used for the convergence time.
+        results_dir (str, optional): Directory storing finished jobs for resuming.
+        convergence_tolerance (float, optional): Stop every adaptive run early
+            once its estimates change less than this over convergence_window
+            samples; the convergence time is then the early-stopping index.
+        convergence_window (int): Number of samples of the convergence window.
+        cache (ResultCache, optional): On-disk cache of the simulations and
+            identifications of every job, shared by the worker processes.
+        dtype (data-type): Floating point type of the simulated signals and of
+            the identification, e.g. np.float32 to halve the memory of every job.
+
+    Returns:
+        dict: 'true_param' (points, params), 'bias' (points, params),
+        'variance' (points, params), 'convergence_time' (points,) with the mean
+        convergence time of the adaptive runs, and 'estimates'
+        (points, repetitions, params).
+    """
+    chunk_size = chunk_size or repetitions
+    chunks = [
+        (start, min(chunk_size, repetitions - start))
+        for start in range(0, repetitions, chunk_size)
+    ]
+    jobs = {
+        (point, chunk): (
+            controller_type,
+            samples_number,
+            signal_length,
+            params,
+            runs,
+            np.random.SeedSequence(seed, spawn_key=(point, chunk)),
+            tolerance,
+            convergence_tolerance,
+            convergence_window,
+            cache,
+            dtype,
+        )
+        for point, params in enumerate(grid)
+        for chunk, (_, runs) in enumerate(chunks)
+    }
+
+    signatures = {key: _job_signature(job, seed, *key) for key, job in jobs.items()}
+
+    results = {}
+    if results_dir is not None:
+        os.makedirs(results_dir, exist_ok=True)
+        for key in jobs:
+            path = _job_path(results_dir, *key)
+            if os.path.exists(path):
+                result = _load_job(path, signatures[key])
+                if result is not None:
+                    results[key] = result
+
+    pending = [key for key in jobs if key not in results]
+    if workers == 1:
+        finished = ((key, _run_job(*jobs[key])) for key in pending)
+        _collect(finished, results, results_dir, signatures)
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_run_job, *jobs[key]): key for key in pending}
+            _collect(
+                (
+                    (futures[future], future.result())
+                    for future in as_completed(futures)
+                ),
+                results,
+                results_dir,
+                signatures,
+            )
+
+    true_param = np.array([results[(point, 0)][0] for point in range(len(grid))])
+    estimates = np.array(
+        [
+            np.concatenate([results[(point, chunk)][1] for chunk in range(len(chunks))])
+            for point in range(len(grid))
+        ]
+    )
+    convergence = np.array(
+        [
+            np.concatenate([results[(point, chunk)][2] for chunk in range(len(chunks))])
+            for point in range(len(grid))
+        ]
+    )
+
+    return {
+        "true_param": true_param,
+        "bias": estimates.mean(axis=1) - true_param,
+        "variance": estimates.var(axis=1),
+        "convergence_time": convergence.mean(axis=1),
+        "estimates": estimates,
+    }
@@ -0,0 +1,119 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+_NO_PHASE = nullcontext()
+
+
+class Instrumentation:
+    """
+    Opt-in per-phase timers, sample counters and progress callbacks for the
+    estimation loops of the controllers.
+    """
+
+    def __init__(self, interval=None, callback=None):
+        """
+        Initialize the Instrumentation.
+
+        Args:
+            interval (int, optional): Call callback every interval samples.
+            callback (callable, optional): Called as callback(samples_seen,
+                estimate, covariance_trace) with the current estimate and the
+                trace of its covariance.
+        """
+        self.interval = interval
+        self.callback = callback
+        self.phase_times = {}
+        self.phase_calls = {}
+        self.samples = 0
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a phase of the estimation, accumulating over repeated calls.
+
+        Args:
+            name (str): Phase name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times[name] = (
+                self.phase_times.get(name, 0.0) + time.perf_counter() - start
+            )
+            self.phase_calls[name] = self.phase_calls.get(name, 0) + 1
+
+    def progress(self, samples_seen, estimate_function):
+        """
+        Count processed samples and call the callback at multiples of interval.
+
+        Args:
+            samples_seen (int): Samples processed so far.
+            estimate_function (callable): Returns (estimate, covariance_trace);
+                only evaluated when the callback is due.
+        """
+        self.samples = samples_seen
+        if self.callback is not None and self.interval:
+            if samples_seen % self.interval == 0:
+                self.callback(samples_seen, *estimate_function())
+
+    def report(self):
+        """
+        Format the per-phase breakdown.
+
+        Returns:
+            str: One line per phase with its total time, share and number of calls.
+        """
+        total = sum(self.phase_times.values())
+        lines = [f"Processed {self.samples} samples in {total:.6f} s"]
+        for name, seconds in self.phase_times.items():
+            share = seconds / total if total else 0.0
+            lines.append(
+                f"  {name}: {seconds:.6f} s ({share:.1%}), "
+                f"{self.phase_calls[name]} calls"
+            )
+        return "\n".join(lines)
+
+
+def timed(instrumentation, name):
+    """
+    Time a phase when instrumentation is enabled.
+
+    Args:
+        instrumentation (Instrumentation or None): Instrumentation, or None when
+            disabled, in which case a shared no-op context is returned.
+        name (str): Phase name.
+
+    Returns:
+        context manager: Timer of the phase.
+    """
+    if instrumentation is None:
+        return _NO_PHASE
+    return instrumentation.phase(name)
+
+
+def chunk_bounds(samples, chunk_size=None, instrumentation=None, window=None):
+    """
+    Split samples into chunks that also end at every callback interval.
+
+    Args:
+        samples (int): Number of samples.
+        chunk_size (int, optional): Largest chunk, defaults to all samples.
+        instrumentation (Instrumentation, optional): Its interval adds chunk
+            boundaries when a callback is set.
+        window (int, optional): Also end chunks at every multiple of window.
+
+    Returns:
+        list of tuple: (start, stop) of every chunk.
+    """
+    chunk_size = chunk_size or samples
+    stops = set(range(chunk_size, samples, chunk_size))
+    if instrumentation is not None and instrumentation.callback is not None:
+        if instrumentation.interval:
+            stops.update(
+                range(instrumentation.interval, samples, instrumentation.interval)
+            )
+    if window:
+        stops.update(range(window, samples, window))
+    stops = sorted(stops) + [samples]
+    return list(zip([0] + stops[:-1], stops))
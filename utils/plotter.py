@@ -1,8 +1,70 @@
-import matplotlib.pyplot as plt
 import numpy as np
+from matplotlib.figure import Figure
 
 
-def unified_plot(x, y, labels, title="", plot_type="line", xlabel="X", ylabel="Y"):
+def decimate_envelope(x, y, bins):
+    """
+    Decimate long series to their min/max envelope.
+
+    Every bin of consecutive samples is replaced by its minimum and maximum,
+    so a line plot of the result looks the same as the full series once the
+    number of bins reaches the pixel width of the plot.
+
+    Args:
+        x (ndarray): X values of the series.
+        y (list of ndarrays): Y values of every series, all of the length of x.
+        bins (int): Number of bins.
+
+    Returns:
+        tuple: x values of length 2 * bins and y values of shape (series, 2 * bins).
+        The input is returned unchanged when it is not longer than 2 * bins.
+    """
+    x = np.asarray(x)
+    y = np.atleast_2d(np.asarray(y))
+    if y.shape[-1] <= 2 * bins:
+        return x, y
+
+    starts = np.linspace(0, y.shape[-1], bins, endpoint=False).astype(int)
+    envelope = np.empty(y.shape[:-1] + (2 * bins,), dtype=y.dtype)
+    envelope[..., 0::2] = np.minimum.reduceat(y, starts, axis=-1)
+    envelope[..., 1::2] = np.maximum.reduceat(y, starts, axis=-1)
+    return np.repeat(x[starts], 2), envelope
+
+
+def _new_figure(output, **kwargs):
+    """
+    Create a pyplot figure for interactive display, or a standalone figure when
+    rendering to a file so that it is never registered with pyplot and is freed
+    as soon as it is saved. pyplot, and with it a GUI backend, is only imported
+    for interactive display.
+    """
+    if output is None:
+        import matplotlib.pyplot as plt
+
+        return plt.figure(**kwargs)
+    return Figure(**kwargs)
+
+
+def _finish_figure(fig, output):
+    if output is None:
+        import matplotlib.pyplot as plt
+
+        plt.show()
+    else:
+        fig.savefig(output)
+
+
+def unified_plot(
+    x,
+    y,
+    labels,
+    title="",
+    plot_type="line",
+    xlabel="X",
+    ylabel="Y",
+    output=None,
+    decimate=True,
+):
     """
     Create a unified plot for line or scatter plots.
 
@@ -14,24 +76,32 @@ def unified_plot(x, y, labels, title="", plot_type="line", xlabel="X", ylabel="Y
         plot_type (str): Type of plot ('line' or 'scatter').
         xlabel (str): Label for the X axis.
         ylabel (str): Label for the Y axis.
+        output (str, optional): File to render the plot to (format from the
+            extension, e.g. .png or .svg) without a display. The plot is shown
+            interactively when omitted.
+        decimate (bool): Reduce long line series to their min/max envelope at the
+            pixel width of the figure before plotting.
     """
-    plt.figure()
+    fig = _new_figure(output)
+    ax = fig.add_subplot()
     if plot_type == "line":
+        if decimate:
+            x, y = decimate_envelope(x, y, int(fig.get_figwidth() * fig.dpi))
         for data, label in zip(y, labels):
-            plt.plot(x, data, label=label)
+            ax.plot(x, data, label=label)
     elif plot_type == "scatter":
         for data, label in zip(y, labels):
-            plt.scatter(x, data, label=label, s=1)
+            ax.scatter(x, data, label=label, s=1)
 
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
-    plt.title(title)
-    plt.grid(True)
-    plt.legend()
-    plt.show()
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.grid(True)
+    ax.legend()
+    _finish_figure(fig, output)
 
 
-def radar_plot(true_values, estimated_values, labels, title=""):
+def radar_plot(true_values, estimated_values, labels, title="", output=None):
     """
     Create a radar plot for comparing true and estimated values.
 
@@ -40,13 +110,16 @@ def radar_plot(true_values, estimated_values, labels, title=""):
         estimated_values (list): List of estimated values.
         labels (list of str): Labels for each axis.
         title (str): Title of the plot.
+        output (str, optional): File to render the plot to without a display.
+            The plot is shown interactively when omitted.
     """
     angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
     angles += angles[:1]
-    true_values += true_values[:1]
-    estimated_values += estimated_values[:1]
+    true_values = list(true_values) + list(true_values[:1])
+    estimated_values = list(estimated_values) + list(estimated_values[:1])
 
-    fig, ax = plt.subplots(figsize=(6, 6), subplot_kw=dict(polar=True))
+    fig = _new_figure(output, figsize=(6, 6))
+    ax = fig.add_subplot(polar=True)
     ax.fill(angles, true_values, color="blue", alpha=0.25)
     ax.plot(angles, true_values, color="blue", linewidth=2, label="True Values")
     ax.fill(angles, estimated_values, color="red", alpha=0.25)
@@ -57,6 +130,6 @@ def radar_plot(true_values, estimated_values, labels, title=""):
     ax.set_yticklabels([])
     ax.set_xticks(angles[:-1])
     ax.set_xticklabels(labels)
-    plt.title(title)
-    plt.legend(loc="upper right", bbox_to_anchor=(0.1, 0.1))
-    plt.show()
+    ax.set_title(title)
+    ax.legend(loc="upper right", bbox_to_anchor=(0.1, 0.1))
+    _finish_figure(fig, output)
@@ -0,0 +1,891 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from controllers.adaptive_control import AdaptiveController
+from controllers.multilevel_control import MultilevelController
+from utils.cache import DEFAULT_MAX_BYTES, ResultCache, _is_sparse
+
+DEFAULT_QUEUE_SIZE = 1024
+DEFAULT_MAX_BATCH = 64
+DEFAULT_BATCH_WINDOW = 0.001
+HISTORY_CHUNK = 2**14
+LATENCY_WINDOW = 10**4
+
+CONTROLLERS = {"adaptive": AdaptiveController, "multilevel": MultilevelController}
+# Names of the returned values of every method, in the order they are returned.
+RESULT_NAMES = {
+    ("adaptive", "simulate"): (
+        "u_signal",
+        "v_signal",
+        "y_signal",
+        "model_param",
+        "x",
+        "sin",
+    ),
+    ("adaptive", "identify"): ("estimated_param", "param_hist", "convergence_index"),
+    ("multilevel", "simulate"): (
+        "u_signal",
+        "v_signal",
+        "y_signal",
+        "model_param",
+        "connection_matrix",
+    ),
+    ("multilevel", "identify"): ("estimated_param",),
+}
+# Arguments writing files or calling back into the caller, which a remote
+# request cannot use.
+_SIDE_EFFECTS = ("history_path", "instrumentation")
+_LENGTH = struct.Struct("!I")
+
+
+class ServiceError(RuntimeError):
+    """
+    Raised by the client when the service fails to run a request.
+    """
+
+
+class ServiceBusy(ServiceError):
+    """
+    Raised by the client when the request queue of the service stays full.
+    """
+
+
+def _receive_exactly(connection, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = connection.recv_into(view[received:])
+        if not count:
+            raise ConnectionError("Connection closed")
+        received += count
+    return buffer
+
+
+def send_message(connection, header, arrays=None):
+    """
+    Send a message: a length-prefixed JSON header followed by raw array data.
+
+    Args:
+        connection (socket): Connected socket.
+        header (dict): JSON-serializable header.
+        arrays (dict, optional): Array name mapped to its ndarray. Their dtypes
+            and shapes are added to the header.
+    """
+    arrays = {
+        name: np.ascontiguousarray(array) for name, array in (arrays or {}).items()
+    }
+    if any(array.dtype.hasobject for array in arrays.values()):
+        raise TypeError("Object arrays cannot be sent")
+    header = dict(
+        header,
+        arrays=[[name, array.dtype.str, array.shape] for name, array in arrays.items()],
+    )
+    encoded = json.dumps(header).encode()
+    connection.sendall(_LENGTH.pack(len(encoded)) + encoded)
+    for array in arrays.values():
+        if array.size:
+            connection.sendall(memoryview(array.reshape(-1)).cast("B"))
+
+
+def receive_message(connection):
+    """
+    Receive a message sent with send_message.
+
+    Args:
+        connection (socket): Connected socket.
+
+    Returns:
+        tuple: header (dict), arrays (dict of ndarray).
+
+    Raises:
+        ConnectionError: When the peer closes the connection.
+    """
+    (size,) = _LENGTH.unpack(_receive_exactly(connection, _LENGTH.size))
+    header = json.loads(_receive_exactly(connection, size))
+    arrays = {}
+    for name, dtype, shape in header.pop("arrays", []):
+        dtype = np.dtype(dtype)
+        if dtype.hasobject:
+            raise ValueError("Object arrays are not accepted")
+        data = _receive_exactly(connection, int(np.prod(shape)) * dtype.itemsize)
+        arrays[name] = np.frombuffer(data, dtype).reshape(shape)
+    return header, arrays
+
+
+def _split_arguments(arguments):
+    """
+    Split keyword arguments into JSON options and arrays sent as binary data.
+    """
+    options, arrays = {}, {}
+    for name, value in arguments.items():
+        if _is_sparse(value):
+            value = value.toarray()
+        if isinstance(value, np.ndarray):
+            arrays[name] = value
+        elif isinstance(value, np.generic):
+            options[name] = value.item()
+        elif isinstance(value, (type, np.dtype)):
+            options[name] = np.dtype(value).name
+        else:
+            options[name] = value
+    return options, arrays
+
+
+def latency_summary(latencies):
+    """
+    Summarize request latencies.
+
+    Args:
+        latencies (array_like): Latencies in seconds.
+
+    Returns:
+        dict: 'mean', 'p50', 'p95' and 'p99' latency in seconds, None when no
+        latency was recorded.
+    """
+    if not len(latencies):
+        return {"mean": None, "p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]).tolist()
+    return {"mean": float(np.mean(latencies)), "p50": p50, "p95": p95, "p99": p99}
+
+
+_worker_cache = None
+
+
+def _init_worker(cache_directory, cache_max_bytes):
+    # Runs once in every worker process: opens the shared result cache and
+    # runs tiny simulations and identifications, so that the numba kernels of
+    # both covariance updates and floating point types are compiled before the
+    # first request arrives.
+    global _worker_cache
+    if cache_directory is not None:
+        _worker_cache = ResultCache(cache_directory, cache_max_bytes)
+    for dtype in ("float64", "float32"):
+        adaptive = AdaptiveController(64, 6)
+        u_signal, _, y_signal, _, _, _ = adaptive.simulate(0.1, rng=0, dtype=dtype)
+        for mode in ("standard", "sqrt"):
+            adaptive.identify(u_signal, y_signal, 1, mode=mode)
+        multilevel = MultilevelController(64, 6)
+        u_signal, _, y_signal, _, connection_matrix = multilevel.simulate(
+            0.1, rng=0, dtype=dtype
+        )
+        multilevel.identify(u_signal, y_signal, connection_matrix)
+
+
+def _ready():
+    return os.getpid()
+
+
+def _call(controller_type, operation, samples_number, signal_length, options, arrays):
+    arguments = dict(options, **arrays)
+    if operation == "identify":
+        samples_number = arguments["output_signal"].shape[-1]
+    controller = CONTROLLERS[controller_type](
+        samples_number, signal_length, _worker_cache
+    )
+    result = getattr(controller, operation)(**arguments)
+    return result if isinstance(result, tuple) else (result,)
+
+
+def _run_stacked(requests):
+    # multilevel identifications sharing the connection matrix and signal
+    # shape, identified as the runs of a single call
+    _, _, _, _, options, arrays = requests[0]
+    input_signals = np.stack([request[5]["input_signal"] for request in requests])
+    output_signals = np.stack([request[5]["output_signal"] for request in requests])
+    controller = MultilevelController(output_signals.shape[-1], 0, _worker_cache)
+    estimates = controller.identify(
+        input_signals, output_signals, arrays["connection_matrix"], **options
+    )
+    return [(True, (estimate,)) for estimate in estimates]
+
+
+def _run_batch(requests, stacked=False):
+    """
+    Run a batch of requests in a worker process.
+
+    Args:
+        requests (list of tuple): (controller_type, operation, samples_number,
+            signal_length, options, arrays) of every request.
+        stacked (bool): Identify the requests as the runs of one call.
+
+    Returns:
+        list of tuple: (True, result) or (False, error message) per request.
+    """
+    if stacked:
+        try:
+            return _run_stacked(requests)
+        except Exception:
+            # rerun one by one, so that the error is reported to its request
+            pass
+    results = []
+    for request in requests:
+        try:
+            results.append((True, _call(*request)))
+        except Exception as error:
+            results.append((False, f"{type(error).__name__}: {error}"))
+    return results
+
+
+def _stack_key(request):
+    controller_type, operation, _, _, options, arrays = request
+    if (controller_type, operation) != ("multilevel", "identify"):
+        return None
+    if set(options) - {"dtype"} or set(arrays) != {
+        "input_signal",
+        "output_signal",
+        "connection_matrix",
+    }:
+        return None
+    input_signal = arrays["input_signal"]
+    output_signal = arrays["output_signal"]
+    connection_matrix = arrays["connection_matrix"]
+    if output_signal.ndim != 2 or input_signal.shape != output_signal.shape:
+        return None
+    return (
+        output_signal.shape,
+        output_signal.dtype.str,
+        input_signal.dtype.str,
+        options.get("dtype"),
+        connection_matrix.shape,
+        connection_matrix.dtype.str,
+        connection_matrix.tobytes(),
+    )
+
+
+def _parse_request(header, arrays):
+    controller_type = header.get("controller")
+    operation = header.get("operation")
+    if controller_type not in CONTROLLERS:
+        raise ValueError(f"Unknown controller type: {controller_type}")
+    if operation not in ("simulate", "identify"):
+        raise ValueError(f"Unknown operation: {operation}")
+    options = header.get("options", {})
+    unsupported = [name for name in _SIDE_EFFECTS if name in options]
+    if unsupported:
+        raise ValueError(f"Not supported by the service: {', '.join(unsupported)}")
+    return (
+        controller_type,
+        operation,
+        header.get("samples"),
+        header.get("length", 6 if operation == "simulate" else 0),
+        options,
+        arrays,
+    )
+
+
+class _Job:
+    """
+    A queued request with the future receiving its result.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.result = Future()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """
+    Serves the requests of one client connection, one at a time.
+    """
+
+    def setup(self):
+        if self.request.family != socket.AF_UNIX:
+            # header and array data are separate writes, not to be delayed
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def handle(self):
+        service = self.server.service
+        while True:
+            try:
+                header, arrays = receive_message(self.request)
+            except (OSError, ValueError):
+                return
+            received = time.perf_counter()
+            if header.get("operation") == "metrics":
+                send_message(
+                    self.request, {"status": "ok", "metrics": service.metrics()}
+                )
+                continue
+            try:
+                request = _parse_request(header, arrays)
+            except ValueError as error:
+                send_message(self.request, {"status": "error", "error": str(error)})
+                continue
+
+            job = _Job(request)
+            if not service._submit(job):
+                send_message(self.request, {"status": "busy"})
+                continue
+            succeeded, result = job.result.result()
+            # recorded before replying, so that the metrics count every request
+            # whose reply a client has received
+            service._record(time.perf_counter() - received, succeeded)
+            if succeeded:
+                names = RESULT_NAMES[request[:2]]
+                chunk = header.get("history_chunk") or service.history_chunk
+                _send_result(self.request, names, result, chunk)
+            else:
+                send_message(self.request, {"status": "error", "error": result})
+
+
+def _send_result(connection, names, result, history_chunk):
+    # param_hist follows the other values in frames of history_chunk samples,
+    # so that the client can consume long histories incrementally
+    values, arrays, param_hist = {}, {}, None
+    for name, value in zip(names, result):
+        if _is_sparse(value):
+            value = value.toarray()
+        if name == "param_hist" and isinstance(value, np.ndarray):
+            param_hist = value
+        elif isinstance(value, np.ndarray):
+            arrays[name] = value
+        elif isinstance(value, np.generic):
+            values[name] = value.item()
+        else:
+            values[name] = value
+    header = {"status": "ok", "names": names[: len(result)], "values": values}
+    if param_hist is not None:
+        header["history"] = {"shape": param_hist.shape, "dtype": param_hist.dtype.str}
+    send_message(connection, header, arrays)
+    if param_hist is not None:
+        samples = param_hist.shape[-1]
+        for start in range(0, samples, history_chunk):
+            send_message(
+                connection,
+                {"start": start},
+                {"param_hist": param_hist[..., start : start + history_chunk]},
+            )
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class IdentificationService:
+    """
+    Long-running local service running simulate and identify requests of both
+    controllers on a warm pool of worker processes.
+
+    Clients connect over a Unix socket or localhost TCP and exchange messages of
+    a JSON header followed by raw array data (see send_message). Requests are
+    queued in a bounded queue; a full queue answers 'busy' instead of growing,
+    and at most two batches per worker are in flight, so that a saturated pool
+    makes the queue fill up. A dispatcher thread collects the requests arriving
+    within batch_window seconds into batches of up to max_batch requests, each
+    run by one task of the pool. Multilevel identifications of the same shape
+    and connection matrix are stacked and identified as the runs of one call.
+    When a worker process dies, the requests running on the pool fail with an
+    error reply and the pool is started and warmed up again.
+    """
+
+    def __init__(
+        self,
+        address,
+        workers=None,
+        queue_size=DEFAULT_QUEUE_SIZE,
+        max_batch=DEFAULT_MAX_BATCH,
+        batch_window=DEFAULT_BATCH_WINDOW,
+        history_chunk=HISTORY_CHUNK,
+        cache_directory=None,
+        cache_max_bytes=DEFAULT_MAX_BYTES,
+    ):
+        """
+        Initialize the IdentificationService.
+
+        Args:
+            address (str or tuple): Path of a Unix socket, or (host, port) to
+                listen on TCP; port 0 picks a free port.
+            workers (int, optional): Number of worker processes, defaults to the
+                number of CPUs.
+            queue_size (int): Largest number of queued requests.
+            max_batch (int): Largest number of requests of a batch.
+            batch_window (float): Seconds to wait for more requests of a batch.
+            history_chunk (int): Samples of param_hist sent per frame, unless a
+                request asks for another size.
+            cache_directory (str, optional): ResultCache directory shared by
+                the workers.
+            cache_max_bytes (int): Size cap of the cache.
+        """
+        self.address = address
+        self.workers = workers or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.history_chunk = history_chunk
+        self.cache_directory = cache_directory
+        self.cache_max_bytes = cache_max_bytes
+        self._queue = queue.Queue(queue_size)
+        self._slots = threading.BoundedSemaphore(2 * self.workers)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counts = dict.fromkeys(
+            (
+                "accepted",
+                "rejected",
+                "completed",
+                "failed",
+                "batches",
+                "batched",
+                "restarts",
+            ),
+            0,
+        )
+        self._executor = None
+        self._server = None
+        self._threads = []
+        self._started = None
+
+    def start(self):
+        """
+        Start the worker processes, wait until they are warm and start serving
+        in background threads.
+
+        Returns:
+            IdentificationService: The service.
+        """
+        self._executor = self._start_pool()
+
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+            self._server = _UnixServer(self.address, _Handler)
+        else:
+            self._server = _TCPServer(tuple(self.address), _Handler)
+        self._server.service = self
+        self.address = self._server.server_address
+
+        self._started = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._dispatch, daemon=True),
+            threading.Thread(target=self._server.serve_forever, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _start_pool(self):
+        executor = ProcessPoolExecutor(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(self.cache_directory, self.cache_max_bytes),
+        )
+        for future in [executor.submit(_ready) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _restart_pool(self):
+        # a dead worker breaks the whole pool: every task still running on it
+        # has failed, and no task can be submitted any more
+        self._executor.shutdown(wait=False)
+        self._executor = self._start_pool()
+        with self._lock:
+            self._counts["restarts"] += 1
+
+    def wait(self):
+        """
+        Block until the service is closed.
+        """
+        for thread in self._threads:
+            thread.join()
+
+    def close(self):
+        """
+        Stop serving, finish the queued requests and stop the workers.
+        """
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._executor.shutdown()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def metrics(self):
+        """
+        Report the throughput and latency of the service.
+
+        Returns:
+            dict: Counts of 'accepted', 'rejected' (queue full), 'completed' and
+            'failed' requests, of pool 'restarts' after a worker process died,
+            and of 'batches' with their 'mean_batch_size',
+            the current 'queue_depth', the 'uptime' in seconds, the
+            'throughput' in completed requests per second, and the 'latency'
+            of the last LATENCY_WINDOW requests as returned by latency_summary,
+            from receiving a request until its result is ready.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = list(self._latencies)
+        uptime = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            **{name: counts[name] for name in counts if name != "batched"},
+            "mean_batch_size": (
+                counts["batched"] / counts["batches"] if counts["batches"] else 0.0
+            ),
+            "queue_depth": self._queue.qsize(),
+            "uptime": uptime,
+            "throughput": counts["completed"] / uptime if uptime else 0.0,
+            "latency": latency_summary(latencies),
+        }
+
+    def _submit(self, job):
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._counts["rejected"] += 1
+            return False
+        with self._lock:
+            self._counts["accepted"] += 1
+        return True
+
+    def _record(self, latency, succeeded):
+        with self._lock:
+            self._counts["completed" if succeeded else "failed"] += 1
+            self._latencies.append(latency)
+
+    def _collect(self):
+        # blocks for the first request, then takes more until the batch is
+        # full or the window has passed; the None put by close ends the batch
+        jobs = []
+        deadline = None
+        while len(jobs) < self.max_batch:
+            try:
+                if deadline is None:
+                    job = self._queue.get()
+                    deadline = time.perf_counter() + self.batch_window
+                else:
+                    job = self._queue.get(
+                        timeout=max(deadline - time.perf_counter(), 0)
+                    )
+            except queue.Empty:
+                break
+            if job is None:
+                return jobs, True
+            jobs.append(job)
+        return jobs, False
+
+    def _batches(self, jobs):
+        groups = {}
+        for job in jobs:
+            groups.setdefault(_stack_key(job.request), []).append(job)
+        # requests that cannot be stacked are spread over the workers
+        size = max(-(-len(jobs) // self.workers), 1)
+        for key, group in groups.items():
+            if key is not None and len(group) > 1:
+                yield group, True
+            else:
+                for start in range(0, len(group), size):
+                    yield group[start : start + size], False
+
+    def _dispatch(self):
+        closed = False
+        while not closed:
+            jobs, closed = self._collect()
+            for batch, stacked in self._batches(jobs):
+                self._slots.acquire()
+                with self._lock:
+                    self._counts["batches"] += 1
+                    self._counts["batched"] += len(batch)
+                requests = [job.request for job in batch]
+                try:
+                    try:
+                        future = self._executor.submit(_run_batch, requests, stacked)
+                    except BrokenProcessPool:
+                        self._restart_pool()
+                        future = self._executor.submit(_run_batch, requests, stacked)
+                except Exception as error:
+                    # the pool could not be restarted: the batch fails, and the
+                    # next batch tries again
+                    self._slots.release()
+                    self._fail(batch, error)
+                    continue
+                future.add_done_callback(
+                    lambda future, batch=batch: self._finish(batch, future)
+                )
+
+    def _finish(self, batch, future):
+        self._slots.release()
+        try:
+            results = future.result()
+        except Exception as error:
+            self._fail(batch, error)
+            return
+        for job, result in zip(batch, results):
+            job.result.set_result(result)
+
+    def _fail(self, batch, error):
+        for job in batch:
+            job.result.set_result((False, f"{type(error).__name__}: {error}"))
+
+
+class ServiceClient:
+    """
+    Client of an IdentificationService. One connection serves one request at a
+    time; use a client per thread for concurrent requests.
+    """
+
+    def __init__(self, address, timeout=None, busy_retries=10, busy_backoff=0.01):
+        """
+        Initialize the ServiceClient and connect to the service.
+
+        Args:
+            address (str or tuple): Unix socket path or (host, port).
+            timeout (float, optional): Socket timeout in seconds.
+            busy_retries (int): Retries of a request rejected by a full queue.
+            busy_backoff (float): Seconds before the first retry, doubled on
+                every further retry.
+        """
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        if family == socket.AF_INET:
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.connect(address if isinstance(address, str) else tuple(address))
+        self.busy_retries = busy_retries
+        self.busy_backoff = busy_backoff
+
+    def close(self):
+        """
+        Close the connection.
+        """
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _request(self, header, arrays=None):
+        for attempt in range(self.busy_retries + 1):
+            if attempt:
+                time.sleep(self.busy_backoff * 2 ** (attempt - 1))
+            send_message(self._socket, header, arrays)
+            response, result_arrays = receive_message(self._socket)
+            if response["status"] != "busy":
+                break
+        else:
+            raise ServiceBusy("The request queue of the service is full")
+        if response["status"] == "error":
+            raise ServiceError(response["error"])
+        return response, result_arrays
+
+    def _call(self, header, arguments):
+        options, arrays = _split_arguments(arguments)
+        response, result_arrays = self._request(dict(header, options=options), arrays)
+        names = response["names"]
+        values = dict(response["values"], **result_arrays)
+        chunks = ()
+        if "history" in response:
+            chunks = self._history_chunks(response["history"]["shape"][-1])
+            values["param_hist"] = None
+        return tuple(values[name] for name in names), response, chunks
+
+    def _history_chunks(self, samples):
+        received = 0
+        while received < samples:
+            header, arrays = receive_message(self._socket)
+            chunk = arrays["param_hist"]
+            yield header["start"], chunk
+            received += chunk.shape[-1]
+
+    def simulate(
+        self, controller_type, samples_number, variance, signal_length=6, **options
+    ):
+        """
+        Simulate a controller on the service.
+
+        Args:
+            controller_type (str): 'adaptive' or 'multilevel'.
+            samples_number (int): Number of samples.
+            variance (float): Variance of the noise.
+            signal_length (int): Length of the signal.
+            **options: Further arguments of the controller's simulate method; rng
+                must be an integer seed.
+
+        Returns:
+            tuple: As returned by the controller's simulate method.
+        """
+        header = {
+            "controller": controller_type,
+            "operation": "simulate",
+            "samples": samples_number,
+            "length": signal_length,
+        }
+        result, _, _ = self._call(header, dict(options, variance=variance))
+        return result
+
+    def identify_stream(
+        self,
+        controller_type,
+        input_signal,
+        output_signal,
+        history_chunk=None,
+        **options,
+    ):
+        """
+        Identify model parameters on the service, receiving param_hist in chunks.
+
+        The chunks must be consumed before the next request of this client.
+
+        Args:
+            controller_type (str): 'adaptive' or 'multilevel'.
+            input_signal (ndarray): Input signal.
+            output_signal (ndarray): Output signal.
+            history_chunk (int, optional): Samples of param_hist per chunk.
+            **options: Further arguments of the controller's identify method,
+                such as the connection_matrix of the multilevel controller.
+
+        Returns:
+            tuple: The result of the identify method with param_hist None, and
+            an iterator of (start, param_hist chunk) pairs, chunk covering the
+            samples from start on.
+        """
+        header = {
+            "controller": controller_type,
+            "operation": "identify",
+            "history_chunk": history_chunk,
+        }
+        arguments = dict(
+            options, input_signal=input_signal, output_signal=output_signal
+        )
+        result, _, chunks = self._call(header, arguments)
+        return result, chunks
+
+    def identify(self, controller_type, input_signal, output_signal, **options):
+        """
+        Identify model parameters on the service.
+
+        Args:
+            controller_type (str): 'adaptive' or 'multilevel'.
+            input_signal (ndarray): Input signal.
+            output_signal (ndarray): Output signal.
+            **options: As in identify_stream.
+
+        Returns:
+            The result of the controller's identify method.
+        """
+        header = {"controller": controller_type, "operation": "identify"}
+        arguments = dict(
+            options, input_signal=input_signal, output_signal=output_signal
+        )
+        result, response, chunks = self._call(header, arguments)
+        if "history" in response:
+            param_hist = np.empty(
+                response["history"]["shape"], np.dtype(response["history"]["dtype"])
+            )
+            for start, chunk in chunks:
+                param_hist[..., start : start + chunk.shape[-1]] = chunk
+            result = tuple(
+                param_hist if name == "param_hist" else value
+                for name, value in zip(response["names"], result)
+            )
+        return result if len(result) > 1 else result[0]
+
+    def metrics(self):
+        """
+        Fetch the metrics of the service.
+
+        Returns:
+            dict: As returned by IdentificationService.metrics.
+        """
+        response, _ = self._request({"operation": "metrics"})
+        return response["metrics"]
+
+
+def run_load_test(
+    address,
+    controller_type="adaptive",
+    requests=1000,
+    concurrency=8,
+    samples_number=1000,
+    order=3,
+    seed=0,
+):
+    """
+    Load-test a running service with concurrent small identification requests.
+
+    The signals are simulated once, locally, so that only the identification
+    is measured; every request identifies them again.
+
+    Args:
+        address (str or tuple): Address of the service.
+        controller_type (str): 'adaptive' or 'multilevel'.
+        requests (int): Number of requests.
+        concurrency (int): Number of concurrent clients.
+        samples_number (int): Number of samples of every request.
+        order (int): Number of FIR taps of the adaptive identification.
+        seed (int): Seed of the simulated signals.
+
+    Returns:
+        dict: 'requests', 'failed' requests, 'seconds', 'throughput' in requests
+        per second, client-side 'latency' as returned by latency_summary, and
+        the 'service' metrics after the test.
+    """
+    if controller_type == "adaptive":
+        controller = AdaptiveController(samples_number, 6)
+        u_signal, _, y_signal, _, _, _ = controller.simulate(
+            0.1, coefficients=np.linspace(1, 0.5, order), rng=seed
+        )
+        options = {"forgetting_factor": 1, "order": order}
+    else:
+        controller = MultilevelController(samples_number, 6)
+        u_signal, _, y_signal, _, connection_matrix = controller.simulate(0.1, rng=seed)
+        options = {"connection_matrix": connection_matrix}
+
+    def client_requests(count):
+        latencies, failed = [], 0
+        with ServiceClient(address) as client:
+            for _ in range(count):
+                start = time.perf_counter()
+                try:
+                    client.identify(controller_type, u_signal, y_signal, **options)
+                except ServiceError:
+                    failed += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+        return latencies, failed
+
+    counts = [len(part) for part in np.array_split(np.arange(requests), concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        outcomes = list(executor.map(client_requests, counts))
+    seconds = time.perf_counter() - start
+
+    latencies = [latency for outcome in outcomes for latency in outcome[0]]
+    with ServiceClient(address) as client:
+        service_metrics = client.metrics()
+    return {
+        "requests": requests,
+        "failed": sum(outcome[1] for outcome in outcomes),
+        "seconds": seconds,
+        "throughput": len(latencies) / seconds,
+        "latency": latency_summary(latencies),
+        "service": service_metrics,
+    }
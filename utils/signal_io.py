@@ -0,0 +1,134 @@
+import os
+from itertools import islice
+
+import numpy as np
+
+
+def count_csv_rows(path, skip_header=0):
+    """
+    Count the data rows of a CSV file without parsing it.
+
+    Args:
+        path (str): CSV file.
+        skip_header (int): Number of header lines.
+
+    Returns:
+        int: Number of non-empty data rows.
+    """
+    rows = 0
+    with open(path, "rb") as csv_file:
+        for _ in range(skip_header):
+            csv_file.readline()
+        for line in csv_file:
+            rows += bool(line.strip())
+    return rows
+
+
+def read_csv_chunks(path, chunk_rows=2**16, delimiter=",", skip_header=0):
+    """
+    Parse a numeric CSV file in chunks of rows.
+
+    Args:
+        path (str): CSV file with one signal per column.
+        chunk_rows (int): Number of rows parsed at a time.
+        delimiter (str): Column delimiter.
+        skip_header (int): Number of header lines.
+
+    Yields:
+        ndarray: Chunk of shape (rows, columns).
+    """
+    with open(path) as csv_file:
+        for _ in range(skip_header):
+            csv_file.readline()
+        while True:
+            lines = [line for line in islice(csv_file, chunk_rows) if line.strip()]
+            if not lines:
+                return
+            yield np.loadtxt(lines, delimiter=delimiter, ndmin=2)
+
+
+def csv_to_npy(csv_path, npy_path, chunk_rows=2**16, delimiter=",", skip_header=0):
+    """
+    Convert a CSV file to a .npy file without loading it fully into memory.
+
+    The CSV columns become the rows of the stored array, so a file with one
+    signal per column is stored as (signals, samples).
+
+    Args:
+        csv_path (str): CSV file with one signal per column.
+        npy_path (str): Output .npy file.
+        chunk_rows (int): Number of rows parsed at a time.
+        delimiter (str): Column delimiter.
+        skip_header (int): Number of header lines.
+
+    Returns:
+        ndarray: The stored array, memory-mapped read-only.
+    """
+    rows = count_csv_rows(csv_path, skip_header)
+    if rows == 0:
+        raise ValueError(f"No data rows in {csv_path}")
+
+    stored = None
+    start = 0
+    for chunk in read_csv_chunks(csv_path, chunk_rows, delimiter, skip_header):
+        if stored is None:
+            stored = np.lib.format.open_memmap(
+                npy_path, mode="w+", dtype=float, shape=(chunk.shape[1], rows)
+            )
+        stored[:, start : start + len(chunk)] = chunk.T
+        start += len(chunk)
+    stored.flush()
+    del stored
+    return load_signal(npy_path)
+
+
+def load_signal(path, delimiter=",", skip_header=0):
+    """
+    Load a recorded signal.
+
+    .npy files are memory-mapped read-only, so only the parts that are used
+    are read from disk. .csv files are parsed in chunks into a (signals,
+    samples) array; use csv_to_npy first for recordings larger than memory.
+
+    Args:
+        path (str): .npy, .npz (single array) or .csv file.
+        delimiter (str): Column delimiter of CSV files.
+        skip_header (int): Number of header lines of CSV files.
+
+    Returns:
+        ndarray: The signal, with a single CSV column returned as a 1-D array.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        return np.load(path, mmap_mode="r")
+    if extension == ".npz":
+        with np.load(path) as archive:
+            return archive[archive.files[0]]
+    if extension == ".csv":
+        chunks = read_csv_chunks(path, delimiter=delimiter, skip_header=skip_header)
+        signal = np.concatenate(list(chunks)).T
+        return signal[0] if len(signal) == 1 else signal
+    raise ValueError(f"Unsupported signal file: {path}")
+
+
+def save_signal(path, signal, chunk_size=2**20):
+    """
+    Save a signal to a .npy file, copying it in chunks along the last axis.
+
+    The signal may itself be memory-mapped, so recordings larger than memory
+    can be converted or copied.
+
+    Args:
+        path (str): Output .npy file.
+        signal (ndarray): Signal to store.
+        chunk_size (int): Number of samples copied at a time.
+    """
+    signal = np.asanyarray(signal)
+    stored = np.lib.format.open_memmap(
+        path, mode="w+", dtype=signal.dtype, shape=signal.shape
+    )
+    for start in range(0, signal.shape[-1], chunk_size):
+        stored[..., start : start + chunk_size] = signal[
+            ..., start : start + chunk_size
+        ]
+    stored.flush()
@@ -1,34 +1,174 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 
-def generate_sin(samples_number, signal_length):
+def generate_sin(samples_number, signal_length, dtype=float):
     """
     Generate a sine wave signal.
 
     Args:
         samples_number (int): Number of samples in the signal.
         signal_length (int): Length of the signal in terms of periods of pi.
+        dtype (data-type): Floating point type of the signal.
 
     Returns:
         tuple: sin, x
     """
-    x = np.linspace(0, signal_length * np.pi, samples_number)
+    x = np.linspace(0, signal_length * np.pi, samples_number, dtype=dtype)
     sin = np.sin(x)
     return sin, x
 
 
-def generate_noise(samples_number, variance):
+def generate_sin_chunks(samples_number, signal_length, chunk_size, dtype=float):
+    """
+    Generate a sine wave signal chunk by chunk.
+
+    Streaming counterpart of generate_sin; the concatenated chunks equal its
+    output.
+
+    Args:
+        samples_number (int): Number of samples in the signal.
+        signal_length (int): Length of the signal in terms of periods of pi.
+        chunk_size (int): Number of samples of every chunk.
+        dtype (data-type): Floating point type of the signal.
+
+    Yields:
+        tuple: sin, x of the next chunk.
+    """
+    stop = signal_length * np.pi
+    step = stop / (samples_number - 1) if samples_number > 1 else 0.0
+    for start in range(0, samples_number, chunk_size):
+        x = np.arange(start, min(start + chunk_size, samples_number)) * step
+        if start + len(x) == samples_number and samples_number > 1:
+            x[-1] = stop
+        x = x.astype(dtype, copy=False)
+        yield np.sin(x), x
+
+
+# Number of uniform draws generate_noise converts to the noise dtype at a time.
+NOISE_BLOCK = 2**16
+
+
+def make_rng(rng=None):
+    """
+    Create a random number generator.
+
+    Args:
+        rng (Generator, int or SeedSequence, optional): Existing generator, which is
+            returned unchanged, or a seed for a new one. A fresh OS-seeded generator
+            is created when omitted.
+
+    Returns:
+        Generator: The random number generator.
+    """
+    return np.random.default_rng(rng)
+
+
+def spawn_rngs(workers, seed=None):
+    """
+    Create independent random number generators for parallel workers.
+
+    The streams are spawned from a single SeedSequence, so they do not overlap
+    and the whole set is reproducible from one seed.
+
+    Args:
+        workers (int): Number of generators.
+        seed (int or SeedSequence, optional): Root seed.
+
+    Returns:
+        list: One Generator per worker.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(workers)]
+
+
+def generate_noise(samples_number, variance, rng=None, runs=None, dtype=float):
     """
     Generate noise based on a given variance.
 
+    The uniform draws are taken and scaled in double precision in blocks of
+    NOISE_BLOCK samples, then stored in dtype, so float32 noise is the rounded
+    float64 noise of the same generator, without a float64 copy of the whole
+    array.
+
+    Args:
+        samples_number (int): Number of samples in the noise.
+        variance (float): Variance of the noise.
+        rng (Generator or int, optional): Random number generator or seed.
+        runs (int or tuple, optional): Number of independent runs, or leading shape
+            of the runs, drawn in one call.
+        dtype (data-type): Floating point type of the noise.
+
+    Returns:
+        ndarray: The generated noise, of shape (runs, samples_number) when runs
+        is given.
+    """
+    shape = (samples_number,)
+    if runs is not None:
+        shape = tuple(np.atleast_1d(runs)) + shape
+    rng = make_rng(rng)
+    scale = np.sqrt(12 * variance)
+    noise = np.empty(shape, dtype=dtype)
+    flat_noise = noise.reshape(-1)
+    for start in range(0, flat_noise.size, NOISE_BLOCK):
+        draws = rng.random(min(NOISE_BLOCK, flat_noise.size - start))
+        draws -= 0.5
+        draws *= scale
+        flat_noise[start : start + len(draws)] = draws
+    return noise
+
+
+def generate_noise_chunks(
+    samples_number, variance, chunk_size, rng=None, runs=None, dtype=float
+):
+    """
+    Generate noise chunk by chunk.
+
+    Streaming counterpart of generate_noise. With the default PCG64 generator
+    the draws are reserved when this function is called: every run draws from
+    its own copy of the stream, advanced to where generate_noise would have
+    drawn it, and rng is advanced past all of them. The concatenated chunks
+    therefore equal the output of generate_noise called at the same point.
+    Other bit generators draw the chunks from rng in sequence.
+
     Args:
         samples_number (int): Number of samples in the noise.
         variance (float): Variance of the noise.
+        chunk_size (int): Number of samples of every chunk.
+        rng (Generator or int, optional): Random number generator or seed.
+        runs (int or tuple, optional): Number of independent runs, or leading shape
+            of the runs.
+        dtype (data-type): Floating point type of the noise.
 
     Returns:
-        ndarray: The generated noise.
+        iterator: Noise chunks of shape (runs, chunk) or (chunk,).
     """
-    return (np.random.rand(samples_number) - 0.5) * np.sqrt(12 * variance)
+    rng = make_rng(rng)
+    leading = () if runs is None else tuple(np.atleast_1d(runs))
+    scale = np.sqrt(12 * variance)
+    bit_generator = rng.bit_generator
+    streams = None
+    if isinstance(bit_generator, (np.random.PCG64, np.random.PCG64DXSM)):
+        streams = []
+        for run in range(int(np.prod(leading))):
+            stream = type(bit_generator)()
+            stream.state = bit_generator.state
+            stream.advance(run * samples_number)
+            streams.append(np.random.Generator(stream))
+        bit_generator.advance(len(streams) * samples_number)
+
+    def chunks():
+        for start in range(0, samples_number, chunk_size):
+            chunk = min(chunk_size, samples_number - start)
+            if streams is None:
+                draws = rng.random(leading + (chunk,))
+            else:
+                draws = np.stack([stream.random(chunk) for stream in streams])
+            noise = (draws.reshape(leading + (chunk,)) - 0.5) * scale
+            yield noise.astype(dtype, copy=False)
+
+    return chunks()
 
 
 def generate_noise_signal(signal, noise):
@@ -45,20 +185,274 @@ def generate_noise_signal(signal, noise):
     return signal + noise
 
 
+def float_dtype(signal, dtype=None):
+    """
+    Choose the floating point type to process a signal in.
+
+    Args:
+        signal (array_like): Signal, possibly memory-mapped.
+        dtype (data-type, optional): Requested type, returned when given.
+
+    Returns:
+        dtype: dtype, or else the type of a floating point signal, so that
+        float32 signals are never upcast, and float64 for other signals.
+    """
+    if dtype is not None:
+        return np.dtype(dtype)
+    signal_dtype = np.asarray(signal).dtype
+    if np.issubdtype(signal_dtype, np.floating):
+        return signal_dtype
+    return np.dtype(float)
+
+
+def _as_float(signal):
+    return np.asarray(signal, dtype=float_dtype(signal))
+
+
+# FIR filters switch from the direct shift-add to overlap-add FFT convolution
+# from this number of taps on.
+FFT_MIN_TAPS = 16
+
+
+def _direct_filter(input_signal, coefficients):
+    samples = input_signal.shape[-1]
+    output_signal = np.zeros_like(input_signal)
+    for lag, coefficient in enumerate(coefficients):
+        output_signal[..., lag:] += coefficient * input_signal[..., : samples - lag]
+    return output_signal
+
+
+def _overlap_add_filter(input_signal, coefficients):
+    samples = input_signal.shape[-1]
+    taps = len(coefficients)
+    fft_size = max(1 << (8 * taps - 1).bit_length(), 1024)
+    fft_size = min(fft_size, 1 << (samples + taps - 1).bit_length())
+    block = fft_size - taps + 1
+    blocks = -(-samples // block)
+
+    padded = np.zeros(input_signal.shape[:-1] + (blocks * block,), input_signal.dtype)
+    padded[..., :samples] = input_signal
+    spectra = np.fft.rfft(
+        padded.reshape(input_signal.shape[:-1] + (blocks, block)), fft_size
+    )
+    filtered = np.fft.irfft(spectra * np.fft.rfft(coefficients, fft_size), fft_size)
+    # the tail of every block overlaps the head of the next one, block >= taps - 1
+    output_blocks = filtered[..., :block]
+    output_blocks[..., 1:, : taps - 1] += filtered[..., :-1, block:]
+    return output_blocks.reshape(padded.shape)[..., :samples]
+
+
+def fir_filter(input_signal, coefficients, method="auto"):
+    """
+    Filter signals with an FIR model, keeping the first samples of the output.
+
+    Computes y(n) = sum_k b_k u(n - k) with zero initial conditions, the first
+    len(input_signal) samples of the full convolution, without computing its
+    tail. Floating point signals are filtered in their own precision.
+
+    Args:
+        input_signal (ndarray): Input signal of shape (..., samples).
+        coefficients (array_like): FIR coefficients b_0, b_1, ...
+        method (str): 'direct' shift-add in O(N M), 'fft' overlap-add FFT
+            convolution in O(N log M), or 'auto' to use FFT from FFT_MIN_TAPS taps.
+
+    Returns:
+        ndarray: Filtered signal of the shape of input_signal.
+    """
+    input_signal = _as_float(input_signal)
+    # taps beyond the signal length never reach the output
+    coefficients = np.asarray(coefficients, dtype=input_signal.dtype)[
+        : input_signal.shape[-1]
+    ]
+    if method == "auto":
+        method = "fft" if len(coefficients) >= FFT_MIN_TAPS else "direct"
+    if method == "direct":
+        return _direct_filter(input_signal, coefficients)
+    if method == "fft":
+        return _overlap_add_filter(input_signal, coefficients)
+    raise ValueError(f"Unknown filter method: {method}")
+
+
+def lagged_regressor(signals, lags, delays=0, past=None, dtype=float):
+    """
+    Build the regressor matrix of lagged signals.
+
+    The columns of a signal s with lags taps and delay d are
+    [s(n-d), s(n-d-1), ..., s(n-d-lags+1)], so an FIR input uses delay 0 and
+    the lagged outputs of an ARX model use delay 1. The windows are strided
+    views of the zero-padded signal, so a single signal is never copied beyond
+    the padding.
+
+    Args:
+        signals (ndarray): One signal of shape (..., samples) when lags is an int,
+            or several of shape (..., signals, samples) with one lag count each.
+        lags (int or list of int): Number of taps of every signal.
+        delays (int or list of int): Smallest lag of every signal.
+        past (ndarray, optional): Last samples before the signals, of shape
+            (..., history) or (..., signals, history) with history the largest
+            lags + delays - 1; zeros by default.
+        dtype (data-type): Floating point type of the regressor matrix.
+
+    Returns:
+        ndarray: Regressor matrix of shape (..., samples, sum(lags)), read-only.
+    """
+    signals = np.asarray(signals, dtype=dtype)
+    single = np.ndim(lags) == 0
+    if single:
+        signals = signals[..., None, :]
+    lags = np.atleast_1d(lags)
+    delays = np.broadcast_to(delays, lags.shape)
+    history = int(max(lags + delays)) - 1
+
+    if past is None:
+        past = np.zeros(signals.shape[:-1] + (history,), dtype=dtype)
+    elif single:
+        past = np.asarray(past, dtype=dtype)[..., None, :]
+    padded = np.concatenate([past, signals], axis=-1)
+    # windows[..., n, lag] holds s(n - lag)
+    windows = sliding_window_view(padded, history + 1, axis=-1)[..., ::-1]
+
+    columns = [
+        windows[..., channel, :, delay : delay + lag]
+        for channel, (lag, delay) in enumerate(zip(lags, delays))
+    ]
+    if len(columns) == 1:
+        return columns[0]
+    return np.concatenate(columns, axis=-1)
+
+
+def _window_means(extended_signal, time_horizon, samples):
+    # the running sums are kept in float64 also for float32 signals, whose
+    # differences would otherwise lose precision over long signals
+    cumulative = np.zeros(extended_signal.shape[:-1] + (extended_signal.shape[-1] + 1,))
+    np.cumsum(extended_signal, axis=-1, dtype=float, out=cumulative[..., 1:])
+    start = cumulative.shape[-1] - samples
+    return (
+        cumulative[..., start:] - cumulative[..., start - time_horizon : -time_horizon]
+    ) / time_horizon
+
+
 def denoise_filter(noise_signal, time_horizon):
     """
     Apply a denoising filter to a noisy signal.
 
+    Sample i of the output is the mean of the time_horizon samples preceding it;
+    the first time_horizon samples are NaN. Runs in O(N) using cumulative sums.
+    The output has the floating point type of the input.
+
     Args:
-        noise_signal (ndarray): The noisy signal.
+        noise_signal (ndarray): The noisy signal, or signals stacked as
+            (channels, samples).
         time_horizon (int): Time horizon for the denoising filter.
 
     Returns:
         ndarray: The denoised signal.
     """
-    denoise_signal = np.array([np.nan] * time_horizon)
-    for i in range(time_horizon, len(noise_signal)):
-        denoise_signal = np.append(
-            denoise_signal, np.mean(noise_signal[i - time_horizon : i])
+    noise_signal = _as_float(noise_signal)
+    samples = noise_signal.shape[-1]
+    denoise_signal = np.full(
+        noise_signal.shape[:-1] + (max(samples, time_horizon),),
+        np.nan,
+        dtype=noise_signal.dtype,
+    )
+    if samples > time_horizon:
+        denoise_signal[..., time_horizon:] = _window_means(
+            noise_signal[..., :-1], time_horizon, samples - time_horizon
         )
     return denoise_signal
+
+
+class MovingAverageFilter:
+    """
+    Streaming counterpart of denoise_filter.
+
+    Keeps the last time_horizon samples of every channel between calls, so
+    filtering a signal chunk by chunk gives the same output as denoise_filter
+    on the whole signal.
+    """
+
+    def __init__(self, time_horizon, channels=None, dtype=float):
+        """
+        Initialize the MovingAverageFilter.
+
+        Args:
+            time_horizon (int): Time horizon for the denoising filter.
+            channels (int, optional): Number of channels for 2-D (channels, samples)
+                chunks. Chunks are 1-D when omitted.
+            dtype (data-type): Floating point type of the chunks.
+        """
+        self.time_horizon = time_horizon
+        self.samples_seen = 0
+        channel_shape = () if channels is None else (channels,)
+        self._window = np.zeros(channel_shape + (time_horizon,), dtype=dtype)
+
+    def filter_chunk(self, chunk):
+        """
+        Filter the next chunk of the signal.
+
+        Args:
+            chunk (ndarray): Next samples, 1-D or (channels, samples).
+
+        Returns:
+            ndarray: The denoised chunk, NaN until time_horizon samples have been seen.
+        """
+        chunk = np.asarray(chunk, dtype=self._window.dtype)
+        samples = chunk.shape[-1]
+        extended_signal = np.concatenate([self._window, chunk], axis=-1)
+        denoise_chunk = _window_means(
+            extended_signal[..., :-1], self.time_horizon, samples
+        ).astype(chunk.dtype, copy=False)
+        denoise_chunk[..., : max(self.time_horizon - self.samples_seen, 0)] = np.nan
+
+        self._window = extended_signal[..., samples:]
+        self.samples_seen += samples
+        return denoise_chunk
+
+
+class FIRFilter:
+    """
+    Streaming counterpart of fir_filter.
+
+    Keeps the last len(coefficients) - 1 inputs of every channel between calls,
+    so filtering a signal chunk by chunk gives the same output as fir_filter on
+    the whole signal, in memory bounded by the chunk size.
+    """
+
+    def __init__(self, coefficients, channels=None, method="auto", dtype=float):
+        """
+        Initialize the FIRFilter.
+
+        Args:
+            coefficients (array_like): FIR coefficients b_0, b_1, ...
+            channels (int or tuple, optional): Leading shape of (..., samples)
+                chunks, e.g. the number of runs. Chunks are 1-D when omitted.
+            method (str): Filter method of every chunk, as in fir_filter.
+            dtype (data-type): Floating point type of the chunks.
+        """
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.method = method
+        self.samples_seen = 0
+        channel_shape = () if channels is None else np.atleast_1d(channels)
+        self._state = np.zeros(
+            tuple(channel_shape) + (len(self.coefficients) - 1,), dtype=dtype
+        )
+
+    def filter_chunk(self, chunk):
+        """
+        Filter the next chunk of the signal.
+
+        Args:
+            chunk (ndarray): Next samples, of shape (..., samples).
+
+        Returns:
+            ndarray: The filtered chunk.
+        """
+        chunk = np.asarray(chunk, dtype=self._state.dtype)
+        samples = chunk.shape[-1]
+        history = self._state.shape[-1]
+        extended_signal = np.concatenate([self._state, chunk], axis=-1)
+        filtered = fir_filter(extended_signal, self.coefficients, self.method)
+
+        self._state = extended_signal[..., extended_signal.shape[-1] - history :]
+        self.samples_seen += samples
+        return filtered[..., history:]